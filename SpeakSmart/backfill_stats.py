@@ -0,0 +1,15 @@
+import logging
+import time
+
+from services.database import db
+
+# Построение user_stats и phrase_stats по накопленной истории одной транзакцией.
+# Бот строит статистику сам в фоне после запуска; скрипт нужен, чтобы сделать это
+# заранее при остановленном боте.
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    started = time.perf_counter()
+    users = db.rebuild_practice_stats()
+    db.close()
+    print(f"🎉 Статистика пересчитана для {users} пользователей за {time.perf_counter() - started:.1f} с")
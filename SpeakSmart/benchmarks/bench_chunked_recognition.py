@@ -0,0 +1,78 @@
+"""Время до первого текста и полная задержка: одним запросом и по частям.
+
+Корпус - синтетические длинные записи (отрезки "речи" с паузами), STT
+заменен моделью задержки: base + per_second * длительность части
+(загрузка и обработка растут с длиной аудио). Параметры модели можно
+подставить из замеров настоящего сервиса.
+
+    python -m benchmarks.bench_chunked_recognition --durations 20 40 60
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from config import config
+from services.audio_pipeline import PCM_SAMPLE_RATE
+from services.chunked_recognition import ChunkedRecognizer
+
+
+def speech_like(seconds: float, seed: int) -> bytes:
+    """Фразы по 1.5-4 с с паузами 0.3-0.8 с."""
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0.0
+    while total < seconds:
+        phrase = rng.uniform(1.5, 4.0)
+        t = np.arange(int(PCM_SAMPLE_RATE * phrase)) / PCM_SAMPLE_RATE
+        parts.append((np.sin(2 * np.pi * rng.uniform(120, 300) * t) * 6000).astype(np.int16))
+        pause = rng.uniform(0.3, 0.8)
+        parts.append(np.zeros(int(PCM_SAMPLE_RATE * pause), dtype=np.int16))
+        total += phrase + pause
+    return np.concatenate(parts).tobytes()
+
+
+def latency_model(base: float, per_second: float):
+    async def recognize_chunk(pcm: bytes, sample_rate: int) -> str:
+        await asyncio.sleep(base + per_second * len(pcm) / 2 / sample_rate)
+        return "text"
+    return recognize_chunk
+
+
+async def measure(recognizer: ChunkedRecognizer, pcm: bytes, recognize_chunk) -> tuple:
+    started = time.perf_counter()
+    first = []
+
+    async def on_partial(text: str):
+        if not first:
+            first.append(time.perf_counter() - started)
+
+    await recognizer.recognize(pcm, PCM_SAMPLE_RATE, recognize_chunk, on_partial)
+    total = time.perf_counter() - started
+    return (first[0] if first else total), total
+
+
+async def main(durations, base: float, per_second: float):
+    recognize_chunk = latency_model(base, per_second)
+    single = ChunkedRecognizer(max_chunk_ms=10 ** 9, min_silence_ms=config.STT_CHUNK_MIN_SILENCE_MS, max_parallel=1)
+    chunked = ChunkedRecognizer(max_chunk_ms=config.STT_CHUNK_MAX_MS,
+                                min_silence_ms=config.STT_CHUNK_MIN_SILENCE_MS,
+                                max_parallel=config.STT_CHUNK_PARALLEL)
+
+    print(f"Модель STT: {base * 1000:.0f} мс + {per_second * 1000:.0f} мс на секунду аудио; "
+          f"части до {config.STT_CHUNK_MAX_MS} мс, параллельно {config.STT_CHUNK_PARALLEL}")
+    print(f"{'запись':>8} {'одним: первый/всего':>22} {'по частям: первый/всего':>26}")
+    for seed, seconds in enumerate(durations):
+        pcm = speech_like(seconds, seed)
+        s_first, s_total = await measure(single, pcm, recognize_chunk)
+        c_first, c_total = await measure(chunked, pcm, recognize_chunk)
+        print(f"{seconds:>6} с {s_first:>10.2f} / {s_total:<8.2f} с {c_first:>12.2f} / {c_total:<8.2f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[20, 40, 60])
+    parser.add_argument("--base", type=float, default=0.3)
+    parser.add_argument("--per-second", type=float, default=0.08)
+    args = parser.parse_args()
+    asyncio.run(main(args.durations, args.base, args.per_second))
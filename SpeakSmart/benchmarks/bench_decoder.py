@@ -0,0 +1,93 @@
+"""Пропускная способность декодирования голосовых: пул процессов и путь через pydub.
+
+Корпус - синтетические голосовые OGG/Opus (тон с паузами) длиной 2-15 с,
+все сообщения приходят разом, как при всплеске. Путь через pydub
+(AudioSegment.from_file + export в wav, по два запуска ffmpeg на
+сообщение) выполняется в потоках; без ffmpeg в PATH он пропускается.
+
+    python -m benchmarks.bench_decoder --messages 200 --workers 4
+"""
+import argparse
+import asyncio
+import io
+import shutil
+import time
+import wave
+
+import numpy as np
+
+from services.audio_pipeline import PCM_SAMPLE_RATE, encode_ogg_opus
+from services.decoder_pool import DecoderPool
+
+
+def voice_message(seconds: float, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(PCM_SAMPLE_RATE * seconds)) / PCM_SAMPLE_RATE
+    signal = np.sin(2 * np.pi * rng.uniform(120, 300) * t) * (np.sin(2 * np.pi * 0.7 * t) > -0.3)
+    pcm = (signal * 6000).astype(np.int16).tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(PCM_SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return encode_ogg_opus(buffer.getvalue())
+
+
+def pydub_decode(data: bytes) -> bytes:
+    # Прежний путь VoiceProcessor: ogg -> AudioSegment -> wav
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format="ogg")
+    audio = audio.set_frame_rate(PCM_SAMPLE_RATE).set_channels(1)
+    out = io.BytesIO()
+    audio.export(out, format="wav")
+    return out.getvalue()
+
+
+async def run_pool(messages: list, workers: int) -> float:
+    pool = DecoderPool(workers=workers, max_queue=len(messages), timeout=60)
+    pool.start()
+    await pool.decode(messages[0])  # прогрев: процессы запущены и модули загружены
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.decode(data) for data in messages))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    return elapsed
+
+
+async def run_pydub(messages: list, workers: int) -> float:
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(workers)
+
+    async def one(data: bytes):
+        async with slots:
+            await loop.run_in_executor(None, pydub_decode, data)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(data) for data in messages))
+    return time.perf_counter() - started
+
+
+async def main(count: int, workers: int):
+    rng = np.random.default_rng(0)
+    messages = [voice_message(rng.uniform(2, 15), seed) for seed in range(count)]
+    audio_kb = sum(len(m) for m in messages) / 1024
+    print(f"Сообщений: {count} ({audio_kb:.0f} КБ OGG), параллельно: {workers}")
+
+    elapsed = await run_pool(messages, workers)
+    print(f"{'пул процессов':<16} {count / elapsed:8.1f} сообщ./с   ({elapsed:.2f} с)")
+
+    if shutil.which("ffmpeg") is None:
+        print(f"{'pydub':<16} пропущено: ffmpeg не найден в PATH")
+        return
+    elapsed = await run_pydub(messages, workers)
+    print(f"{'pydub':<16} {count / elapsed:8.1f} сообщ./с   ({elapsed:.2f} с)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.workers))
@@ -0,0 +1,92 @@
+"""Статистика практики на большой истории: запросы до и после заполнения сводных таблиц.
+
+Во временную базу пишется --rows строк practice_sessions (по умолчанию
+10M) без обновления user_stats/phrase_stats - как история, накопленная
+до их появления. Замеряются get_user_stats/get_weakest_phrases по
+истории, фоновое заполнение пачками (в том числе самая долгая
+транзакция - столько ждут остальные запросы) и те же запросы по
+сводным таблицам. Один "активный" пользователь получает --heavy ответов.
+
+    python -m benchmarks.bench_practice_stats --rows 10000000 --users 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import config
+from services.database import Database
+
+INSERT = "INSERT INTO practice_sessions (user_id, phrase_id, user_response, is_correct) VALUES (?, ?, ?, ?)"
+
+
+def fill(database: Database, rows: int, users: int, heavy: int, phrases: int):
+    rng = np.random.default_rng(0)
+    written = 0
+    while written < rows:
+        size = min(500_000, rows - written)
+        user_ids = rng.integers(2, users + 1, size)
+        user_ids[rng.random(size) < heavy / rows] = 1
+        phrase_ids = rng.integers(0, phrases, size)
+        correct = rng.random(size) < 0.7
+        batch = [(int(u), f"phrase_{p}", "answer", bool(c)) for u, p, c in zip(user_ids, phrase_ids, correct)]
+        database._run(lambda conn: conn.executemany(INSERT, batch))
+        written += size
+        print(f"\r  записано {written:,} строк", end="", flush=True)
+    print()
+
+
+def timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def query_times(database: Database, sample: list) -> str:
+    heavy_stats = timed(lambda: database.get_user_stats(1), 5)
+    heavy_weak = timed(lambda: database.get_weakest_phrases(1), 5)
+    typical_stats = np.mean([timed(lambda: database.get_user_stats(u), 1) for u in sample])
+    typical_weak = np.mean([timed(lambda: database.get_weakest_phrases(u), 1) for u in sample])
+    return (f"обычный пользователь: stats {typical_stats:7.2f} мс, weakest {typical_weak:7.2f} мс; "
+            f"активный: stats {heavy_stats:8.2f} мс, weakest {heavy_weak:8.2f} мс")
+
+
+def main(rows: int, users: int, heavy: int, phrases: int, batch: int):
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(os.path.join(directory, "bench.db"))
+        print(f"История: {rows:,} ответов, {users:,} пользователей, у активного ~{heavy:,}")
+        started = time.perf_counter()
+        fill(database, rows, users, heavy, phrases)
+        print(f"  заполнено за {time.perf_counter() - started:.0f} с")
+
+        sample = [int(u) for u in np.random.default_rng(1).integers(2, users + 1, 50)]
+        print(f"По истории:  {query_times(database, sample)}")
+
+        started = time.perf_counter()
+        batches, longest = 0, 0.0
+        while True:
+            batch_started = time.perf_counter()
+            done = database.backfill_practice_stats(batch)
+            longest = max(longest, time.perf_counter() - batch_started)
+            if not done:
+                break
+            batches += 1
+        print(f"Заполнение: {batches} пачек по {batch} пользователей за {time.perf_counter() - started:.1f} с, "
+              f"самая долгая транзакция {longest * 1000:.0f} мс")
+
+        print(f"По сводным: {query_times(database, sample)}")
+        database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--heavy", type=int, default=50_000)
+    parser.add_argument("--phrases", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=config.PRACTICE_STATS_BACKFILL_BATCH)
+    args = parser.parse_args()
+    main(args.rows, args.users, args.heavy, args.phrases, args.batch)
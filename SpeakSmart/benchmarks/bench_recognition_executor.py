@@ -0,0 +1,78 @@
+"""Размер пула распознавания: пропускная способность и отзывчивость бота.
+
+50 голосовых распознаются одновременно; вызов recognize_google заменен
+блокирующим ожиданием (сеть) с небольшой работой CPU. Параллельно
+"текстовый обработчик" каждые 5 мс проверяет, насколько задерживается
+цикл событий. Первая строка - прежнее поведение: блокирующий вызов
+прямо в обработчике.
+
+    python -m benchmarks.bench_recognition_executor --jobs 50 --sizes 1 4 8 16 32
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from services.recognition_executor import RecognitionExecutor
+
+
+def recognize_google(network: float, cpu: float) -> str:
+    deadline = time.perf_counter() + cpu
+    while time.perf_counter() < deadline:
+        pass
+    time.sleep(network)
+    return "text"
+
+
+async def loop_lag(stop: asyncio.Event, samples: list):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(0.005)
+        samples.append(loop.time() - started - 0.005)
+
+
+async def measure(run_jobs) -> tuple:
+    stop, samples = asyncio.Event(), []
+    lag = asyncio.create_task(loop_lag(stop, samples))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await run_jobs()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag
+    ms = np.asarray(samples or [0.0]) * 1000
+    return elapsed, np.percentile(ms, 99), ms.max()
+
+
+async def main(jobs: int, sizes: list, network: float, cpu: float):
+    print(f"Распознаваний: {jobs}, сеть {network * 1000:.0f} мс + CPU {cpu * 1000:.0f} мс на вызов")
+    print(f"{'пул':>14} {'всего, с':>9} {'задержка цикла p99 / max, мс':>30}")
+
+    async def inline():
+        for _ in range(jobs):
+            recognize_google(network, cpu)
+
+    elapsed, p99, worst = await measure(inline)
+    print(f"{'без пула':>14} {elapsed:9.2f} {p99:18.1f} / {worst:.1f}")
+
+    for size in sizes:
+        executor = RecognitionExecutor(max_concurrency=size, thread_workers=size, timeout=60)
+
+        async def pooled():
+            await asyncio.gather(*(executor.run_in_thread(recognize_google, network, cpu) for _ in range(jobs)))
+
+        elapsed, p99, worst = await measure(pooled)
+        executor.shutdown()
+        print(f"{f'{size} потоков':>14} {elapsed:9.2f} {p99:18.1f} / {worst:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--network", type=float, default=0.3)
+    parser.add_argument("--cpu", type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.sizes, args.network, args.cpu))
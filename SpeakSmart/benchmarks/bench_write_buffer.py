@@ -0,0 +1,76 @@
+"""Пропускная способность записи ответов: транзакция на строку и групповой коммит.
+
+--users обработчиков одновременно записывают по --answers ответов.
+Замеряется, сколько строк в секунду попадает в базу и сколько ждет
+обработчик на одной записи: add_practice_session_async (транзакция на
+строку, как раньше) и буфер отложенной записи с разными flush_size.
+
+    python -m benchmarks.bench_write_buffer --users 200 --answers 50 --sizes 1 10 100 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import config
+from services.database import Database, WriteBehindBuffer
+
+
+def row(user_id: int, n: int) -> tuple:
+    return user_id, f"phrase_{n % 40}", "answer", n % 3 != 0
+
+
+async def run_handlers(users: int, answers: int, write) -> list:
+    waits = []
+
+    async def handler(user_id: int):
+        for n in range(answers):
+            started = time.perf_counter()
+            await write(row(user_id, n))
+            waits.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(handler(user_id) for user_id in range(users)))
+    return waits
+
+
+def report(name: str, rows: int, elapsed: float, waits: list) -> str:
+    ms = np.asarray(waits) * 1000
+    return (f"{name:<24} {rows / elapsed:10.0f} строк/с   ожидание обработчика "
+            f"p50 {np.percentile(ms, 50):7.3f} мс, p99 {np.percentile(ms, 99):7.3f} мс")
+
+
+async def main(users: int, answers: int, sizes: list):
+    rows = users * answers
+    print(f"Обработчиков: {users}, ответов у каждого: {answers} ({rows} строк)")
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(os.path.join(directory, "per_row.db"))
+        started = time.perf_counter()
+        waits = await run_handlers(users, answers, lambda r: database.add_practice_session_async(*r))
+        print(report("транзакция на строку", rows, time.perf_counter() - started, waits))
+        database.close()
+
+        for size in sizes:
+            database = Database(os.path.join(directory, f"group_{size}.db"))
+            buffer = WriteBehindBuffer(database, flush_size=size, flush_interval_ms=config.DB_FLUSH_INTERVAL_MS,
+                                       max_rows=config.DB_BUFFER_MAX_ROWS)
+            buffer.start()
+            started = time.perf_counter()
+            waits = await run_handlers(users, answers, lambda r: buffer.put("practice_sessions", r))
+            await buffer.stop()  # время включает запись всего буфера на диск
+            elapsed = time.perf_counter() - started
+            print(report(f"буфер, flush_size={size}", rows, elapsed, waits)
+                  + f", сбросов {buffer.stats['flushes']}")
+            database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=50)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.answers, args.sizes))
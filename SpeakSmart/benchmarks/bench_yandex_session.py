@@ -0,0 +1,73 @@
+"""Задержка запроса к SpeechKit с общей сессией и с новой сессией на запрос.
+
+Запросы идут к локальной заглушке (utils/stt_stub_server.py), поэтому
+разница - только установка TCP-соединения; к настоящему сервису
+добавляется еще TLS-рукопожатие.
+
+    python -m benchmarks.bench_yandex_session --requests 500
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+import numpy as np
+
+from services.yandex_speechkit import YandexSpeechKit
+from utils.stt_stub_server import StubSTTServer
+
+AUDIO = b"\0" * 32000
+
+
+def summary(name: str, latencies: list) -> str:
+    ms = np.asarray(latencies) * 1000
+    return (f"{name:<24} mean {ms.mean():6.2f} мс   p50 {np.percentile(ms, 50):6.2f} мс   "
+            f"p95 {np.percentile(ms, 95):6.2f} мс")
+
+
+async def with_shared_session(client: YandexSpeechKit, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await client._recognize_bytes(AUDIO, "lpcm", 16000)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def with_new_session(url: str, requests: int) -> list:
+    # Прежнее поведение: ClientSession (и соединение) на каждый запрос
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, data=AUDIO, params={"format": "lpcm"}) as response:
+                await response.json()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(requests: int, delay: float):
+    server = StubSTTServer(delay=delay)
+    url = await server.start()
+    client = YandexSpeechKit()
+    client.base_url, client.api_key, client.folder_id = url, "bench", "bench"
+    try:
+        await with_shared_session(client, 10)  # прогрев
+        shared = await with_shared_session(client, requests)
+        connections = len(server.connections)
+        fresh = await with_new_session(url, requests)
+    finally:
+        await client.close()
+        await server.close()
+
+    print(f"Запросов: {requests}, задержка заглушки: {delay * 1000:.0f} мс")
+    print(summary("общая сессия", shared) + f"   соединений: {connections}")
+    print(summary("сессия на запрос", fresh) + f"   соединений: {len(server.connections) - connections}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.delay))
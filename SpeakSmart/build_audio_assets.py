@@ -0,0 +1,34 @@
+import argparse
+import logging
+
+from config import config
+from services.asset_builder import ENGINES, AssetBuilder
+from services.phrase_catalog import phrase_catalog
+
+
+def build_audio_assets(engine: str = config.TTS_ENGINE, force: bool = False,
+                       workers: int = config.ASSET_BUILD_WORKERS) -> dict:
+    """Собирает аудио всех фраз каталога в OGG/Opus (только новые и измененные)"""
+    builder = AssetBuilder(
+        ENGINES[engine](),
+        output_dir=config.AUDIO_PHRASES_DIR,
+        manifest_file=config.AUDIO_MANIFEST_FILE,
+        language=config.TTS_LANGUAGE,
+        voice=config.TTS_VOICE,
+        workers=workers
+    )
+    return builder.build(phrase_catalog.iter_phrases(), force=force)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка аудио фраз для практики")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=config.TTS_ENGINE,
+                        help="движок синтеза (tone - офлайн-заглушка без сети)")
+    parser.add_argument("--force", action="store_true", help="пересобрать все фразы")
+    parser.add_argument("--workers", type=int, default=config.ASSET_BUILD_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    stats = build_audio_assets(args.engine, force=args.force, workers=args.workers)
+    print(f"🎉 Готово: собрано {stats['rendered']}, без изменений {stats['skipped']}, "
+          f"ошибок {stats['failed']} за {stats['seconds']} с")
@@ -18,6 +18,25 @@ class Config:
 
     # Настройки базы данных
     DATABASE_PATH = "data/database.db"
+    DATABASE_CACHE_SIZE_KB = int(os.getenv("DATABASE_CACHE_SIZE_KB", 8192))
+    DATABASE_BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", 5000))
+
+    # Буфер отложенной записи (практика и логи ошибок)
+    DB_FLUSH_SIZE = int(os.getenv("DB_FLUSH_SIZE", 100))
+    DB_FLUSH_INTERVAL_MS = int(os.getenv("DB_FLUSH_INTERVAL_MS", 200))
+    DB_BUFFER_MAX_ROWS = int(os.getenv("DB_BUFFER_MAX_ROWS", 10000))
+
+    # Фоновое построение сводной статистики по старой истории: пользователей за транзакцию,
+    # пауза между транзакциями (с)
+    PRACTICE_STATS_BACKFILL_BATCH = int(os.getenv("PRACTICE_STATS_BACKFILL_BATCH", 100))
+    PRACTICE_STATS_BACKFILL_PAUSE = float(os.getenv("PRACTICE_STATS_BACKFILL_PAUSE", 0.05))
+
+    # Хранилище состояний FSM: размер кэша (пользователей), период записи изменений (мс),
+    # вытеснение неактивных из памяти (с), удаление из базы не менявшихся состояний (с)
+    FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+    FSM_FLUSH_INTERVAL_MS = int(os.getenv("FSM_FLUSH_INTERVAL_MS", 500))
+    FSM_CACHE_TTL = int(os.getenv("FSM_CACHE_TTL", 1800))
+    FSM_SESSION_TTL = int(os.getenv("FSM_SESSION_TTL", 30 * 24 * 3600))
 
     # Пути к файлам
     BASE_DIR = Path(__file__).parent
@@ -25,10 +44,106 @@ class Config:
     USER_RESPONSES_DIR = BASE_DIR / "audio" / "user_responses"
     TEMP_AUDIO_DIR = BASE_DIR / "audio" / "temp"
     FAQ_FILE = BASE_DIR / "data" / "faq.json"
+    PHRASES_FILE = BASE_DIR / "data" / "phrases.json"
+
+    # Сборка аудио фраз (build_audio_assets.py): манифест, движок TTS, язык, голос, потоки
+    AUDIO_MANIFEST_FILE = AUDIO_PHRASES_DIR / "manifest.json"
+    TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")
+    TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "en")
+    TTS_VOICE = os.getenv("TTS_VOICE", "com")
+    ASSET_BUILD_WORKERS = int(os.getenv("ASSET_BUILD_WORKERS", 4))
+
+    # Синтез аудио по запросу (нет готового файла, замедленный вариант):
+    # каталог и лимит дискового кэша (байт), лимит кэша в памяти (байт), потоки синтеза
+    TTS_CACHE_DIR = BASE_DIR / "audio" / "tts_cache"
+    TTS_DISK_CACHE_MAX_BYTES = int(os.getenv("TTS_DISK_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+    TTS_MEMORY_CACHE_MAX_BYTES = int(os.getenv("TTS_MEMORY_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    TTS_RENDER_WORKERS = int(os.getenv("TTS_RENDER_WORKERS", 2))
+
+    # Период проверки каталога аудио фраз на новые и измененные файлы (с)
+    AUDIO_ASSETS_POLL_INTERVAL = float(os.getenv("AUDIO_ASSETS_POLL_INTERVAL", 30))
+
+    # Сколько подготовленных проверок ответов (по фразам каталога) держать в памяти
+    PHRASE_CACHE_SIZE = int(os.getenv("PHRASE_CACHE_SIZE", 1024))
+
+    # Голосовые сообщения больше этого размера (байт) сбрасываются на диск
+    VOICE_SPILL_THRESHOLD = int(os.getenv("VOICE_SPILL_THRESHOLD", 5 * 1024 * 1024))
+
+    # Скачивание медиа: максимальный размер файла (байт), размер части, таймаут (с)
+    MAX_VOICE_FILE_SIZE = int(os.getenv("MAX_VOICE_FILE_SIZE", 20 * 1024 * 1024))
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 64 * 1024))
+    DOWNLOAD_TIMEOUT = int(os.getenv("DOWNLOAD_TIMEOUT", 30))
 
     # Настройки распознавания речи
     SPEECH_RECOGNITION_LANGUAGE = "en-US"
 
+    # Проверка ответа: repeat - повторить фразу (по умолчанию), reply - ответить на нее,
+    # any - любое из двух. reply и any включаются явно: они принимают и ответы, не совпадающие с фразой
+    ANSWER_CHECK_MODE = os.getenv("ANSWER_CHECK_MODE", "repeat")
+    # Минимальная оценка (0..1) повтора фразы, при которой ответ засчитывается
+    ANSWER_PASS_SCORE = float(os.getenv("ANSWER_PASS_SCORE", 0.8))
+
+    # Повторная проверка истории ответов (regrade_practice.py): процессы и размер порции
+    REGRADE_WORKERS = int(os.getenv("REGRADE_WORKERS", 4))
+    REGRADE_CHUNK_SIZE = int(os.getenv("REGRADE_CHUNK_SIZE", 5000))
+
+    # Предобработка аудио: длина кадра и запас по краям (мс), целевая громкость (dBFS)
+    VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", 20))
+    VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", 200))
+    VAD_TARGET_DBFS = float(os.getenv("VAD_TARGET_DBFS", -20))
+
+    # Длинные сообщения: максимальная длина части, минимальная пауза для разреза (мс),
+    # число частей одного сообщения, распознаваемых одновременно
+    STT_CHUNK_MAX_MS = int(os.getenv("STT_CHUNK_MAX_MS", 15000))
+    STT_CHUNK_MIN_SILENCE_MS = int(os.getenv("STT_CHUNK_MIN_SILENCE_MS", 300))
+    STT_CHUNK_PARALLEL = int(os.getenv("STT_CHUNK_PARALLEL", 4))
+
+    # Пул распознавания: одновременные задачи, потоки для сети;
+    # пул декодирования: процессы, таймаут задачи (с) - общий для обоих пулов
+    STT_MAX_CONCURRENCY = int(os.getenv("STT_MAX_CONCURRENCY", 8))
+    STT_THREAD_WORKERS = int(os.getenv("STT_THREAD_WORKERS", 8))
+    STT_DECODE_PROCESSES = int(os.getenv("STT_DECODE_PROCESSES", 2))
+    STT_JOB_TIMEOUT = float(os.getenv("STT_JOB_TIMEOUT", 30))
+    # Сколько голосовых сообщений может ждать декодирования, прежде чем новые получат отказ
+    DECODER_QUEUE_SIZE = int(os.getenv("DECODER_QUEUE_SIZE", 64))
+
+    # Кэш распознанного текста: записей в памяти и время жизни (с)
+    TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", 2048))
+    TRANSCRIPTION_CACHE_TTL = float(os.getenv("TRANSCRIPTION_CACHE_TTL", 7 * 24 * 3600))
+
+    # Yandex SpeechKit: общая HTTP-сессия, повторы и предохранитель
+    YANDEX_STT_URL = os.getenv("YANDEX_STT_URL", "https://stt.api.cloud.yandex.net/speech/v1/stt:recognize")
+    YANDEX_CONNECTION_LIMIT = int(os.getenv("YANDEX_CONNECTION_LIMIT", 20))
+    YANDEX_KEEPALIVE_TIMEOUT = float(os.getenv("YANDEX_KEEPALIVE_TIMEOUT", 60))
+    YANDEX_REQUEST_TIMEOUT = float(os.getenv("YANDEX_REQUEST_TIMEOUT", 10))
+    YANDEX_MAX_RETRIES = int(os.getenv("YANDEX_MAX_RETRIES", 2))
+    YANDEX_BACKOFF_BASE = float(os.getenv("YANDEX_BACKOFF_BASE", 0.2))
+    YANDEX_BREAKER_THRESHOLD = int(os.getenv("YANDEX_BREAKER_THRESHOLD", 5))
+    YANDEX_BREAKER_RESET = float(os.getenv("YANDEX_BREAKER_RESET", 30))
+
+    # Очередь голосовых ответов: обработчики, максимум ожидающих задач, таймаут задачи (с),
+    # сколько при остановке бота ждать задачи, уже взятые в работу (с)
+    VOICE_JOB_WORKERS = int(os.getenv("VOICE_JOB_WORKERS", 8))
+    VOICE_JOB_QUEUE_SIZE = int(os.getenv("VOICE_JOB_QUEUE_SIZE", 100))
+    VOICE_JOB_TIMEOUT = float(os.getenv("VOICE_JOB_TIMEOUT", 60))
+    VOICE_JOB_STOP_TIMEOUT = float(os.getenv("VOICE_JOB_STOP_TIMEOUT", 10))
+
+    # Маршрутизация STT: язык -> бэкенды в порядке приоритета
+    STT_ROUTES = os.getenv("STT_ROUTES", "ru-RU:yandex,google;en-US:google")
+    # Хеджирование: второй бэкенд запускается, если первый не ответил за p95 своей задержки
+    # (пока статистики мало - за STT_HEDGE_DEFAULT_DELAY секунд)
+    STT_HEDGE_ENABLED = os.getenv("STT_HEDGE_ENABLED", "true").lower() == "true"
+    STT_HEDGE_DEFAULT_DELAY = float(os.getenv("STT_HEDGE_DEFAULT_DELAY", 3))
+    # Окно статистики бэкенда и доля ошибок, после которой он уходит в конец очереди
+    STT_STATS_WINDOW = int(os.getenv("STT_STATS_WINDOW", 100))
+    STT_MAX_ERROR_RATE = float(os.getenv("STT_MAX_ERROR_RATE", 0.5))
+
+    # Настройки поиска по FAQ: "ranked" (BM25) или "first" (первое совпадение ключевого слова)
+    FAQ_SEARCH_MODE = os.getenv("FAQ_SEARCH_MODE", "ranked")
+    FAQ_TOP_K = int(os.getenv("FAQ_TOP_K", 3))
+    FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", 0.2))
+    FAQ_RELOAD_INTERVAL = float(os.getenv("FAQ_RELOAD_INTERVAL", 5))
+
     # Настройки бота
     BOT_PROPERTIES = {
         "parse_mode": ParseMode.MARKDOWN
@@ -59,6 +174,7 @@ class Config:
 os.makedirs(Config.AUDIO_PHRASES_DIR, exist_ok=True)
 os.makedirs(Config.USER_RESPONSES_DIR, exist_ok=True)
 os.makedirs(Config.TEMP_AUDIO_DIR, exist_ok=True)
+os.makedirs(Config.TTS_CACHE_DIR, exist_ok=True)
 os.makedirs(os.path.dirname(Config.DATABASE_PATH), exist_ok=True)
 os.makedirs(os.path.dirname(Config.FAQ_FILE), exist_ok=True)
 
@@ -1,14 +1,19 @@
 import logging
-from aiogram import Router, types, F
+from functools import partial
+from typing import Tuple
+from aiogram import Bot, Router, types, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, Optional, ReplyKeyboardMarkup, KeyboardButton, FSInputFile
 from pathlib import Path
 
+from services.answer_matcher import AnswerScore
 from services.database import db
+from services.media_cache import phrase_media_cache
 from services.speech_recognition import speech_service
 from services.tts_service import tts_service
+from services.voice_jobs import VoiceJob, VoiceJobResult, voice_jobs
 from config import config
 
 logger = logging.getLogger(__name__)
@@ -34,7 +39,7 @@ practice_keyboard = ReplyKeyboardMarkup(
 response_keyboard = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="🎤 Ответить голосом"), KeyboardButton(text="💬 Ответить текстом")],
-        [KeyboardButton(text="🚪 Выход")]
+        [KeyboardButton(text="🐢 Медленнее"), KeyboardButton(text="🚪 Выход")]
     ],
     resize_keyboard=True,
     one_time_keyboard=True
@@ -108,20 +113,7 @@ async def send_practice_phrase(message: types.Message, state: FSMContext):
         await message.answer(f"📝 *Фраза для повторения:*\n`{phrase_text}`")
 
         # Пытаемся отправить голосовое сообщение
-        audio_path = tts_service.get_phrase_audio_path(phrase_id)
-        if audio_path and audio_path.exists():
-            try:
-                voice = FSInputFile(audio_path)
-                await message.answer_voice(
-                    voice=voice,
-                    caption="🎧 Прослушайте и повторите эту фразу"
-                )
-            except Exception as e:
-                logger.error(f"Error sending voice: {e}")
-                await message.answer("❌ Не удалось отправить голосовое сообщение.")
-        else:
-            logger.warning(f"Audio file not found: {audio_path}")
-            await message.answer("🔇 *Аудио временно недоступно.* Повторите фразу текстом.")
+        await send_phrase_audio(message, phrase_id, caption="🎧 Прослушайте и повторите эту фразу")
 
         # Просим пользователя ответить
         await message.answer(
@@ -138,6 +130,53 @@ async def send_practice_phrase(message: types.Message, state: FSMContext):
         await state.set_state(PracticeStates.practicing)
 
 
+async def send_phrase_audio(message: types.Message, phrase_id: str, caption: str, slow: bool = False):
+    """Отправка аудио фразы: готовый файл или синтез по запросу (замедленный вариант - всегда синтез)."""
+    try:
+        asset = None if slow else tts_service.get_phrase_asset(phrase_id)
+        if asset:
+            await phrase_media_cache.send_phrase_voice(
+                message,
+                phrase_id,
+                asset.path,
+                caption=caption,
+                content_hash=asset.content_hash
+            )
+            return
+
+        await message.bot.send_chat_action(message.chat.id, "record_voice")
+        audio = await tts_service.synthesize_phrase(phrase_id, slow=slow)
+        if audio is None:
+            logger.warning(f"Audio unavailable for phrase: {phrase_id} (slow={slow})")
+            await message.answer("🔇 *Аудио временно недоступно.* Повторите фразу текстом.")
+            return
+
+        await phrase_media_cache.send_phrase_voice(
+            message,
+            f"{phrase_id}:slow" if slow else phrase_id,
+            audio.path,
+            caption=caption,
+            content_hash=audio.content_hash,
+            data=audio.data
+        )
+    except Exception as e:
+        logger.error(f"Error sending voice: {e}")
+        await message.answer("❌ Не удалось отправить голосовое сообщение.")
+
+
+# Обработчик для кнопки "🐢 Медленнее"
+@router.message(PracticeStates.waiting_for_response, F.text == "🐢 Медленнее")
+async def handle_slow_phrase(message: types.Message, state: FSMContext):
+    """Замедленное произношение текущей фразы (для начинающих)."""
+    state_data = await state.get_data()
+    phrase_id = state_data.get('current_phrase_id')
+    if not phrase_id:
+        await message.answer("Нет текущей фразы. Нажмите *'🎯 Новая фраза'*.")
+        return
+    await send_phrase_audio(message, phrase_id, caption="🐢 Медленное произношение", slow=True)
+    await message.answer("Выберите способ ответа:", reply_markup=response_keyboard)
+
+
 # Обработчик для кнопки "🎤 Ответить голосом"
 @router.message(PracticeStates.waiting_for_response, F.text == "🎤 Ответить голосом")
 async def handle_voice_prompt(message: types.Message, state: FSMContext):
@@ -186,41 +225,58 @@ async def handle_text_input_response(message: types.Message, state: FSMContext):
 
 
 @router.message(PracticeStates.waiting_for_response, F.voice)
-async def handle_voice_response(message: types.Message, state: FSMContext):
-    """Обработка голосового ответа пользователя"""
+async def handle_voice_response(message: types.Message, state: FSMContext, bot: Bot):
+    """Голосовой ответ: ставим в очередь распознавания и сразу освобождаем обработчик."""
+    user_id = message.from_user.id
+    logger.info(f"User {user_id} отправил голосовое сообщение")
+
     try:
-        user_id = message.from_user.id
-        logger.info(f"User {user_id} отправил голосовое сообщение")
+        state_data = await state.get_data()
+        current_phrase = state_data.get('current_phrase')
+        if not current_phrase:
+            await message.answer("❌ Ошибка: фраза не найдена. Начните заново.", reply_markup=practice_keyboard)
+            await state.set_state(PracticeStates.practicing)
+            return
 
-        await message.answer(
-            "🎤 Голосовое сообщение получено! \n\n"
-            "Для точной проверки произношения, пожалуйста, "
-            "**дополнительно отправьте текст той фразы, которую вы сказали**. \n\n"
-            "Это поможет мне проверить ваш ответ точнее!",
-            reply_markup=ReplyKeyboardMarkup(
-                keyboard=[[KeyboardButton(text="💬 Ввести текст произношения")]],
-                resize_keyboard=True
-            )
+        status_message = await message.answer("⏳ Голосовое сообщение получено, распознаю...",
+                                              reply_markup=practice_keyboard)
+        job = VoiceJob(
+            bot=bot,
+            user_id=user_id,
+            voice=message.voice,
+            phrase_text=current_phrase,
+            phrase_id=state_data.get('current_phrase_id'),
+            status_message=status_message,
+            on_done=partial(finish_voice_response, state)
         )
 
-        # Сохраняем информацию о голосовом сообщении для последующей проверки
-        await state.update_data(has_voice_response=True)
+        if not voice_jobs.submit(job):
+            await status_message.edit_text(
+                "⏳ Сейчас много голосовых сообщений. Отправьте ответ чуть позже или ответьте текстом."
+            )
+            await message.answer("Выберите способ ответа:", reply_markup=response_keyboard)
+            return
+
+        # Не ждем распознавания: результат придет в отредактированном сообщении
+        await state.set_state(PracticeStates.practicing)
 
     except Exception as e:
         logger.error(f"Ошибка обработки голосового сообщения: {e}")
         await message.answer("❌ Произошла ошибка при обработке голосового сообщения.")
 
 
-# НОВЫЙ ОБРАБОТЧИК: Для кнопки "💬 Ввести текст произношения" после голосового сообщения
-@router.message(PracticeStates.waiting_for_response, F.text == "💬 Ввести текст произношения")
-async def handle_text_after_voice(message: types.Message, state: FSMContext):
-    """Обработка нажатия кнопки текстового ввода после голосового сообщения."""
-    await message.answer(
-        "Хорошо! Напишите текст фразы, которую вы произнесли. 💬",
-        reply_markup=text_input_keyboard
-    )
-    # Переходим в состояние ожидания текстового ввода
-    await state.set_state(PracticeStates.waiting_for_text_input)
+async def finish_voice_response(state: FSMContext, job: VoiceJob, result: VoiceJobResult):
+    """Показ результата проверки голосового ответа в сообщении о статусе."""
+    if result.error:
+        await job.status_message.edit_text(
+            f"❌ {result.error}\n\nНажмите *'🔁 Повторить'*, чтобы попробовать ещё раз."
+        )
+        return
+
+    correct_answers, total_attempts = await record_attempt(state, result.is_correct)
+    feedback = f"🗣 *Распознано:* {result.text}\n\n"
+    feedback += format_feedback(result.text, job.phrase_text, result.score, correct_answers, total_attempts)
+    await job.status_message.edit_text(feedback)
 
 
 @router.message(PracticeStates.waiting_for_response, F.text)
@@ -239,6 +295,62 @@ async def handle_text_response(message: types.Message, state: FSMContext):
     await process_user_response(message, state, user_text, is_voice=False)
 
 
+async def record_attempt(state: FSMContext, is_correct: bool) -> Tuple[int, int]:
+    """Обновление статистики практики в состоянии; возвращает (правильных, всего)."""
+    state_data = await state.get_data()
+    correct_answers = state_data.get('correct_answers', 0) + (1 if is_correct else 0)
+    total_attempts = state_data.get('total_attempts', 0) + 1
+    await state.update_data(
+        correct_answers=correct_answers,
+        total_attempts=total_attempts
+    )
+    return correct_answers, total_attempts
+
+
+# Отметки слов в разборе ответа
+WORD_MARKS = {"ok": "✅", "close": "🟡", "wrong": "❌", "missing": "⬜", "extra": "➕"}
+
+
+def format_word_diff(result: AnswerScore) -> str:
+    """Разбор ответа по словам: совпало, похоже, неверно, пропущено, лишнее."""
+    parts = []
+    for word in result.diff:
+        mark = WORD_MARKS[word.status]
+        if word.status == "ok":
+            parts.append(f"{mark} {word.expected}")
+        elif word.status in ("close", "wrong"):
+            parts.append(f"{mark} {word.heard} → {word.expected}")
+        elif word.status == "missing":
+            parts.append(f"{mark} _{word.expected}_")
+        else:
+            parts.append(f"{mark} {word.heard}")
+    return "  ".join(parts)
+
+
+def format_feedback(user_response: str, current_phrase: str, result: AnswerScore,
+                    correct_answers: int, total_attempts: int) -> str:
+    """Текст обратной связи с результатом проверки, разбором по словам и статистикой."""
+    if result.passed:
+        feedback = "✅ *Отлично!* Правильный ответ!\n"
+        if result.score < 1.0 and result.diff:
+            feedback += f"*Оценка:* {result.score:.0%}\n{format_word_diff(result)}\n"
+        feedback += "\n"
+    else:
+        feedback = "❌ *Попробуйте ещё раз!*\n"
+        feedback += f"*Ваш ответ:* {user_response}\n"
+        feedback += f"*Правильный ответ:* {current_phrase}\n"
+        feedback += f"*Оценка:* {result.score:.0%}\n"
+        if result.diff:
+            feedback += f"{format_word_diff(result)}\n"
+        feedback += "\n"
+
+    accuracy = (correct_answers / total_attempts * 100) if total_attempts > 0 else 0
+    feedback += f"📊 *Статистика:*\n"
+    feedback += f"Правильных ответов: {correct_answers}/{total_attempts}\n"
+    feedback += f"Точность: {accuracy:.1f}%"
+    return feedback
+
+
 # Вынесена общая логика проверки ответа
 async def process_user_response(message: types.Message, state: FSMContext, user_response: str, is_voice: bool):
     """Общая функция для обработки и проверки ответа пользователя."""
@@ -248,8 +360,6 @@ async def process_user_response(message: types.Message, state: FSMContext, user_
 
         current_phrase = state_data.get('current_phrase')
         current_phrase_id = state_data.get('current_phrase_id')
-        correct_answers = state_data.get('correct_answers', 0)
-        total_attempts = state_data.get('total_attempts', 0) + 1
 
         if not current_phrase:
             await message.answer("❌ Ошибка: фраза не найдена. Начните заново.", reply_markup=practice_keyboard)
@@ -257,32 +367,16 @@ async def process_user_response(message: types.Message, state: FSMContext, user_
             return
 
         # Проверяем ответ
-        is_correct = speech_service.check_answer(user_response, current_phrase)
+        result = speech_service.score_answer(user_response, current_phrase, phrase_id=current_phrase_id)
+        is_correct = result.passed
         logger.info(f"Check result for user {user_id}: {is_correct}")
 
         # Сохраняем в базу
-        db.add_practice_session(user_id, current_phrase_id, user_response, is_correct)
+        await db.enqueue_practice_session(user_id, current_phrase_id, user_response, is_correct)
 
         # Обновляем статистику
-        if is_correct:
-            correct_answers += 1
-            feedback = "✅ *Отлично!* Правильный ответ!\n\n"
-        else:
-            feedback = "❌ *Попробуйте ещё раз!*\n"
-            feedback += f"*Ваш ответ:* {user_response}\n"
-            feedback += f"*Правильный ответ:* {current_phrase}\n\n"
-
-        # Сохраняем новую статистику
-        await state.update_data(
-            correct_answers=correct_answers,
-            total_attempts=total_attempts
-        )
-
-        # Добавляем статистику в фидбек
-        accuracy = (correct_answers / total_attempts * 100) if total_attempts > 0 else 0
-        feedback += f"📊 *Статистика:*\n"
-        feedback += f"Правильных ответов: {correct_answers}/{total_attempts}\n"
-        feedback += f"Точность: {accuracy:.1f}%"
+        correct_answers, total_attempts = await record_attempt(state, is_correct)
+        feedback = format_feedback(user_response, current_phrase, result, correct_answers, total_attempts)
 
         await message.answer(feedback, reply_markup=practice_keyboard)
         # Возвращаем пользователя в состояние "практики"
@@ -318,7 +412,26 @@ async def handle_statistics(message: types.Message, state: FSMContext):
     correct_answers = state_data.get('correct_answers', 0)
     total_attempts = state_data.get('total_attempts', 0)
     accuracy = (correct_answers / total_attempts * 100) if total_attempts > 0 else 0
-    stats_text = f"📊 *Ваша статистика практики:*\n\n✅ Правильных ответов: *{correct_answers}*\n📝 Всего попыток: *{total_attempts}*\n🎯 Точность: *{accuracy:.1f}%*\n\nПродолжайте практиковаться!"
+    stats_text = f"📊 *Ваша статистика практики:*\n\n✅ Правильных ответов: *{correct_answers}*\n📝 Всего попыток: *{total_attempts}*\n🎯 Точность: *{accuracy:.1f}%*\n"
+
+    # Статистика за все время - из сводных таблиц, без просмотра истории
+    user_id = message.from_user.id
+    lifetime = await db.get_user_stats_async(user_id)
+    if lifetime:
+        total, correct, current_streak, best_streak, _ = lifetime
+        stats_text += (
+            f"\n🏆 *За все время:*\n"
+            f"Правильных ответов: *{correct}* из *{total}* ({correct / total * 100:.1f}%)\n"
+            f"🔥 Серия правильных ответов: *{current_streak}* (рекорд: *{best_streak}*)\n"
+        )
+        weakest = await db.get_weakest_phrases_async(user_id)
+        if weakest:
+            stats_text += "\n🧩 *Стоит повторить:*\n"
+            for phrase_id, phrase_total, phrase_correct in weakest:
+                phrase_text = tts_service.get_phrase_text(phrase_id) or phrase_id
+                stats_text += f"• {phrase_text} - {phrase_correct}/{phrase_total}\n"
+
+    stats_text += "\nПродолжайте практиковаться!"
     await message.answer(stats_text)
 
 
@@ -334,48 +447,5 @@ async def handle_exit(message: types.Message, state: FSMContext):
     await state.clear()
 
 
-async def download_voice_message(file_id: str, user_id: int) -> Optional[Path]:
-    """
-    Скачивание голосового сообщения из Telegram.
-    """
-    try:
-        from aiogram import Bot
-        from config import config
-        import os
-        from pathlib import Path
-
-        # Создаем временную папку для аудио
-        temp_dir = Path("temp_audio")
-        temp_dir.mkdir(exist_ok=True)
-
-        # Создаем экземпляр бота
-        bot = Bot(token=config.BOT_TOKEN)
-
-        # Скачиваем файл
-        file = await bot.get_file(file_id)
-        file_path = file.file_path
-
-        # Создаем путь для сохранения
-        download_path = temp_dir / f"voice_{user_id}_{file_id}.ogg"
-
-        # Скачиваем файл
-        await bot.download_file(file_path, destination=str(download_path))
-
-        logger.info(f"Голосовое сообщение скачано: {download_path}")
-
-        # Проверяем, что файл действительно создался
-        if download_path.exists():
-            await bot.session.close()  # Закрываем сессию
-            return download_path
-        else:
-            logger.error(f"Файл не был создан: {download_path}")
-            await bot.session.close()  # Закрываем сессию
-            return None
-
-    except Exception as e:
-        logger.error(f"Ошибка скачивания голосового сообщения {file_id}: {e}")
-        return None
-
-
 def register_practice_handlers(dp):
     dp.include_router(router)
\ No newline at end of file
@@ -15,7 +15,7 @@ async def cmd_start(message: Message):
         user = message.from_user
 
         # Добавляем пользователя в базу
-        db.add_user(user.id, user.username, user.first_name, user.last_name)
+        await db.add_user_async(user.id, user.username, user.first_name, user.last_name)
 
         welcome_text = (
             "👋 *Добро пожаловать в SpeakSmart!*\n\n"
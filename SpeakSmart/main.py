@@ -1,7 +1,6 @@
 import logging
 import asyncio
 from aiogram import Bot, Dispatcher, Command
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 
 from handlers.start import cmd_start, cmd_myid, cmd_help
@@ -9,6 +8,7 @@ from handlers.practice import register_practice_handlers
 from handlers.common import register_common_handlers
 
 from config import config
+from services.fsm_storage import fsm_storage
 
 # Настройка логирования
 logging.basicConfig(
@@ -26,8 +26,8 @@ logger = logging.getLogger(__name__)
 async def main():
     # Инициализация бота и диспетчера
     bot = Bot(token=config.BOT_TOKEN, default=DefaultBotProperties())
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    # Состояния практики хранятся в SQLite и переживают перезапуск
+    dp = Dispatcher(storage=fsm_storage)
 
     try:
         # Регистрация обработчиков команд
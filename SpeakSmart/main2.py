@@ -6,6 +6,20 @@ from aiogram.enums import ParseMode
 
 from config import config
 from services.database import db
+from services.faq_service import faq_store
+from services.fsm_storage import fsm_storage
+from services.answer_matcher import answer_matchers
+from services.audio_assets import audio_assets
+from services.audio_preprocessing import audio_preprocessor
+from services.chunked_recognition import chunked_recognizer
+from services.decoder_pool import decoder_pool
+from services.phrase_catalog import phrase_catalog
+from services.recognition_executor import recognition_executor
+from services.stt_router import stt_router
+from services.transcription_cache import transcription_cache
+from services.tts_service import synthesis_cache
+from services.voice_jobs import voice_jobs
+from services.yandex_speechkit import yandex_speech
 from utils.logger import setup_logging
 
 
@@ -18,7 +32,7 @@ bot = Bot(
     token=config.BOT_TOKEN,
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
 )
-dp = Dispatcher()
+dp = Dispatcher(storage=fsm_storage)
 
 # Глобальные переменные для хранения состояний
 user_sessions = {}  # Здесь будем хранить состояния пользователей
@@ -50,12 +64,52 @@ async def on_startup():
     """Действия при запуске бота."""
     logger.info("Бот запускается...")
     await register_handlers()
+    if not await db.get_catalog_meta_async("practice_stats_built"):
+        # Пересчет по всей истории долгий и не должен задерживать запуск: идет в фоне небольшими пачками
+        logger.info("Сводная статистика практики не построена, строим в фоне")
+        db.start_stats_backfill()
+    db.write_buffer.start()
+    fsm_storage.start()
+    faq_store.start()
+    await asyncio.to_thread(phrase_catalog.load)
+    await asyncio.to_thread(answer_matchers.compile_all)
+    await asyncio.to_thread(audio_assets.refresh)
+    missing = audio_assets.missing(phrase_catalog.ids())
+    if missing:
+        logger.warning(f"Нет аудиофайлов для {len(missing)} фраз: {', '.join(missing[:20])}")
+    stale = audio_assets.stale(phrase_catalog.iter_phrases())
+    if stale:
+        logger.warning(f"Аудио устарело (текст изменен) для {len(stale)} фраз: {', '.join(stale[:20])}; "
+                       f"запустите build_audio_assets.py")
+    audio_assets.start()
+    await yandex_speech.start()
+    decoder_pool.start()
+    voice_jobs.start()
+    await transcription_cache.purge_expired()
     logger.info("Бот успешно запущен и готов к работе!")
 
 
 async def on_shutdown():
     """Действия при остановке бота."""
     logger.info("Бот останавливается...")
+    faq_store.stop()
+    audio_assets.stop()
+    await voice_jobs.stop()
+    # Состояния, измененные завершившимися голосовыми задачами
+    await fsm_storage.close()
+    await db.write_buffer.stop()
+    await db.stop_stats_backfill()
+    logger.info(f"Статистика буфера записи: {db.write_buffer.get_stats()}")
+    await yandex_speech.close()
+    logger.info(f"Статистика кэша распознавания: {transcription_cache.get_stats()}")
+    logger.info(f"Статистика предобработки аудио: {audio_preprocessor.get_stats()}")
+    logger.info(f"Статистика распознавания по частям: {chunked_recognizer.get_stats()}")
+    logger.info(f"Статистика маршрутизации STT: {stt_router.get_stats()}")
+    logger.info(f"Статистика синтеза по запросу: {synthesis_cache.get_stats()}")
+    synthesis_cache.shutdown()
+    recognition_executor.shutdown()
+    decoder_pool.shutdown()
+    db.close()
 
 
 async def main():
@@ -0,0 +1,33 @@
+import argparse
+import logging
+
+from config import config
+from services.answer_matcher import MODE_ANY, MODE_REPEAT, MODE_REPLY
+from services.batch_grader import BatchGrader
+from services.database import db
+from services.phrase_catalog import phrase_catalog
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Повторная проверка истории ответов по текущим правилам")
+    parser.add_argument("--mode", choices=(MODE_REPEAT, MODE_REPLY, MODE_ANY), default=config.ANSWER_CHECK_MODE)
+    parser.add_argument("--pass-score", type=float, default=config.ANSWER_PASS_SCORE)
+    parser.add_argument("--workers", type=int, default=config.REGRADE_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=config.REGRADE_CHUNK_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="проверить только первые N сессий")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    phrase_catalog.load()
+    grader = BatchGrader(
+        db,
+        phrase_catalog,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        mode=args.mode,
+        pass_score=args.pass_score
+    )
+    stats = grader.run(limit=args.limit)
+    db.close()
+    print(f"🎉 Проверено {stats['graded']} из {stats['rows']} ответов "
+          f"({stats['rows_per_sec']} строк/с), изменилась оценка: {stats['changed']}, "
+          f"пропущено: {stats['skipped']}")
@@ -0,0 +1,299 @@
+import logging
+import string
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config import config
+from services.phrase_catalog import PhraseCatalog, phrase_catalog
+
+logger = logging.getLogger(__name__)
+
+# Режимы проверки: повторить фразу, ответить на нее или любой из двух
+MODE_REPEAT = "repeat"
+MODE_REPLY = "reply"
+MODE_ANY = "any"
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+_END = ""
+_OPEN = "*"
+
+# Допустимый ответ, оканчивающийся на "...", продолжается словами пользователя ("my name is ...")
+OPEN_ANSWER_SUFFIX = "..."
+OPEN_ANSWER_MAX_WORDS = 3
+# Слова-паразиты, которые допускаются в начале и конце ответа
+FILLER_WORDS = frozenset({"um", "uh", "er", "erm", "hmm", "ah", "oh", "well", "so"})
+
+
+def normalize_text(text: str) -> str:
+    """Нормализует текст для сравнения: регистр, ё, пунктуация, пробелы."""
+    if not text:
+        return ""
+    return ' '.join(text.lower().replace('ё', 'е').translate(_PUNCTUATION).split())
+
+
+# Фонетический ключ: близкие по звучанию сочетания, затем согласные без повторов
+_PHONETIC_RULES = (("sch", "sk"), ("ph", "f"), ("ck", "k"), ("gh", "g"), ("wh", "w"),
+                   ("kn", "n"), ("wr", "r"), ("th", "t"), ("qu", "kw"), ("x", "ks"))
+_PHONETIC_MAP = str.maketrans("cqz", "kks")
+_VOWELS = frozenset("aeiouyаеиоуыэюя")
+
+# Вес коротких слов (артикли, предлоги) и лишних слов в ответе относительно важных слов
+SHORT_WORD_WEIGHT = 0.5
+EXTRA_WORD_WEIGHT = 0.25
+# Сходство слов с одинаковым звучанием, но разным написанием
+PHONETIC_SIMILARITY = 0.8
+
+
+def phonetic_key(word: str) -> str:
+    """Упрощенный фонетический ключ: mourning и morning, there и their совпадают."""
+    for pattern, replacement in _PHONETIC_RULES:
+        word = word.replace(pattern, replacement)
+    word = word.translate(_PHONETIC_MAP)
+    if not word:
+        return ""
+    key = [word[0]]
+    for char in word[1:]:
+        if char not in _VOWELS and char != key[-1]:
+            key.append(char)
+    return "".join(key)
+
+
+def bounded_levenshtein(a: str, b: str, cap: int) -> int:
+    """Расстояние Левенштейна; cap + 1, как только оно заведомо больше cap."""
+    if abs(len(a) - len(b)) > cap:
+        return cap + 1
+    # Каждый символ, которого нет во втором слове, требует хотя бы одной правки
+    chars_a, chars_b = set(a), set(b)
+    if len(chars_a - chars_b) > cap or len(chars_b - chars_a) > cap:
+        return cap + 1
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j - 1] + (char_a != char_b), current[j - 1] + 1, previous[j] + 1))
+        if min(current) > cap:
+            return cap + 1
+        previous = current
+    return min(previous[-1], cap + 1)
+
+
+def word_similarity(expected: str, expected_key: str, heard: str, heard_key: str) -> float:
+    """Сходство слов 0..1: опечатки до трети длины слова и совпадение по звучанию."""
+    if expected == heard:
+        return 1.0
+    longest = max(len(expected), len(heard))
+    cap = max(1, longest // 3)
+    distance = bounded_levenshtein(expected, heard, cap)
+    similarity = 1 - distance / longest if distance <= cap else 0.0
+    if similarity < PHONETIC_SIMILARITY and expected_key and expected_key == heard_key:
+        similarity = PHONETIC_SIMILARITY
+    return similarity
+
+
+class WordDiff(NamedTuple):
+    """Слово эталона и то, что сказал пользователь.
+
+    status: ok - совпало, close - опечатка или похожее звучание,
+    wrong - другое слово, missing - пропущено, extra - лишнее.
+    """
+    status: str
+    expected: Optional[str]
+    heard: Optional[str]
+
+
+class AnswerScore(NamedTuple):
+    """Результат проверки: оценка 0..1, зачтено ли, разбор по словам."""
+    score: float
+    passed: bool
+    diff: Tuple[WordDiff, ...] = ()
+    mode: str = MODE_REPEAT
+
+
+class AnswerMatcher:
+    """Проверка ответов на одну фразу, подготовленная заранее.
+
+    Эталон нормализуется один раз: хранятся его токены, их веса (короткие
+    слова весят меньше) и фонетические ключи. Ответ-повтор выравнивается
+    с эталоном по словам (динамическое программирование), слова
+    сравниваются ограниченным расстоянием Левенштейна и по звучанию,
+    поэтому одна ошибка распознавания не проваливает попытку. Допустимые
+    ответы ("fine", "my name is ...") собираются в префиксное дерево по
+    словам; ответ засчитывается, только если целиком совпадает с одним из
+    них (с точностью до слов-паразитов по краям), а ответ с "..." на конце
+    допускает еще до OPEN_ANSWER_MAX_WORDS слов.
+    """
+
+    __slots__ = ("reference", "tokens", "keys", "weights", "total_weight", "pass_score", "answers")
+
+    def __init__(self, reference: str, accepted_answers: Iterable[str] = (), pass_score: float = 0.8):
+        self.reference = normalize_text(reference)
+        self.tokens = tuple(self.reference.split())
+        self.keys = tuple(phonetic_key(token) for token in self.tokens)
+        if any(len(token) > 3 for token in self.tokens):
+            self.weights = tuple(1.0 if len(token) > 3 else SHORT_WORD_WEIGHT for token in self.tokens)
+        else:
+            self.weights = tuple(1.0 for _ in self.tokens)
+        self.total_weight = sum(self.weights)
+        self.pass_score = pass_score
+
+        self.answers: Dict[str, dict] = {}
+        for answer in accepted_answers:
+            node = self.answers
+            words = normalize_text(answer).split()
+            if not words:
+                continue
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_OPEN if answer.rstrip().endswith(OPEN_ANSWER_SUFFIX) else _END] = {}
+
+    def score_repeat(self, normalized: str, tokens: List[str]) -> AnswerScore:
+        """Оценка повтора фразы: выравнивание слов ответа с эталоном."""
+        if normalized == self.reference:
+            return AnswerScore(1.0, True, tuple(WordDiff("ok", token, token) for token in self.tokens))
+
+        expected, weights = self.tokens, self.weights
+        heard_keys = [phonetic_key(token) for token in tokens]
+        rows, cols = len(expected), len(tokens)
+
+        similarity = [[word_similarity(expected[i], self.keys[i], tokens[j], heard_keys[j])
+                       for j in range(cols)] for i in range(rows)]
+
+        # cost[i][j] - минимальная потеря веса при выравнивании expected[:i] и tokens[:j]
+        cost = [[j * EXTRA_WORD_WEIGHT for j in range(cols + 1)]]
+        for i in range(1, rows + 1):
+            weight = weights[i - 1]
+            row = [cost[i - 1][0] + weight]
+            previous = cost[i - 1]
+            sim_row = similarity[i - 1]
+            for j in range(1, cols + 1):
+                row.append(min(
+                    previous[j - 1] + weight * (1 - sim_row[j - 1]),
+                    previous[j] + weight,
+                    row[j - 1] + EXTRA_WORD_WEIGHT
+                ))
+            cost.append(row)
+
+        diff = []
+        matched = 0.0
+        extra = 0
+        i, j = rows, cols
+        while i or j:
+            if i and j and cost[i][j] == cost[i - 1][j - 1] + weights[i - 1] * (1 - similarity[i - 1][j - 1]):
+                sim = similarity[i - 1][j - 1]
+                status = "ok" if sim == 1.0 else "close" if sim > 0 else "wrong"
+                diff.append(WordDiff(status, expected[i - 1], tokens[j - 1]))
+                matched += weights[i - 1] * sim
+                i, j = i - 1, j - 1
+            elif i and cost[i][j] == cost[i - 1][j] + weights[i - 1]:
+                diff.append(WordDiff("missing", expected[i - 1], None))
+                i -= 1
+            else:
+                diff.append(WordDiff("extra", None, tokens[j - 1]))
+                extra += 1
+                j -= 1
+        diff.reverse()
+
+        denominator = self.total_weight + extra * EXTRA_WORD_WEIGHT
+        score = round(matched / denominator, 3) if denominator else 0.0
+        return AnswerScore(score, score >= self.pass_score, tuple(diff))
+
+    def matches_reply(self, tokens: List[str]) -> bool:
+        """Пользователь ответил на фразу: ответ совпадает с одним из допустимых ответов."""
+        if not self.answers:
+            return False
+        start, end = 0, len(tokens)
+        while start < end and tokens[start] in FILLER_WORDS:
+            start += 1
+        while end > start and tokens[end - 1] in FILLER_WORDS:
+            end -= 1
+
+        node = self.answers
+        for position in range(start, end):
+            node = node.get(tokens[position])
+            if node is None:
+                return False
+            if _OPEN in node and 0 < end - position - 1 <= OPEN_ANSWER_MAX_WORDS:
+                return True
+        return _END in node
+
+    def evaluate(self, user_answer: str, mode: str = MODE_REPEAT) -> AnswerScore:
+        """Оценка ответа в режиме repeat, reply или any."""
+        normalized = normalize_text(user_answer)
+        if not normalized:
+            return AnswerScore(0.0, False, mode=mode)
+        tokens = normalized.split()
+
+        result = AnswerScore(0.0, False, mode=mode)
+        if mode != MODE_REPLY:
+            result = self.score_repeat(normalized, tokens)
+            if result.passed:
+                return result
+        if mode != MODE_REPEAT and self.matches_reply(tokens):
+            return AnswerScore(1.0, True, mode=MODE_REPLY)
+        return result
+
+    def check(self, user_answer: str, mode: str = MODE_REPEAT) -> bool:
+        return self.evaluate(user_answer, mode).passed
+
+
+class AnswerMatcherCache:
+    """Подготовленные проверки для фраз каталога (LRU по тексту и допустимым ответам).
+
+    Ключ - содержимое фразы, поэтому после изменения phrases.json
+    проверка пересобирается автоматически. compile_all() готовит проверки
+    для всего каталога при запуске, если он помещается в кэш.
+    """
+
+    def __init__(self, catalog: PhraseCatalog, cache_size: int, pass_score: float):
+        self.catalog = catalog
+        self.cache_size = cache_size
+        self.pass_score = pass_score
+        self._matchers: "OrderedDict[Tuple[str, Tuple[str, ...]], AnswerMatcher]" = OrderedDict()
+        self.stats = {"hits": 0, "compiled": 0}
+
+    def _get(self, reference: str, accepted_answers: Tuple[str, ...]) -> AnswerMatcher:
+        key = (reference, accepted_answers)
+        matcher = self._matchers.get(key)
+        if matcher is not None:
+            self._matchers.move_to_end(key)
+            self.stats["hits"] += 1
+            return matcher
+
+        matcher = AnswerMatcher(reference, accepted_answers, self.pass_score)
+        self.stats["compiled"] += 1
+        self._matchers[key] = matcher
+        while len(self._matchers) > self.cache_size:
+            self._matchers.popitem(last=False)
+        return matcher
+
+    def get(self, phrase_id: Optional[str], reference: str) -> AnswerMatcher:
+        """Проверка для фразы; без phrase_id (или при расхождении текста) - только по эталону."""
+        phrase = self.catalog.get(phrase_id) if phrase_id else None
+        if phrase is not None and phrase.text == reference:
+            return self._get(phrase.text, phrase.correct_answers)
+        return self._get(reference, ())
+
+    def compile_all(self) -> int:
+        """Подготовка проверок для всех фраз каталога (при запуске)."""
+        if len(self.catalog) > self.cache_size:
+            logger.info("Каталог фраз больше кэша проверок, проверки готовятся по запросу")
+            return 0
+        for phrase in self.catalog.iter_phrases():
+            self._get(phrase.text, phrase.correct_answers)
+        logger.info(f"Подготовлены проверки ответов: {len(self._matchers)} фраз")
+        return len(self._matchers)
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["cached"] = len(self._matchers)
+        return stats
+
+
+# Глобальный кэш проверок ответов
+answer_matchers = AnswerMatcherCache(
+    phrase_catalog,
+    cache_size=config.PHRASE_CACHE_SIZE,
+    pass_score=config.ANSWER_PASS_SCORE
+)
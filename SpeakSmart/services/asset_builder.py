@@ -0,0 +1,173 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, Protocol
+
+import numpy as np
+
+from services.audio_pipeline import encode_ogg_opus
+from services.audio_assets import MANIFEST_VERSION, load_manifest, probe_duration
+from services.media_cache import file_content_hash
+from services.phrase_catalog import Phrase
+
+logger = logging.getLogger(__name__)
+
+
+class TTSEngine(Protocol):
+    """Движок синтеза речи: текст -> аудио в любом формате, который читает ffmpeg."""
+
+    name: str
+
+    def render(self, text: str, language: str, voice: str, slow: bool) -> bytes:
+        ...
+
+
+class GTTSEngine:
+    """Google TTS (gTTS); voice - домен Google (tld), задающий акцент: com, co.uk..."""
+
+    name = "gtts"
+
+    def render(self, text: str, language: str, voice: str, slow: bool) -> bytes:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, tld=voice or "com", slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class ToneEngine:
+    """Локальная замена TTS без сети: каждое слово - тон, зависящий от слова.
+
+    Результат детерминирован, поэтому подходит для проверки сборки офлайн.
+    """
+
+    name = "tone"
+    sample_rate = 16000
+
+    def render(self, text: str, language: str, voice: str, slow: bool) -> bytes:
+        word_seconds = 0.4 if slow else 0.25
+        gap = np.zeros(int(self.sample_rate * 0.08), dtype=np.float32)
+        t = np.arange(int(self.sample_rate * word_seconds)) / self.sample_rate
+        envelope = np.hanning(len(t)).astype(np.float32)
+
+        parts = [gap]
+        for word in text.split() or [text]:
+            seed = int(hashlib.sha1(f"{language}:{voice}:{word}".encode()).hexdigest()[:4], 16)
+            frequency = 200 + seed % 600
+            parts.append((np.sin(2 * np.pi * frequency * t) * envelope * 0.5).astype(np.float32))
+            parts.append(gap)
+
+        pcm = (np.concatenate(parts) * 32767).astype(np.int16).tobytes()
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm)
+        return buffer.getvalue()
+
+
+ENGINES = {
+    GTTSEngine.name: GTTSEngine,
+    ToneEngine.name: ToneEngine,
+}
+
+
+def synthesis_key(engine: str, text: str, language: str, voice: str, slow: bool) -> str:
+    """Хэш параметров синтеза: одинаковый ключ - одинаковое аудио."""
+    key = json.dumps([engine, text, language, voice, slow], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetBuilder:
+    """Инкрементальная сборка аудио фраз в формате голосовых сообщений.
+
+    Для каждой фразы считается хэш (движок, текст, язык, голос, скорость);
+    синтезируются только фразы, хэш которых изменился или файл пропал.
+    Синтез и перекодирование в OGG/Opus выполняются в пуле из workers
+    потоков. Итог записывается в манифест, который бот читает при запуске.
+    """
+
+    def __init__(self, engine: TTSEngine, output_dir: Path, manifest_file: Path,
+                 language: str, voice: str, slow: bool = False, workers: int = 4):
+        self.engine = engine
+        self.output_dir = Path(output_dir)
+        self.manifest_file = Path(manifest_file)
+        self.language = language
+        self.voice = voice
+        self.slow = slow
+        self.workers = workers
+
+    def build_hash(self, text: str) -> str:
+        return synthesis_key(self.engine.name, text, self.language, self.voice, self.slow)
+
+    def _render(self, phrase: Phrase, build_hash: str) -> dict:
+        audio = self.engine.render(phrase.text, self.language, self.voice, self.slow)
+        path = self.output_dir / f"{phrase.id}.ogg"
+        write_atomic(path, encode_ogg_opus(audio))
+        return {
+            "file": path.name,
+            "build_hash": build_hash,
+            "text": phrase.text,
+            "engine": self.engine.name,
+            "language": self.language,
+            "voice": self.voice,
+            "slow": self.slow,
+            "size": path.stat().st_size,
+            "content_hash": file_content_hash(path),
+            "duration": probe_duration(path),
+        }
+
+    def build(self, phrases: Iterable[Phrase], force: bool = False) -> Dict[str, float]:
+        """Сборка аудио для фраз. Возвращает счетчики rendered/skipped/failed."""
+        started = time.perf_counter()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest = load_manifest(self.manifest_file)
+        assets = manifest["assets"]
+        stats = {"rendered": 0, "skipped": 0, "failed": 0}
+
+        pending = {}
+        for phrase in phrases:
+            build_hash = self.build_hash(phrase.text)
+            entry = assets.get(phrase.id)
+            if (not force and entry and entry.get("build_hash") == build_hash
+                    and (self.output_dir / entry["file"]).exists()):
+                stats["skipped"] += 1
+                continue
+            pending[phrase.id] = (phrase, build_hash)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="asset-build") as executor:
+            futures = {
+                executor.submit(self._render, phrase, build_hash): phrase
+                for phrase, build_hash in pending.values()
+            }
+            for future in as_completed(futures):
+                phrase = futures[future]
+                try:
+                    assets[phrase.id] = future.result()
+                    stats["rendered"] += 1
+                    logger.info(f"Собрано аудио: {phrase.id} - {phrase.text}")
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(f"Ошибка сборки аудио {phrase.id}: {e}")
+
+        manifest["version"] = MANIFEST_VERSION
+        write_atomic(self.manifest_file,
+                      json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8"))
+
+        stats["seconds"] = round(time.perf_counter() - started, 2)
+        logger.info(f"Сборка аудио завершена: {stats}")
+        return stats
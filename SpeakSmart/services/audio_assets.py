@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config import config
+from services.audio_pipeline import av
+from services.media_cache import file_content_hash
+from services.phrase_catalog import Phrase
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Форматы аудио фраз в порядке предпочтения: OGG/Opus отправляется как голосовое без перекодирования
+ASSET_FORMATS = ("ogg", "mp3", "wav")
+
+
+class AudioAsset(NamedTuple):
+    """Аудиофайл фразы с метаданными."""
+    phrase_id: str
+    path: Path
+    format: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    duration: Optional[float]
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    """Длительность аудио в секундах (через PyAV); None, если определить не удалось."""
+    if av is None:
+        return None
+    try:
+        with av.open(str(path)) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = container.streams.audio[0]
+            if stream.duration is not None and stream.time_base is not None:
+                return float(stream.duration * stream.time_base)
+    except Exception as e:
+        logger.warning(f"Не удалось определить длительность {path.name}: {e}")
+    return None
+
+
+def load_manifest(manifest_file: Path) -> dict:
+    """Манифест собранных аудио (build_audio_assets.py); пустой, если файла нет или он поврежден."""
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("assets"), dict):
+            return manifest
+    except (OSError, ValueError, AttributeError) as e:
+        if Path(manifest_file).exists():
+            logger.warning(f"Манифест аудио не прочитан: {e}")
+    return {"version": MANIFEST_VERSION, "assets": {}}
+
+
+class AudioAssetIndex:
+    """Индекс аудиофайлов фраз: phrase_id -> метаданные файла.
+
+    Строится один раз при старте из AUDIO_PHRASES_DIR и затем обновляется
+    фоновым потоком: файлы с прежними mtime и размером не перечитываются,
+    хэш и длительность считаются только для новых и измененных. Запросы
+    обслуживаются из памяти без обращения к файловой системе. Длительность
+    берется из манифеста сборки, если хэш файла совпадает с записанным.
+    """
+
+    def __init__(self, directory: Path, poll_interval: float, manifest_file: Path = None):
+        self.directory = Path(directory)
+        self.poll_interval = poll_interval
+        self.manifest_file = Path(manifest_file) if manifest_file else self.directory / "manifest.json"
+        self._manifest: Dict[str, dict] = {}
+        self._assets: Dict[str, AudioAsset] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "refreshes": 0,
+            "assets": 0,
+            "hashed": 0,
+            "last_refresh_ms": 0.0,
+        }
+
+    def get(self, phrase_id: str) -> Optional[AudioAsset]:
+        return self._assets.get(phrase_id)
+
+    def missing(self, phrase_ids: Iterable[str]) -> List[str]:
+        """Фразы, для которых нет аудиофайла."""
+        assets = self._assets
+        return [phrase_id for phrase_id in phrase_ids if phrase_id not in assets]
+
+    def stale(self, phrases: Iterable[Phrase]) -> List[str]:
+        """Фразы, текст которых изменился после сборки аудио (по манифесту)."""
+        manifest = self._manifest
+        return [
+            phrase.id for phrase in phrases
+            if phrase.id in manifest and manifest[phrase.id].get("text") != phrase.text
+        ]
+
+    def _scan(self) -> Dict[str, Tuple[Path, str, os.stat_result]]:
+        """Лучший по формату файл для каждой фразы: phrase_id -> (путь, формат, stat)."""
+        found: Dict[str, Tuple[Path, str, os.stat_result]] = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            logger.error(f"Каталог аудио фраз недоступен: {e}")
+            return found
+
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            phrase_id, _, extension = entry.name.rpartition(".")
+            fmt = extension.lower()
+            if not phrase_id or fmt not in ASSET_FORMATS:
+                continue
+            current = found.get(phrase_id)
+            if current is None or ASSET_FORMATS.index(fmt) < ASSET_FORMATS.index(current[1]):
+                found[phrase_id] = (Path(entry.path), fmt, entry.stat())
+        return found
+
+    def refresh(self) -> Tuple[int, int, int]:
+        """Обновление индекса. Возвращает (добавлено, изменено, удалено)."""
+        with self._lock:
+            started = time.perf_counter()
+            previous = self._assets
+            self._manifest = load_manifest(self.manifest_file)["assets"]
+            assets: Dict[str, AudioAsset] = {}
+            added = updated = hashed = 0
+
+            for phrase_id, (path, fmt, stat) in self._scan().items():
+                old = previous.get(phrase_id)
+                if old and (old.path, old.mtime_ns, old.size) == (path, stat.st_mtime_ns, stat.st_size):
+                    assets[phrase_id] = old
+                    continue
+                try:
+                    content_hash = file_content_hash(path)
+                except OSError as e:
+                    logger.warning(f"Не удалось прочитать аудио {path.name}: {e}")
+                    continue
+                hashed += 1
+                built = self._manifest.get(phrase_id)
+                if built and built.get("file") == path.name and built.get("content_hash") == content_hash:
+                    duration = built.get("duration")
+                else:
+                    duration = probe_duration(path)
+                assets[phrase_id] = AudioAsset(phrase_id, path, fmt, stat.st_size, stat.st_mtime_ns,
+                                               content_hash, duration)
+                if old:
+                    updated += 1
+                else:
+                    added += 1
+
+            removed = len(previous.keys() - assets.keys())
+            self._assets = assets
+
+            self.stats["refreshes"] += 1
+            self.stats["assets"] = len(assets)
+            self.stats["hashed"] += hashed
+            self.stats["last_refresh_ms"] = (time.perf_counter() - started) * 1000
+
+        if added or updated or removed:
+            logger.info(f"Индекс аудио фраз обновлен: +{added}, изменено {updated}, -{removed}, "
+                        f"всего {len(assets)} за {self.stats['last_refresh_ms']:.0f} мс")
+        return added, updated, removed
+
+    def start(self):
+        """Запуск фонового отслеживания каталога."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name="audio-assets-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка фонового отслеживания."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка обновления индекса аудио фраз: {e}")
+
+
+# Глобальный индекс аудио фраз
+audio_assets = AudioAssetIndex(
+    config.AUDIO_PHRASES_DIR,
+    config.AUDIO_ASSETS_POLL_INTERVAL,
+    manifest_file=config.AUDIO_MANIFEST_FILE
+)
@@ -0,0 +1,191 @@
+import io
+import logging
+import subprocess
+import tempfile
+from typing import BinaryIO
+
+import numpy as np
+
+from config import config
+
+try:
+    import av
+except ImportError:  # PyAV не установлен - декодируем через ffmpeg
+    av = None
+
+logger = logging.getLogger(__name__)
+
+# Формат PCM, который получают распознаватели: 16 кГц, моно, 16 бит
+PCM_SAMPLE_RATE = 16000
+PCM_SAMPLE_WIDTH = 2
+
+# Параметры голосовых сообщений Telegram: OGG/Opus, моно
+VOICE_SAMPLE_RATE = 48000
+VOICE_BITRATE = 32000
+
+
+class AudioDecodeError(Exception):
+    """Ошибка декодирования аудио."""
+
+
+def new_voice_buffer() -> tempfile.SpooledTemporaryFile:
+    """Буфер для скачивания голосового сообщения.
+
+    Данные хранятся в памяти и сбрасываются на диск только если размер
+    превышает VOICE_SPILL_THRESHOLD.
+    """
+    return tempfile.SpooledTemporaryFile(
+        max_size=config.VOICE_SPILL_THRESHOLD,
+        dir=config.TEMP_AUDIO_DIR
+    )
+
+
+def read_buffer(buffer: BinaryIO) -> bytes:
+    """Чтение всего содержимого буфера с начала."""
+    buffer.seek(0)
+    return buffer.read()
+
+
+def decode_ogg_to_pcm(data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """Декодирует OGG/Opus в PCM s16le моно через каналы ffmpeg, без временных файлов."""
+    if not data:
+        raise AudioDecodeError("пустые аудиоданные")
+
+    try:
+        process = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ac", "1", "-ar", str(sample_rate),
+                "pipe:1"
+            ],
+            input=data,
+            capture_output=True,
+            check=False
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg не найден")
+    if process.returncode != 0:
+        raise AudioDecodeError(process.stderr.decode(errors="replace").strip())
+    return process.stdout
+
+
+def _lowpass_kernel(cutoff: float, taps: int = 63) -> np.ndarray:
+    """FIR-фильтр нижних частот (windowed sinc); cutoff - доля частоты дискретизации."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Передискретизация моно-сигнала float32 средствами NumPy.
+
+    При понижении частоты сигнал сначала пропускается через фильтр нижних
+    частот (против алиасинга). Для целого коэффициента (48 -> 16 кГц)
+    фильтр считается только в нужных точках, иначе - линейная интерполяция.
+    """
+    if src_rate == dst_rate or samples.size == 0:
+        return samples
+
+    if src_rate > dst_rate:
+        kernel = _lowpass_kernel(0.5 * dst_rate / src_rate)
+        if src_rate % dst_rate == 0:
+            step = src_rate // dst_rate
+            padded = np.pad(samples, (len(kernel) // 2, len(kernel) // 2))
+            windows = np.lib.stride_tricks.sliding_window_view(padded, len(kernel))[::step]
+            return windows @ kernel[::-1]
+        samples = np.convolve(samples, kernel, mode="same")
+
+    n_out = int(len(samples) * dst_rate / src_rate)
+    positions = np.arange(n_out) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _frame_to_mono(frame) -> np.ndarray:
+    """Кадр PyAV -> моно float32 в диапазоне [-1, 1]."""
+    data = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if frame.format.is_planar:
+        data = data.reshape(channels, -1)
+    else:
+        data = data.reshape(-1, channels).T
+
+    if data.dtype.kind == "i":
+        data = data.astype(np.float32) / float(np.iinfo(data.dtype).max)
+    else:
+        data = data.astype(np.float32)
+    return data.mean(axis=0)
+
+
+def _decode_any_with_av(data: bytes, sample_rate: int) -> np.ndarray:
+    try:
+        with av.open(io.BytesIO(data)) as container:
+            stream = container.streams.audio[0]
+            source_rate = stream.rate or stream.codec_context.sample_rate
+            frames = [_frame_to_mono(frame) for frame in container.decode(stream)]
+    except (av.error.FFmpegError, IndexError) as e:
+        raise AudioDecodeError(str(e) or "нет аудиопотока")
+    if not frames:
+        raise AudioDecodeError("аудиопоток пуст")
+    return resample(np.concatenate(frames), source_rate, sample_rate)
+
+
+def decode_with_av(data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """Декодирует OGG/Opus в PCM s16le моно внутри процесса (PyAV), без запуска ffmpeg."""
+    samples = _decode_any_with_av(data, sample_rate)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def decode_voice(data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """OGG/Opus -> PCM s16le моно: PyAV, если установлен, иначе ffmpeg."""
+    if not data:
+        raise AudioDecodeError("пустые аудиоданные")
+    if av is not None:
+        return decode_with_av(data, sample_rate)
+    return decode_ogg_to_pcm(data, sample_rate)
+
+
+def encode_ogg_opus(data: bytes, bitrate: int = VOICE_BITRATE) -> bytes:
+    """Перекодирует аудио любого поддерживаемого формата (mp3, wav...) в OGG/Opus моно."""
+    if not data:
+        raise AudioDecodeError("пустые аудиоданные")
+
+    if av is None:
+        try:
+            process = subprocess.run(
+                [
+                    "ffmpeg", "-hide_banner", "-loglevel", "error",
+                    "-i", "pipe:0",
+                    "-ac", "1", "-ar", str(VOICE_SAMPLE_RATE),
+                    "-c:a", "libopus", "-b:a", str(bitrate),
+                    "-f", "ogg", "pipe:1"
+                ],
+                input=data,
+                capture_output=True,
+                check=False
+            )
+        except FileNotFoundError:
+            raise AudioDecodeError("ffmpeg не найден")
+        if process.returncode != 0:
+            raise AudioDecodeError(process.stderr.decode(errors="replace").strip())
+        return process.stdout
+
+    samples = _decode_any_with_av(data, VOICE_SAMPLE_RATE)
+    frame_size = 960  # 20 мс при 48 кГц
+    output = io.BytesIO()
+    with av.open(output, "w", format="ogg") as container:
+        stream = container.add_stream("libopus", rate=VOICE_SAMPLE_RATE)
+        stream.bit_rate = bitrate
+        stream.layout = "mono"
+        for start in range(0, len(samples), frame_size):
+            chunk = samples[start:start + frame_size]
+            frame = av.AudioFrame.from_ndarray(chunk.reshape(1, -1).astype(np.float32),
+                                               format="flt", layout="mono")
+            frame.sample_rate = VOICE_SAMPLE_RATE
+            frame.pts = start
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output.getvalue()
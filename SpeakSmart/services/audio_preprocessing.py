@@ -0,0 +1,145 @@
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from config import config
+from services.audio_pipeline import PCM_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Минимальная энергия кадра (RMS), которая может считаться речью
+_MIN_SPEECH_RMS = 100.0
+_MAX_GAIN = 10.0
+_INT16_PEAK = 32767.0
+
+
+def frame_rms(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS каждого полного кадра длиной frame_len отсчетов."""
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def speech_threshold(rms: np.ndarray) -> float:
+    """Порог энергии речи: заметно выше шума (10-й перцентиль энергии кадров)."""
+    noise_floor = float(np.percentile(rms, 10))
+    return max(noise_floor * 2.0, noise_floor + 0.1 * (float(rms.max()) - noise_floor), _MIN_SPEECH_RMS)
+
+
+def trim_and_normalize(pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE, frame_ms: int = 20,
+                       padding_ms: int = 200, target_dbfs: float = -20.0) -> bytes:
+    """Обрезает тишину в начале и конце PCM s16le и выравнивает громкость.
+
+    Уровень шума оценивается как 10-й перцентиль энергии кадров; речью
+    считаются кадры заметно громче шума. Если речь не найдена, данные
+    возвращаются без изменений - решение остается за распознавателем.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frame_len = max(sample_rate * frame_ms // 1000, 1)
+    if len(samples) < frame_len:
+        return pcm
+
+    rms = frame_rms(samples, frame_len)
+    voiced = np.flatnonzero(rms > speech_threshold(rms))
+    if voiced.size == 0:
+        return pcm
+
+    padding = sample_rate * padding_ms // 1000
+    start = max(int(voiced[0]) * frame_len - padding, 0)
+    end = min((int(voiced[-1]) + 1) * frame_len + padding, len(samples))
+    speech = samples[start:end].astype(np.float32)
+
+    # Выравниваем громкость по RMS, не допуская клиппинга
+    speech_rms = float(np.sqrt(np.mean(speech * speech)))
+    peak = float(np.abs(speech).max())
+    if speech_rms > 0 and peak > 0:
+        target_rms = _INT16_PEAK * 10 ** (target_dbfs / 20)
+        gain = min(target_rms / speech_rms, _INT16_PEAK / peak, _MAX_GAIN)
+        speech *= gain
+
+    return np.clip(speech, -32768, 32767).astype(np.int16).tobytes()
+
+
+def split_on_silence(pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE, max_chunk_ms: int = 15000,
+                     min_silence_ms: int = 300, frame_ms: int = 20) -> List[bytes]:
+    """Делит PCM s16le на части не длиннее max_chunk_ms по паузам в речи.
+
+    Разрез делается посередине паузы не короче min_silence_ms, ближайшей
+    к концу допустимого окна. Если в окне пауз нет, режем по самому тихому
+    кадру второй половины окна, чтобы не разрывать слово посередине.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frame_len = max(sample_rate * frame_ms // 1000, 1)
+    max_frames = max(max_chunk_ms // frame_ms, 1)
+    if len(samples) <= max_frames * frame_len:
+        return [pcm]
+
+    rms = frame_rms(samples, frame_len)
+    silent = rms <= speech_threshold(rms)
+    n_frames = len(rms)
+
+    # Середины достаточно длинных пауз - возможные точки разреза
+    min_run = max(min_silence_ms // frame_ms, 1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)
+    cuts = np.array([(a + b) // 2 for a, b in runs if b - a >= min_run], dtype=np.int64)
+
+    boundaries = [0]
+    start = 0
+    while n_frames - start > max_frames:
+        limit = start + max_frames
+        inside = cuts[(cuts > start) & (cuts <= limit)]
+        if inside.size:
+            cut = int(inside[-1])
+        else:
+            half = start + max_frames // 2
+            cut = half + int(np.argmin(rms[half:limit]))
+            cut = max(cut, start + 1)
+        boundaries.append(cut)
+        start = cut
+
+    byte_bounds = [b * frame_len * 2 for b in boundaries] + [len(pcm)]
+    return [pcm[a:b] for a, b in zip(byte_bounds, byte_bounds[1:]) if b > a]
+
+
+class AudioPreprocessor:
+    """Предобработка PCM перед отправкой в STT со счетчиком сэкономленных байт."""
+
+    def __init__(self, frame_ms: int, padding_ms: int, target_dbfs: float):
+        self.frame_ms = frame_ms
+        self.padding_ms = padding_ms
+        self.target_dbfs = target_dbfs
+        self._lock = threading.Lock()
+        self.stats = {"clips": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def process(self, pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+        """Обрезка тишины и нормализация; безопасно вызывать из рабочих потоков."""
+        try:
+            result = trim_and_normalize(pcm, sample_rate, self.frame_ms, self.padding_ms, self.target_dbfs)
+        except Exception as e:
+            logger.warning(f"Ошибка предобработки аудио, используется исходное: {e}")
+            result = pcm
+
+        with self._lock:
+            self.stats["clips"] += 1
+            self.stats["bytes_in"] += len(pcm)
+            self.stats["bytes_out"] += len(result)
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        """Сколько байт аудио ушло в STT относительно исходного объема."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+        stats["reduction"] = stats["bytes_saved"] / stats["bytes_in"] if stats["bytes_in"] else 0.0
+        return stats
+
+
+# Глобальный экземпляр предобработки
+audio_preprocessor = AudioPreprocessor(
+    frame_ms=config.VAD_FRAME_MS,
+    padding_ms=config.VAD_PADDING_MS,
+    target_dbfs=config.VAD_TARGET_DBFS
+)
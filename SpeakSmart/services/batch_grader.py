@@ -0,0 +1,127 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from services.answer_matcher import AnswerMatcher, normalize_text
+from services.database import Database
+from services.phrase_catalog import PhraseCatalog
+
+logger = logging.getLogger(__name__)
+
+# Группа ответов на одну фразу: (текст фразы, допустимые ответы, [(session_id, ответ)])
+GradeGroup = Tuple[str, Tuple[str, ...], List[Tuple[int, str]]]
+
+# Подготовленные проверки внутри процесса пула: каждая фраза компилируется один раз
+_worker_matchers: Dict[Tuple[str, Tuple[str, ...]], AnswerMatcher] = {}
+
+
+def grade_groups(groups: List[GradeGroup], mode: str, pass_score: float) -> List[Tuple[int, float, bool, str]]:
+    """Проверка групп ответов (выполняется в процессе пула).
+
+    Одинаковые после нормализации ответы на одну фразу оцениваются один раз.
+    Возвращает (session_id, оценка, зачтено, режим).
+    """
+    results = []
+    for reference, answers, rows in groups:
+        key = (reference, answers)
+        matcher = _worker_matchers.get(key)
+        if matcher is None or matcher.pass_score != pass_score:
+            matcher = _worker_matchers[key] = AnswerMatcher(reference, answers, pass_score)
+
+        graded: Dict[str, Tuple[float, bool, str]] = {}
+        for session_id, response in rows:
+            normalized = normalize_text(response)
+            grade = graded.get(normalized)
+            if grade is None:
+                result = matcher.evaluate(normalized, mode)
+                grade = graded[normalized] = (result.score, result.passed, result.mode)
+            results.append((session_id, *grade))
+    return results
+
+
+class BatchGrader:
+    """Повторная проверка истории ответов (practice_sessions) по текущим правилам.
+
+    Сессии читаются порциями по chunk_size строк по возрастанию session_id,
+    поэтому память не зависит от размера таблицы. Порция группируется по
+    phrase_id и делится между процессами пула; в работе одновременно не
+    больше max_inflight порций. Результаты пишутся в practice_grades.
+    """
+
+    def __init__(self, database: Database, catalog: PhraseCatalog, workers: int, chunk_size: int,
+                 mode: str, pass_score: float):
+        self.database = database
+        self.catalog = catalog
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.pass_score = pass_score
+        self.max_inflight = workers * 2
+
+    def _split(self, rows: List[tuple]) -> Tuple[List[List[GradeGroup]], int]:
+        """Группировка порции по фразам и раскладка групп по процессам. Возвращает (пакеты, пропущено)."""
+        by_phrase: Dict[str, List[Tuple[int, str]]] = {}
+        skipped = 0
+        for session_id, phrase_id, response, _ in rows:
+            if not phrase_id or not response:
+                skipped += 1
+                continue
+            by_phrase.setdefault(phrase_id, []).append((session_id, response))
+
+        batches: List[List[GradeGroup]] = [[] for _ in range(self.workers)]
+        sizes = [0] * self.workers
+        for phrase_id, sessions in sorted(by_phrase.items(), key=lambda item: -len(item[1])):
+            phrase = self.catalog.get(phrase_id)
+            if phrase is None:
+                skipped += len(sessions)
+                continue
+            target = sizes.index(min(sizes))
+            batches[target].append((phrase.text, phrase.correct_answers, sessions))
+            sizes[target] += len(sessions)
+        return [batch for batch in batches if batch], skipped
+
+    def _collect(self, futures: List[Future], previous: Dict[int, bool], stats: Dict[str, float]):
+        graded_at = time.time()
+        rows = []
+        for future in futures:
+            for session_id, score, passed, mode in future.result():
+                rows.append((session_id, score, passed, mode, graded_at))
+                if bool(previous.get(session_id)) != passed:
+                    stats["changed"] += 1
+        self.database.save_practice_grades(rows)
+        stats["graded"] += len(rows)
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, float]:
+        """Проверка всех (или первых limit) сессий. Возвращает счетчики и скорость."""
+        started = time.perf_counter()
+        stats = {"rows": 0, "graded": 0, "skipped": 0, "changed": 0}
+        inflight: Deque[Tuple[List[Future], Dict[int, bool]]] = deque()
+        last_id = 0
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while limit is None or stats["rows"] < limit:
+                size = self.chunk_size if limit is None else min(self.chunk_size, limit - stats["rows"])
+                rows = self.database.get_practice_sessions_after(last_id, size)
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                stats["rows"] += len(rows)
+
+                batches, skipped = self._split(rows)
+                stats["skipped"] += skipped
+                futures = [executor.submit(grade_groups, batch, self.mode, self.pass_score) for batch in batches]
+                inflight.append((futures, {row[0]: row[3] for row in rows}))
+
+                while len(inflight) >= self.max_inflight:
+                    self._collect(*inflight.popleft(), stats)
+                logger.info(f"Прочитано сессий: {stats['rows']}, проверено: {stats['graded']}")
+
+            while inflight:
+                self._collect(*inflight.popleft(), stats)
+
+        stats["seconds"] = round(time.perf_counter() - started, 2)
+        stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"]) if stats["seconds"] else 0
+        logger.info(f"Повторная проверка завершена: {stats}")
+        return stats
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import config
+from services.audio_preprocessing import split_on_silence
+from services.recognition_executor import recognition_executor
+
+logger = logging.getLogger(__name__)
+
+# Распознавание одной части: (pcm, sample_rate) -> текст или None
+ChunkRecognizer = Callable[[bytes, int], Awaitable[Optional[str]]]
+# Уведомление о промежуточном результате: текст, собранный по порядку
+PartialCallback = Callable[[str], Awaitable[None]]
+
+
+class ChunkedRecognizer:
+    """Распознавание длинных голосовых сообщений по частям.
+
+    Аудио делится по паузам на части не длиннее max_chunk_ms, части
+    распознаются параллельно (не больше max_parallel на одно сообщение),
+    тексты склеиваются в исходном порядке. Как только готово начало
+    сообщения, собранный текст передается в on_partial. Короткое аудио
+    распознается одним запросом, как раньше. Если хотя бы одна часть
+    завершилась ошибкой, остальные отменяются и ошибка пробрасывается:
+    текст с пропуском в середине не возвращается и не попадает в кэш.
+    """
+
+    def __init__(self, max_chunk_ms: int, min_silence_ms: int, max_parallel: int):
+        self.max_chunk_ms = max_chunk_ms
+        self.min_silence_ms = min_silence_ms
+        self.max_parallel = max_parallel
+        self.stats = {
+            "single_shot": 0,
+            "chunked": 0,
+            "chunks": 0,
+            "failed_chunks": 0,
+            "empty_chunks": 0,
+            "single_total_ms": 0.0,
+            "chunked_first_text_ms": 0.0,
+            "chunked_total_ms": 0.0,
+        }
+
+    async def recognize(self, pcm: bytes, sample_rate: int, recognize_chunk: ChunkRecognizer,
+                        on_partial: PartialCallback = None) -> Optional[str]:
+        started = time.perf_counter()
+        chunks = await recognition_executor.run_in_thread(
+            split_on_silence, pcm, sample_rate, self.max_chunk_ms, self.min_silence_ms
+        )
+
+        if len(chunks) == 1:
+            text = await recognize_chunk(pcm, sample_rate)
+            self.stats["single_shot"] += 1
+            self.stats["single_total_ms"] += (time.perf_counter() - started) * 1000
+            return text
+
+        logger.info(f"Аудио {len(pcm)} bytes разбито на {len(chunks)} частей")
+        results: List[Optional[str]] = [None] * len(chunks)
+        first_text_ms = await self._recognize_chunks(chunks, sample_rate, recognize_chunk,
+                                                     on_partial, started, results)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        self.stats["chunked"] += 1
+        self.stats["chunks"] += len(chunks)
+        self.stats["chunked_first_text_ms"] += first_text_ms if first_text_ms is not None else total_ms
+        self.stats["chunked_total_ms"] += total_ms
+
+        text = " ".join(part for part in results if part)
+        return text or None
+
+    async def _recognize_chunks(self, chunks: List[bytes], sample_rate: int,
+                                recognize_chunk: ChunkRecognizer, on_partial: Optional[PartialCallback],
+                                started: float, results: List[Optional[str]]) -> Optional[float]:
+        """Параллельное распознавание частей; возвращает время до первого текста (мс)."""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        done = [False] * len(chunks)
+        emitted = 0
+        first_text_ms = None
+
+        async def run(index: int, chunk: bytes):
+            async with semaphore:
+                try:
+                    return index, await recognize_chunk(chunk, sample_rate)
+                except Exception as e:
+                    self.stats["failed_chunks"] += 1
+                    logger.error(f"Ошибка распознавания части {index + 1}/{len(chunks)}: {e}")
+                    raise
+
+        tasks = [asyncio.create_task(run(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, text = await next_done
+                results[index] = text
+                done[index] = True
+                if not text:
+                    self.stats["empty_chunks"] += 1
+
+                # Промежуточный результат - только непрерывное начало сообщения
+                ready = emitted
+                while ready < len(chunks) and done[ready]:
+                    ready += 1
+                if ready == emitted:
+                    continue
+                emitted = ready
+
+                prefix = " ".join(part for part in results[:ready] if part)
+                if prefix and first_text_ms is None:
+                    first_text_ms = (time.perf_counter() - started) * 1000
+                if prefix and on_partial is not None and ready < len(chunks):
+                    try:
+                        await on_partial(prefix)
+                    except Exception as e:
+                        logger.warning(f"Ошибка обработки промежуточного результата: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return first_text_ms
+
+    def get_stats(self) -> Dict[str, float]:
+        """Средние задержки: одним запросом и по частям (до первого текста и полная)."""
+        stats = dict(self.stats)
+        single, chunked = stats["single_shot"], stats["chunked"]
+        stats["single_avg_ms"] = stats["single_total_ms"] / single if single else 0.0
+        stats["chunked_avg_first_text_ms"] = stats["chunked_first_text_ms"] / chunked if chunked else 0.0
+        stats["chunked_avg_total_ms"] = stats["chunked_total_ms"] / chunked if chunked else 0.0
+        return stats
+
+
+# Глобальный сервис распознавания по частям
+chunked_recognizer = ChunkedRecognizer(
+    max_chunk_ms=config.STT_CHUNK_MAX_MS,
+    min_silence_ms=config.STT_CHUNK_MIN_SILENCE_MS,
+    max_parallel=config.STT_CHUNK_PARALLEL
+)
@@ -1,81 +1,411 @@
 import sqlite3
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Запросы для пакетной вставки через буфер отложенной записи
+BATCH_INSERTS = {
+    "practice_sessions": '''
+        INSERT INTO practice_sessions (user_id, phrase_id, user_response, is_correct)
+        VALUES (?, ?, ?, ?)
+    ''',
+    "error_logs": '''
+        INSERT INTO error_logs (user_id, error_message, stack_trace)
+        VALUES (?, ?, ?)
+    ''',
+}
+
+# Повторы группового сброса при занятой базе; затем строки пишутся по одной
+FLUSH_RETRIES = 3
+FLUSH_RETRY_DELAY = 0.1
+
+
+# Инкрементальное обновление сводной статистики при каждой вставке в practice_sessions
+USER_STATS_UPSERT = '''
+    INSERT INTO user_stats (user_id, total, correct, current_streak, best_streak, last_seen)
+    VALUES (?, 1, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total = total + 1,
+        correct = correct + excluded.correct,
+        current_streak = CASE WHEN excluded.correct THEN current_streak + 1 ELSE 0 END,
+        best_streak = MAX(best_streak, CASE WHEN excluded.correct THEN current_streak + 1 ELSE 0 END),
+        last_seen = excluded.last_seen
+'''
+
+PHRASE_STATS_UPSERT = '''
+    INSERT INTO phrase_stats (user_id, phrase_id, total, correct, last_seen)
+    VALUES (?, ?, 1, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, phrase_id) DO UPDATE SET
+        total = total + 1,
+        correct = correct + excluded.correct,
+        last_seen = excluded.last_seen
+'''
+
+
+class WriteBehindBuffer:
+    """Буфер отложенной записи с групповым коммитом.
+
+    Вставки принимаются сразу и сбрасываются одной транзакцией через
+    executemany каждые flush_size строк или flush_interval_ms миллисекунд.
+    Когда буфер заполнен, put ждет освобождения места (backpressure).
+    """
+
+    def __init__(self, database: "Database", flush_size: int, flush_interval_ms: int, max_rows: int):
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "rows_enqueued": 0,
+            "rows_written": 0,
+            "rows_failed": 0,
+            "flushes": 0,
+            "last_flush_size": 0,
+            "max_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "backpressure_waits": 0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запуск фоновой задачи сброса буфера."""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_rows)
+        self._task = asyncio.create_task(self._worker())
+        logger.info(f"Буфер записи запущен: flush_size={self.flush_size}, "
+                    f"interval={self.flush_interval * 1000:.0f}ms, max_rows={self.max_rows}")
+
+    async def put(self, table: str, row: tuple):
+        """Добавление строки в буфер. Без запущенного буфера строка пишется сразу."""
+        if not self.is_running:
+            await self.database._run_async(self.database.write_batch, {table: [row]})
+            return
+
+        if self._queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self._queue.put((table, row))
+        self.stats["rows_enqueued"] += 1
+
+    async def stop(self):
+        """Остановка буфера со сбросом всех накопленных строк."""
+        if not self.is_running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info(f"Буфер записи остановлен, записано строк: {self.stats['rows_written']}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики буфера для настройки параметров сброса."""
+        stats = dict(self.stats)
+        stats["queue_depth"] = self._queue.qsize() if self._queue else 0
+        return stats
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Дописываем все, что осталось в очереди после сигнала остановки
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                remaining.append(item)
+        if remaining:
+            await self._flush(remaining)
+
+    async def _flush(self, batch: List[tuple]):
+        rows_by_table: Dict[str, List[tuple]] = {}
+        for table, row in batch:
+            rows_by_table.setdefault(table, []).append(row)
+
+        started = time.perf_counter()
+        if await self._write_batch(rows_by_table, len(batch)):
+            written = len(batch)
+        else:
+            written = await self._write_rows(batch)
+        if written < len(batch):
+            self.stats["rows_failed"] += len(batch) - written
+        if not written:
+            return
+
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += written
+        self.stats["last_flush_size"] = written
+        self.stats["max_flush_size"] = max(self.stats["max_flush_size"], written)
+        self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    async def _write_batch(self, rows_by_table: Dict[str, List[tuple]], size: int) -> bool:
+        """Групповая запись с повторами, пока база занята (OperationalError)."""
+        for attempt in range(FLUSH_RETRIES):
+            try:
+                await self.database._run_async(self.database.write_batch, rows_by_table)
+                return True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Ошибка группового сброса буфера ({size} строк), "
+                               f"попытка {attempt + 1}/{FLUSH_RETRIES}: {e}")
+                # После последней попытки не ждем: дальше построчная запись
+                if attempt + 1 < FLUSH_RETRIES:
+                    await asyncio.sleep(FLUSH_RETRY_DELAY * 2 ** attempt)
+            except Exception as e:
+                logger.warning(f"Ошибка группового сброса буфера ({size} строк): {e}")
+                break
+        return False
+
+    async def _write_rows(self, batch: List[tuple]) -> int:
+        """Запись по одной строке, чтобы ошибочная строка не теряла остальные. Возвращает число записанных."""
+        written = 0
+        for table, row in batch:
+            try:
+                await self.database._run_async(self.database.write_batch, {table: [row]})
+                written += 1
+            except Exception as e:
+                logger.error(f"Строка не записана в {table}: {row!r}: {e}")
+        logger.info(f"Буфер записи: построчно записано {written} из {len(batch)} строк")
+        return written
+
 
 class Database:
-    """Класс для работы с SQLite базой данных."""
+    """Класс для работы с SQLite базой данных.
+
+    Держит одно долгоживущее соединение в режиме WAL. Все запросы из
+    асинхронного кода выполняются в отдельном рабочем потоке, поэтому
+    обработчики не блокируют event loop на открытии файла и fsync.
+    """
 
     def __init__(self, db_path: str = config.DATABASE_PATH):
         self.db_path = db_path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        # Построена ли сводная статистика по всей истории; до этого у пользователей, до которых
+        # не дошло фоновое заполнение, она читается из practice_sessions
+        self._practice_stats_built = False
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._conn = self._connect()
         self._init_db()
+        self.write_buffer = WriteBehindBuffer(
+            self,
+            flush_size=config.DB_FLUSH_SIZE,
+            flush_interval_ms=config.DB_FLUSH_INTERVAL_MS,
+            max_rows=config.DB_BUFFER_MAX_ROWS
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие соединения и настройка pragma."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA cache_size=-{config.DATABASE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA busy_timeout={config.DATABASE_BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет функцию над соединением в одной транзакции."""
+        with self._lock:
+            with self._conn:
+                return func(self._conn)
+
+    async def _run_async(self, method: Callable, *args, **kwargs) -> Any:
+        """Выполняет синхронный метод в рабочем потоке базы данных."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
 
     def _init_db(self):
         """Инициализация базы данных и создание таблиц."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-
-                # Таблица пользователей
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id INTEGER PRIMARY KEY,
-                        username TEXT,
-                        first_name TEXT,
-                        last_name TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-
-                # Таблица сессий практики
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS practice_sessions (
-                        session_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        phrase_id TEXT,
-                        user_response TEXT,
-                        is_correct BOOLEAN,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id)
-                    )
-                ''')
-
-                # Таблица запросов поддержки
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS support_requests (
-                        request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        question TEXT,
-                        response TEXT,
-                        is_escalated BOOLEAN DEFAULT FALSE,
-                        operator_id INTEGER,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        resolved_at TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id)
-                    )
-                ''')
-
-                # Таблица логов ошибок
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS error_logs (
-                        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        error_message TEXT,
-                        stack_trace TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-
-                conn.commit()
-                logger.info("База данных успешно инициализирована")
+        def create_tables(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+
+            # Таблица пользователей
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Таблица сессий практики
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS practice_sessions (
+                    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    phrase_id TEXT,
+                    user_response TEXT,
+                    is_correct BOOLEAN,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''')
+
+            # Таблица запросов поддержки
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS support_requests (
+                    request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    question TEXT,
+                    response TEXT,
+                    is_escalated BOOLEAN DEFAULT FALSE,
+                    operator_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    resolved_at TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''')
+
+            # Таблица логов ошибок
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS error_logs (
+                    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    error_message TEXT,
+                    stack_trace TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Таблица Telegram file_id для аудио фраз
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS phrase_media (
+                    phrase_id TEXT,
+                    content_hash TEXT,
+                    file_id TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (phrase_id, content_hash)
+                )
+            ''')
+
+            # Кэш распознанного текста голосовых сообщений
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS transcriptions (
+                    cache_key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+
+            # Каталог фраз для практики (источник - data/phrases.json)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS phrases (
+                    phrase_id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    level TEXT,
+                    topic TEXT,
+                    correct_answers TEXT
+                )
+            ''')
 
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
+            # Индексы для выборок истории практики по пользователю и фразе
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_practice_sessions_user_created
+                ON practice_sessions (user_id, created_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_practice_sessions_phrase
+                ON practice_sessions (phrase_id)
+            ''')
+
+            # Сводная статистика пользователя (обновляется вместе с practice_sessions)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    user_id INTEGER PRIMARY KEY,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    current_streak INTEGER NOT NULL DEFAULT 0,
+                    best_streak INTEGER NOT NULL DEFAULT 0,
+                    last_seen TIMESTAMP
+                )
+            ''')
+
+            # Статистика пользователя по каждой фразе
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS phrase_stats (
+                    user_id INTEGER,
+                    phrase_id TEXT,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    last_seen TIMESTAMP,
+                    PRIMARY KEY (user_id, phrase_id)
+                )
+            ''')
+
+            # Состояния FSM пользователей (services/fsm_storage.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fsm_sessions (
+                    storage_key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_fsm_sessions_updated_at ON fsm_sessions (updated_at)
+            ''')
+
+            # Результаты повторной проверки истории ответов (regrade_practice.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS practice_grades (
+                    session_id INTEGER PRIMARY KEY,
+                    score REAL NOT NULL,
+                    passed BOOLEAN NOT NULL,
+                    mode TEXT,
+                    graded_at REAL NOT NULL,
+                    FOREIGN KEY (session_id) REFERENCES practice_sessions (session_id)
+                )
+            ''')
+
+        try:
+            self._run(create_tables)
+            logger.info("База данных успешно инициализирована")
         except sqlite3.Error as e:
             logger.error(f"Ошибка инициализации базы данных: {e}")
             raise
@@ -83,40 +413,34 @@ class Database:
     def add_user(self, user_id: int, username: str, first_name: str, last_name: str = None):
         """Добавление нового пользователя в базу."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name))
-                conn.commit()
+            self._run(lambda conn: conn.execute('''
+                INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, username, first_name, last_name)))
         except sqlite3.Error as e:
             logger.error(f"Ошибка добавления пользователя: {e}")
 
     def update_user_activity(self, user_id: int):
         """Обновление времени последней активности пользователя."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE users SET last_activity = CURRENT_TIMESTAMP 
-                    WHERE user_id = ?
-                ''', (user_id,))
-                conn.commit()
+            self._run(lambda conn: conn.execute('''
+                UPDATE users SET last_activity = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (user_id,)))
         except sqlite3.Error as e:
             logger.error(f"Ошибка обновления активности пользователя: {e}")
 
     def add_practice_session(self, user_id: int, phrase_id: str, user_response: str, is_correct: bool):
         """Добавление записи о сессии практики."""
+        row = (user_id, phrase_id, user_response, is_correct)
+
+        def insert(conn: sqlite3.Connection):
+            cursor = conn.execute(BATCH_INSERTS["practice_sessions"], row)
+            self._update_practice_stats(conn, [row])
+            return cursor.lastrowid
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO practice_sessions (user_id, phrase_id, user_response, is_correct)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, phrase_id, user_response, is_correct))
-                conn.commit()
-                return cursor.lastrowid
+            return self._run(insert)
         except sqlite3.Error as e:
             logger.error(f"Ошибка добавления сессии практики: {e}")
             return None
@@ -125,14 +449,11 @@ class Database:
                             is_escalated: bool = False, operator_id: int = None):
         """Добавление запроса поддержки."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO support_requests (user_id, question, response, is_escalated, operator_id)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (user_id, question, response, is_escalated, operator_id))
-                conn.commit()
-                return cursor.lastrowid
+            cursor = self._run(lambda conn: conn.execute('''
+                INSERT INTO support_requests (user_id, question, response, is_escalated, operator_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, question, response, is_escalated, operator_id)))
+            return cursor.lastrowid
         except sqlite3.Error as e:
             logger.error(f"Ошибка добавления запроса поддержки: {e}")
             return None
@@ -140,17 +461,520 @@ class Database:
     def log_error(self, user_id: int, error_message: str, stack_trace: str = None):
         """Логирование ошибки."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO error_logs (user_id, error_message, stack_trace)
-                    VALUES (?, ?, ?)
-                ''', (user_id, error_message, stack_trace))
-                conn.commit()
+            self._run(lambda conn: conn.execute('''
+                INSERT INTO error_logs (user_id, error_message, stack_trace)
+                VALUES (?, ?, ?)
+            ''', (user_id, error_message, stack_trace)))
         except sqlite3.Error as e:
             logger.error(f"Ошибка логирования ошибки: {e}")
 
+    def get_phrase_file_id(self, phrase_id: str, content_hash: str) -> Optional[str]:
+        """Получение сохраненного file_id для версии аудиофайла фразы."""
+        try:
+            row = self._run(lambda conn: conn.execute('''
+                SELECT file_id FROM phrase_media
+                WHERE phrase_id = ? AND content_hash = ?
+            ''', (phrase_id, content_hash)).fetchone())
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения file_id фразы: {e}")
+            return None
+
+    def save_phrase_file_id(self, phrase_id: str, content_hash: str, file_id: str):
+        """Сохранение file_id; записи для прежних версий файла удаляются."""
+        def save(conn: sqlite3.Connection):
+            conn.execute('''
+                DELETE FROM phrase_media WHERE phrase_id = ? AND content_hash != ?
+            ''', (phrase_id, content_hash))
+            conn.execute('''
+                INSERT OR REPLACE INTO phrase_media (phrase_id, content_hash, file_id)
+                VALUES (?, ?, ?)
+            ''', (phrase_id, content_hash, file_id))
+
+        try:
+            self._run(save)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения file_id фразы: {e}")
+
+    def delete_phrase_file_id(self, phrase_id: str, content_hash: str):
+        """Удаление устаревшего file_id."""
+        try:
+            self._run(lambda conn: conn.execute('''
+                DELETE FROM phrase_media WHERE phrase_id = ? AND content_hash = ?
+            ''', (phrase_id, content_hash)))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления file_id фразы: {e}")
+
+    def get_transcription(self, cache_key: str, min_created_at: float) -> Optional[tuple]:
+        """Получение (текст, время записи), если запись не старше min_created_at."""
+        try:
+            return self._run(lambda conn: conn.execute('''
+                SELECT text, created_at FROM transcriptions
+                WHERE cache_key = ? AND created_at >= ?
+            ''', (cache_key, min_created_at)).fetchone())
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения распознанного текста: {e}")
+            return None
+
+    def save_transcription(self, cache_key: str, text: str, created_at: float):
+        """Сохранение распознанного текста."""
+        try:
+            self._run(lambda conn: conn.execute('''
+                INSERT OR REPLACE INTO transcriptions (cache_key, text, created_at)
+                VALUES (?, ?, ?)
+            ''', (cache_key, text, created_at)))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения распознанного текста: {e}")
+
+    def purge_transcriptions(self, created_before: float) -> int:
+        """Удаление устаревших записей кэша распознавания."""
+        try:
+            cursor = self._run(lambda conn: conn.execute('''
+                DELETE FROM transcriptions WHERE created_at < ?
+            ''', (created_before,)))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка очистки кэша распознавания: {e}")
+            return 0
+
+    def get_catalog_meta(self, key: str) -> Optional[str]:
+        """Служебное значение каталога (например, хэш загруженного файла фраз)."""
+        try:
+            row = self._run(lambda conn: conn.execute('''
+                SELECT value FROM catalog_meta WHERE key = ?
+            ''', (key,)).fetchone())
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения метаданных каталога: {e}")
+            return None
+
+    def replace_phrases(self, rows: List[tuple], source_hash: str):
+        """Полная замена каталога фраз в одной транзакции.
+
+        rows - (phrase_id, position, text, level, topic, correct_answers_json).
+        """
+        def replace(conn: sqlite3.Connection):
+            conn.execute('DELETE FROM phrases')
+            conn.executemany('''
+                INSERT INTO phrases (phrase_id, position, text, level, topic, correct_answers)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.execute('''
+                INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('phrases_hash', ?)
+            ''', (source_hash,))
+
+        self._run(replace)
+
+    def get_phrases(self) -> List[tuple]:
+        """Весь каталог: (phrase_id, text, level, topic, correct_answers_json) в порядке файла."""
+        try:
+            return self._run(lambda conn: conn.execute('''
+                SELECT phrase_id, text, level, topic, correct_answers FROM phrases ORDER BY position
+            ''').fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения каталога фраз: {e}")
+            return []
+
+    def get_practice_sessions_after(self, session_id: int, limit: int) -> List[tuple]:
+        """Следующая порция сессий практики по возрастанию session_id (постраничное чтение без OFFSET).
+
+        Возвращает (session_id, phrase_id, user_response, is_correct).
+        """
+        try:
+            return self._run(lambda conn: conn.execute('''
+                SELECT session_id, phrase_id, user_response, is_correct FROM practice_sessions
+                WHERE session_id > ?
+                ORDER BY session_id
+                LIMIT ?
+            ''', (session_id, limit)).fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения сессий практики: {e}")
+            return []
+
+    def save_practice_grades(self, rows: List[tuple]):
+        """Сохранение результатов повторной проверки: (session_id, score, passed, mode, graded_at)."""
+        self._run(lambda conn: conn.executemany('''
+            INSERT OR REPLACE INTO practice_grades (session_id, score, passed, mode, graded_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows))
+
+    def get_fsm_session(self, storage_key: str) -> Optional[tuple]:
+        """Сохраненное состояние FSM: (state, data_json) или None."""
+        try:
+            return self._run(lambda conn: conn.execute('''
+                SELECT state, data FROM fsm_sessions WHERE storage_key = ?
+            ''', (storage_key,)).fetchone())
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения состояния FSM: {e}")
+            return None
+
+    def save_fsm_sessions(self, rows: List[tuple], deleted_keys: List[str]):
+        """Запись накопленных изменений FSM в одной транзакции.
+
+        rows - (storage_key, state, data_json, updated_at); deleted_keys - очищенные состояния.
+        """
+        def save(conn: sqlite3.Connection):
+            conn.executemany('''
+                INSERT INTO fsm_sessions (storage_key, state, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(storage_key) DO UPDATE SET
+                    state = excluded.state,
+                    data = excluded.data,
+                    updated_at = excluded.updated_at
+            ''', rows)
+            conn.executemany('''
+                DELETE FROM fsm_sessions WHERE storage_key = ?
+            ''', [(key,) for key in deleted_keys])
+
+        self._run(save)
+
+    def purge_fsm_sessions(self, updated_before: float) -> int:
+        """Удаление состояний FSM, не менявшихся с указанного времени."""
+        try:
+            cursor = self._run(lambda conn: conn.execute('''
+                DELETE FROM fsm_sessions WHERE updated_at < ?
+            ''', (updated_before,)))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка очистки состояний FSM: {e}")
+            return 0
+
+    def write_batch(self, rows_by_table: Dict[str, List[tuple]]):
+        """Пакетная вставка строк в одной транзакции."""
+        def insert(conn: sqlite3.Connection):
+            for table, rows in rows_by_table.items():
+                conn.executemany(BATCH_INSERTS[table], rows)
+                if table == "practice_sessions":
+                    self._update_practice_stats(conn, rows)
+
+        self._run(insert)
+
+    @staticmethod
+    def _update_practice_stats(conn: sqlite3.Connection, rows: List[tuple]):
+        """Обновление user_stats и phrase_stats в транзакции вставки сессий (порядок строк сохраняется)."""
+        conn.executemany(USER_STATS_UPSERT, [
+            (user_id, int(bool(is_correct)), int(bool(is_correct)), int(bool(is_correct)))
+            for user_id, _, _, is_correct in rows if user_id is not None
+        ])
+        conn.executemany(PHRASE_STATS_UPSERT, [
+            (user_id, phrase_id, int(bool(is_correct)))
+            for user_id, phrase_id, _, is_correct in rows if user_id is not None and phrase_id
+        ])
+
+    @staticmethod
+    def _recompute_practice_stats(conn: sqlite3.Connection, first_user_id: int, last_user_id: int):
+        """Пересчет user_stats и phrase_stats по истории пользователей с user_id от first до last."""
+        bounds = (first_user_id, last_user_id)
+        conn.execute('DELETE FROM user_stats WHERE user_id BETWEEN ? AND ?', bounds)
+        conn.execute('DELETE FROM phrase_stats WHERE user_id BETWEEN ? AND ?', bounds)
+        conn.execute('''
+            INSERT INTO phrase_stats (user_id, phrase_id, total, correct, last_seen)
+            SELECT user_id, phrase_id, COUNT(*),
+                   SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), MAX(created_at)
+            FROM practice_sessions
+            WHERE user_id BETWEEN ? AND ? AND phrase_id IS NOT NULL
+            GROUP BY user_id, phrase_id
+        ''', bounds)
+        # Серии правильных ответов: номер серии растет на каждом неправильном ответе
+        conn.execute('''
+            WITH marked AS (
+                SELECT user_id, is_correct,
+                       SUM(CASE WHEN is_correct THEN 0 ELSE 1 END)
+                           OVER (PARTITION BY user_id ORDER BY session_id) AS run_id
+                FROM practice_sessions
+                WHERE user_id BETWEEN ? AND ?
+            ),
+            runs AS (
+                SELECT user_id, run_id, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS length,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY run_id DESC) AS recency
+                FROM marked
+                GROUP BY user_id, run_id
+            ),
+            streaks AS (
+                SELECT user_id, MAX(length) AS best_streak,
+                       MAX(CASE WHEN recency = 1 THEN length END) AS current_streak
+                FROM runs
+                GROUP BY user_id
+            )
+            INSERT INTO user_stats (user_id, total, correct, current_streak, best_streak, last_seen)
+            SELECT totals.user_id, totals.total, totals.correct,
+                   streaks.current_streak, streaks.best_streak, totals.last_seen
+            FROM (
+                SELECT user_id, COUNT(*) AS total,
+                       SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct,
+                       MAX(created_at) AS last_seen
+                FROM practice_sessions
+                WHERE user_id BETWEEN ? AND ?
+                GROUP BY user_id
+            ) AS totals
+            JOIN streaks ON streaks.user_id = totals.user_id
+        ''', bounds * 2)
+
+    @staticmethod
+    def _mark_practice_stats_built(conn: sqlite3.Connection):
+        conn.execute('''
+            INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('practice_stats_built', ?)
+        ''', (datetime.now().isoformat(),))
+        conn.execute("DELETE FROM catalog_meta WHERE key = 'practice_stats_backfill_user'")
+
+    def rebuild_practice_stats(self) -> int:
+        """Пересчет user_stats и phrase_stats по всей истории (backfill_stats.py).
+
+        Выполняется одной транзакцией, поэтому не расходится с параллельными
+        вставками. Возвращает число пользователей в статистике.
+        """
+        def rebuild(conn: sqlite3.Connection) -> int:
+            conn.execute('DELETE FROM user_stats')
+            conn.execute('DELETE FROM phrase_stats')
+            first, last = conn.execute(
+                'SELECT MIN(user_id), MAX(user_id) FROM practice_sessions'
+            ).fetchone()
+            if first is not None:
+                self._recompute_practice_stats(conn, first, last)
+            self._mark_practice_stats_built(conn)
+            return conn.execute('SELECT COUNT(*) FROM user_stats').fetchone()[0]
+
+        return self._run(rebuild)
+
+    def backfill_practice_stats(self, batch_users: int) -> int:
+        """Построение статистики для следующих batch_users пользователей по возрастанию user_id.
+
+        Каждая пачка - отдельная короткая транзакция: вставки других
+        пользователей не ждут пересчета всей истории. Достигнутый user_id
+        сохраняется в catalog_meta, поэтому после перезапуска заполнение
+        продолжается с того же места. Возвращает число пользователей
+        в пачке; 0 - история пройдена и статистика построена целиком.
+        """
+        def backfill(conn: sqlite3.Connection) -> int:
+            meta = self._practice_stats_meta(conn)
+            if "practice_stats_built" in meta:
+                return 0
+            after = meta.get("practice_stats_backfill_user")
+            users = [row[0] for row in conn.execute('''
+                SELECT DISTINCT user_id FROM practice_sessions
+                WHERE user_id > ?
+                ORDER BY user_id
+                LIMIT ?
+            ''', (int(after) if after is not None else -2 ** 63, batch_users))]
+            if not users:
+                self._mark_practice_stats_built(conn)
+                return 0
+            self._recompute_practice_stats(conn, users[0], users[-1])
+            conn.execute('''
+                INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('practice_stats_backfill_user', ?)
+            ''', (str(users[-1]),))
+            return len(users)
+
+        return self._run(backfill)
+
+    def start_stats_backfill(self, batch_users: int = config.PRACTICE_STATS_BACKFILL_BATCH,
+                             pause: float = config.PRACTICE_STATS_BACKFILL_PAUSE):
+        """Фоновое построение сводной статистики пачками, если она еще не построена."""
+        if self._backfill_task is None or self._backfill_task.done():
+            self._backfill_task = asyncio.create_task(self._backfill_worker(batch_users, pause))
+
+    async def stop_stats_backfill(self):
+        """Остановка фонового заполнения; начатая пачка дописывается, продолжение - при следующем запуске."""
+        if self._backfill_task is None:
+            return
+        self._backfill_task.cancel()
+        await asyncio.gather(self._backfill_task, return_exceptions=True)
+        self._backfill_task = None
+
+    async def _backfill_worker(self, batch_users: int, pause: float):
+        started = time.perf_counter()
+        users = 0
+        while True:
+            try:
+                done = await self._run_async(self.backfill_practice_stats, batch_users)
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка построения сводной статистики: {e}")
+                return
+            if not done:
+                break
+            users += done
+            # Пауза между пачками: запросы обработчиков не ждут за заполнением
+            await asyncio.sleep(pause)
+        if users:
+            logger.info(f"Сводная статистика построена для {users} пользователей "
+                        f"за {time.perf_counter() - started:.1f} с")
+
+    @staticmethod
+    def _practice_stats_meta(conn: sqlite3.Connection) -> Dict[str, str]:
+        return dict(conn.execute('''
+            SELECT key, value FROM catalog_meta
+            WHERE key IN ('practice_stats_built', 'practice_stats_backfill_user')
+        ''').fetchall())
+
+    def _practice_stats_ready(self, conn: sqlite3.Connection, user_id: int) -> bool:
+        """Полна ли статистика пользователя: построена целиком или пользователь уже пройден заполнением."""
+        if self._practice_stats_built:
+            return True
+        meta = self._practice_stats_meta(conn)
+        # После построения целиком больше не перепроверяется
+        self._practice_stats_built = "practice_stats_built" in meta
+        after = meta.get("practice_stats_backfill_user")
+        return self._practice_stats_built or (after is not None and user_id <= int(after))
+
+    def get_user_stats(self, user_id: int) -> Optional[tuple]:
+        """Сводная статистика: (total, correct, current_streak, best_streak, last_seen) или None.
+
+        Пока фоновое заполнение не дошло до пользователя, считается по его practice_sessions.
+        """
+        def query(conn: sqlite3.Connection) -> Optional[tuple]:
+            if self._practice_stats_ready(conn, user_id):
+                return conn.execute('''
+                    SELECT total, correct, current_streak, best_streak, last_seen FROM user_stats
+                    WHERE user_id = ?
+                ''', (user_id,)).fetchone()
+
+            row = conn.execute('''
+                WITH marked AS (
+                    SELECT is_correct, created_at,
+                           SUM(CASE WHEN is_correct THEN 0 ELSE 1 END) OVER (ORDER BY session_id) AS run_id
+                    FROM practice_sessions
+                    WHERE user_id = ?
+                ),
+                runs AS (
+                    SELECT run_id, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS length
+                    FROM marked
+                    GROUP BY run_id
+                )
+                SELECT (SELECT COUNT(*) FROM marked),
+                       (SELECT SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) FROM marked),
+                       (SELECT length FROM runs ORDER BY run_id DESC LIMIT 1),
+                       (SELECT MAX(length) FROM runs),
+                       (SELECT MAX(created_at) FROM marked)
+            ''', (user_id,)).fetchone()
+            return row if row[0] else None
+
+        try:
+            return self._run(query)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения статистики пользователя: {e}")
+            return None
+
+    def get_weakest_phrases(self, user_id: int, limit: int = 3, min_attempts: int = 2) -> List[tuple]:
+        """Фразы с наименьшей точностью у пользователя: (phrase_id, total, correct)."""
+        def query(conn: sqlite3.Connection) -> List[tuple]:
+            if self._practice_stats_ready(conn, user_id):
+                return conn.execute('''
+                    SELECT phrase_id, total, correct FROM phrase_stats
+                    WHERE user_id = ? AND total >= ? AND correct < total
+                    ORDER BY CAST(correct AS REAL) / total, total DESC
+                    LIMIT ?
+                ''', (user_id, min_attempts, limit)).fetchall()
+
+            return conn.execute('''
+                SELECT phrase_id, COUNT(*) AS total, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct
+                FROM practice_sessions
+                WHERE user_id = ? AND phrase_id IS NOT NULL
+                GROUP BY phrase_id
+                HAVING total >= ? AND correct < total
+                ORDER BY CAST(correct AS REAL) / total, total DESC
+                LIMIT ?
+            ''', (user_id, min_attempts, limit)).fetchall()
+
+        try:
+            return self._run(query)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения статистики по фразам: {e}")
+            return []
+
+    # Асинхронные версии методов для вызова из обработчиков
+
+    async def add_user_async(self, user_id: int, username: str, first_name: str, last_name: str = None):
+        """Асинхронное добавление нового пользователя."""
+        return await self._run_async(self.add_user, user_id, username, first_name, last_name)
+
+    async def update_user_activity_async(self, user_id: int):
+        """Асинхронное обновление времени последней активности."""
+        return await self._run_async(self.update_user_activity, user_id)
+
+    async def add_practice_session_async(self, user_id: int, phrase_id: str, user_response: str,
+                                         is_correct: bool):
+        """Асинхронное добавление записи о сессии практики."""
+        return await self._run_async(self.add_practice_session, user_id, phrase_id, user_response, is_correct)
+
+    async def add_support_request_async(self, user_id: int, question: str, response: str = None,
+                                        is_escalated: bool = False, operator_id: int = None):
+        """Асинхронное добавление запроса поддержки."""
+        return await self._run_async(self.add_support_request, user_id, question, response,
+                                     is_escalated, operator_id)
+
+    async def log_error_async(self, user_id: int, error_message: str, stack_trace: str = None):
+        """Асинхронное логирование ошибки."""
+        return await self._run_async(self.log_error, user_id, error_message, stack_trace)
+
+    async def get_phrase_file_id_async(self, phrase_id: str, content_hash: str) -> Optional[str]:
+        """Асинхронное получение file_id фразы."""
+        return await self._run_async(self.get_phrase_file_id, phrase_id, content_hash)
+
+    async def save_phrase_file_id_async(self, phrase_id: str, content_hash: str, file_id: str):
+        """Асинхронное сохранение file_id фразы."""
+        return await self._run_async(self.save_phrase_file_id, phrase_id, content_hash, file_id)
+
+    async def delete_phrase_file_id_async(self, phrase_id: str, content_hash: str):
+        """Асинхронное удаление file_id фразы."""
+        return await self._run_async(self.delete_phrase_file_id, phrase_id, content_hash)
+
+    async def get_transcription_async(self, cache_key: str, min_created_at: float) -> Optional[tuple]:
+        """Асинхронное получение распознанного текста."""
+        return await self._run_async(self.get_transcription, cache_key, min_created_at)
+
+    async def save_transcription_async(self, cache_key: str, text: str, created_at: float):
+        """Асинхронное сохранение распознанного текста."""
+        return await self._run_async(self.save_transcription, cache_key, text, created_at)
+
+    async def purge_transcriptions_async(self, created_before: float) -> int:
+        """Асинхронная очистка кэша распознавания."""
+        return await self._run_async(self.purge_transcriptions, created_before)
+
+    async def get_fsm_session_async(self, storage_key: str) -> Optional[tuple]:
+        """Асинхронное чтение состояния FSM."""
+        return await self._run_async(self.get_fsm_session, storage_key)
+
+    async def save_fsm_sessions_async(self, rows: List[tuple], deleted_keys: List[str]):
+        """Асинхронная запись изменений FSM."""
+        return await self._run_async(self.save_fsm_sessions, rows, deleted_keys)
+
+    async def purge_fsm_sessions_async(self, updated_before: float) -> int:
+        """Асинхронная очистка устаревших состояний FSM."""
+        return await self._run_async(self.purge_fsm_sessions, updated_before)
+
+    async def get_catalog_meta_async(self, key: str) -> Optional[str]:
+        """Асинхронное чтение служебного значения каталога."""
+        return await self._run_async(self.get_catalog_meta, key)
+
+    async def get_user_stats_async(self, user_id: int) -> Optional[tuple]:
+        """Асинхронное чтение сводной статистики пользователя."""
+        return await self._run_async(self.get_user_stats, user_id)
+
+    async def get_weakest_phrases_async(self, user_id: int, limit: int = 3) -> List[tuple]:
+        """Асинхронное чтение фраз с наименьшей точностью."""
+        return await self._run_async(self.get_weakest_phrases, user_id, limit)
+
+    async def enqueue_practice_session(self, user_id: int, phrase_id: str, user_response: str,
+                                       is_correct: bool):
+        """Отложенная запись сессии практики через буфер."""
+        await self.write_buffer.put("practice_sessions", (user_id, phrase_id, user_response, is_correct))
+
+    async def enqueue_error_log(self, user_id: int, error_message: str, stack_trace: str = None):
+        """Отложенная запись ошибки через буфер."""
+        await self.write_buffer.put("error_logs", (user_id, error_message, stack_trace))
+
+    def close(self):
+        """Закрытие соединения и рабочего потока."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"Не удалось выполнить PRAGMA optimize: {e}")
+            self._conn.close()
+        logger.info("Соединение с базой данных закрыто")
+
 
 # Создаем глобальный экземпляр базы данных
 db = Database()
-        
\ No newline at end of file
+
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+from config import config
+from services.audio_pipeline import PCM_SAMPLE_RATE, AudioDecodeError, decode_voice
+
+logger = logging.getLogger(__name__)
+
+
+class DecoderBusyError(AudioDecodeError):
+    """Очередь декодирования переполнена."""
+
+
+def _init_worker():
+    # Тяжелые модули загружаются один раз при старте процесса, а не на каждое сообщение
+    import numpy  # noqa: F401
+    from services import audio_pipeline  # noqa: F401
+
+
+class DecoderPool:
+    """Пул долгоживущих процессов для декодирования OGG/Opus в PCM 16 кГц моно.
+
+    Процессы создаются один раз и обслуживают все сообщения; при наличии
+    PyAV декодирование идет внутри процесса без запуска ffmpeg. Одновременно
+    декодируется не больше workers сообщений, в очереди ждут не больше
+    max_queue - остальные сразу получают DecoderBusyError. Сообщение,
+    не уложившееся в таймаут, занимает место, пока процесс его не
+    дорешает, поэтому в пуле не скапливается больше workers задач.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers)
+        self._waiting = 0
+        self.stats = {
+            "decoded": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "bytes_in": 0,
+            "total_ms": 0.0,
+        }
+
+    def start(self) -> ProcessPoolExecutor:
+        """Запуск процессов (также выполняется при первом сообщении)."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            logger.info(f"Пул декодирования запущен: {self.workers} процессов")
+        return self._executor
+
+    async def decode(self, data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+        """OGG/Opus -> PCM s16le моно. AudioDecodeError при ошибке или переполнении очереди."""
+        if self._waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise DecoderBusyError(f"в очереди уже {self._waiting} сообщений")
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            future = self.start().submit(decode_voice, data, sample_rate)
+        except Exception:
+            self._slots.release()
+            self.stats["failed"] += 1
+            raise
+        # Место освобождается, когда процесс действительно закончил декодирование, а не по таймауту
+        future.add_done_callback(partial(self._on_done, loop))
+
+        try:
+            pcm = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+        self.stats["decoded"] += 1
+        self.stats["bytes_in"] += len(data)
+        self.stats["total_ms"] += (time.perf_counter() - started) * 1000
+        return pcm
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, _future: Future):
+        # Вызывается в служебном потоке пула процессов
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            pass  # цикл событий уже закрыт
+
+    def get_stats(self) -> Dict[str, float]:
+        """Декодировано сообщений, отказы, средняя длительность и глубина очереди."""
+        stats = dict(self.stats)
+        stats["avg_ms"] = stats["total_ms"] / stats["decoded"] if stats["decoded"] else 0.0
+        stats["waiting"] = self._waiting
+        return stats
+
+    def shutdown(self):
+        """Остановка процессов: начатые задачи завершаются, остальные отменяются."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        logger.info(f"Пул декодирования остановлен: {self.get_stats()}")
+
+
+# Глобальный пул декодирования
+decoder_pool = DecoderPool(
+    workers=config.STT_DECODE_PROCESSES,
+    max_queue=config.DECODER_QUEUE_SIZE,
+    timeout=config.STT_JOB_TIMEOUT
+)
@@ -1,13 +1,357 @@
 import re
-from config import config
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import Config, config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Стеммер Портера для русского: окончания отрезаются в RV (после первой гласной),
+# поэтому "практику" находит "практика", а "поддержка" и "поддерживаются" не совпадают
+_RV_RE = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_PERFECTIVE_GERUND_RE = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_REFLEXIVE_RE = re.compile(r"(с[яь])$")
+_ADJECTIVE_RE = re.compile(r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$")
+_PARTICIPLE_RE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_VERB_RE = re.compile(r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить"
+                      r"|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$")
+_NOUN_RE = re.compile(r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь"
+                      r"|ию|ью|ю|ия|ья|я)$")
+_DERIVATIONAL_RE = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя]+[^аеиоуыэюя]+[аеиоуыэюя]+.*?ость?$")
+_DERIVATIONAL_SUFFIX_RE = re.compile(r"ость?$")
+_SUPERLATIVE_RE = re.compile(r"(ейше|ейш)$")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+# Служебные слова не участвуют в ранжировании
+_STOP_WORDS = {
+    "а", "в", "и", "к", "о", "с", "у", "я", "на", "не", "по", "из", "за", "от", "до",
+    "ли", "же", "бы", "ты", "вы", "мы", "он", "она", "мне", "меня", "как", "что",
+    "это", "или", "есть", "мой", "моя", "the", "a", "an", "is", "to", "i", "do",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Нормализует текст и разбивает его на слова."""
+    return _TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+
+
+@lru_cache(maxsize=10000)
+def stem(word: str) -> str:
+    """Основа русского слова (стеммер Портера); остальные слова не меняются."""
+    match = _RV_RE.match(word) if _CYRILLIC_RE.search(word) else None
+    if match is None:
+        return word
+    prefix, rv = match.groups()
+
+    temp = _PERFECTIVE_GERUND_RE.sub("", rv, 1)
+    if temp == rv:
+        rv = _REFLEXIVE_RE.sub("", rv, 1)
+        temp = _ADJECTIVE_RE.sub("", rv, 1)
+        if temp != rv:
+            rv = _PARTICIPLE_RE.sub("", temp, 1)
+        else:
+            temp = _VERB_RE.sub("", rv, 1)
+            rv = _NOUN_RE.sub("", rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    if _DERIVATIONAL_RE.match(rv):
+        rv = _DERIVATIONAL_SUFFIX_RE.sub("", rv, 1)
+    if rv.endswith("ь"):
+        rv = rv[:-1]
+    else:
+        rv = _SUPERLATIVE_RE.sub("", rv, 1)
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def index_terms(text: str) -> List[str]:
+    """Термины для ранжированного поиска: основы слов без служебных."""
+    return [stem(token) for token in tokenize(text) if token not in _STOP_WORDS]
+
+
+class FAQHit(NamedTuple):
+    """Результат ранжированного поиска по FAQ."""
+    item: dict
+    score: float
+    confidence: float
+
+
+class FAQMatcher:
+    """Скомпилированный поиск ключевых слов FAQ.
+
+    Ключевые слова (в том числе из нескольких слов, например
+    "что ты умеешь") складываются в префиксное дерево по словам, которое
+    строится один раз. Поиск - один проход по словам сообщения, время
+    которого не зависит от размера FAQ.
+    """
+
+    def __init__(self, faq_data: dict):
+        self.items: List[dict] = list(faq_data.get('faq', []))
+        self._trie: Dict = {}
+        self._max_keyword_len = 0
+
+        for index, item in enumerate(self.items):
+            for keyword in item.get('keywords', []):
+                tokens = tokenize(keyword)
+                if not tokens:
+                    continue
+                node = self._trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                # Ключ None в узле хранит номера вопросов с этим ключевым словом
+                node.setdefault(None, set()).add(index)
+                self._max_keyword_len = max(self._max_keyword_len, len(tokens))
+
+    def match_indexes(self, user_message: str) -> List[int]:
+        """Номера всех вопросов FAQ, ключевые слова которых есть в сообщении."""
+        tokens = tokenize(user_message)
+        matched = set()
+
+        for start in range(len(tokens)):
+            node = self._trie
+            for token in tokens[start:start + self._max_keyword_len]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if None in node:
+                    matched.update(node[None])
+
+        return sorted(matched)
+
+    def match(self, user_message: str, first_only: bool = False) -> List[dict]:
+        """Вопросы FAQ, найденные в сообщении, в порядке файла.
+
+        first_only сохраняет прежнюю семантику: только первый по порядку
+        вопрос, у которого совпало любое ключевое слово.
+        """
+        indexes = self.match_indexes(user_message)
+        if first_only:
+            indexes = indexes[:1]
+        return [self.items[index] for index in indexes]
+
+
+class FAQIndex:
+    """Ранжированный поиск по FAQ на основе BM25.
+
+    Инвертированный индекс строится по полям question и keywords и
+    хранится в виде CSR-массивов NumPy: для каждого термина - непрерывный
+    отрезок номеров документов и заранее посчитанных весов BM25. Поиск
+    складывает веса только по постингам слов запроса.
+    """
+
+    def __init__(self, faq_data: dict, k1: float = 1.5, b: float = 0.75, keyword_weight: int = 2):
+        self.items: List[dict] = list(faq_data.get('faq', []))
+        self.k1 = k1
+        self.vocabulary: Dict[str, int] = {}
+
+        term_ids, doc_ids, frequencies = [], [], []
+        doc_lengths = np.zeros(len(self.items), dtype=np.float64)
+
+        for doc_id, item in enumerate(self.items):
+            terms = index_terms(item.get('question', ''))
+            for keyword in item.get('keywords', []):
+                # Ключевые слова весомее слов из формулировки вопроса
+                terms.extend(index_terms(keyword) * keyword_weight)
+
+            doc_lengths[doc_id] = len(terms)
+            for term, count in Counter(terms).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._postings_docs = np.asarray(doc_ids, dtype=np.int64)[order]
+        tf = np.asarray(frequencies, dtype=np.float64)[order]
+
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self._offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+
+        n_docs = len(self.items)
+        self._idf = np.log1p((n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        average_length = doc_lengths.mean() if n_docs and doc_lengths.mean() > 0 else 1.0
+        norm = 1 - b + b * doc_lengths[self._postings_docs] / average_length
+        self._postings_weights = self._idf[term_ids[order]] * tf * (k1 + 1) / (tf + k1 * norm)
+
+    def search(self, user_message: str, top_k: int = 3) -> List[FAQHit]:
+        """Top-k вопросов FAQ по убыванию BM25.
+
+        confidence - доля набранного веса от максимально возможного для
+        известных индексу слов запроса (0..1); незнакомые слова (вежливые
+        обороты, подробности) ее не уменьшают.
+        """
+        terms = set(index_terms(user_message))
+        known = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        if not known:
+            return []
+
+        docs = np.concatenate([self._postings_docs[self._offsets[t]:self._offsets[t + 1]] for t in known])
+        weights = np.concatenate([self._postings_weights[self._offsets[t]:self._offsets[t + 1]] for t in known])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        max_score = self._idf[known].sum() * (self.k1 + 1)
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        # При равном счете выше стоит вопрос, который раньше в файле
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+
+        return [
+            FAQHit(self.items[candidates[i]], float(scores[i]), float(scores[i] / max_score))
+            for i in top
+        ]
+
+
+class FAQSnapshot(NamedTuple):
+    """Согласованный набор данных FAQ и построенных по ним индексов."""
+    data: dict
+    matcher: FAQMatcher
+    index: FAQIndex
+
+
+def validate_faq(data) -> None:
+    """Проверяет структуру FAQ, при ошибке бросает ValueError."""
+    if not isinstance(data, dict) or not isinstance(data.get('faq'), list):
+        raise ValueError("ожидается объект с ключом 'faq' (список)")
+
+    for position, item in enumerate(data['faq']):
+        if not isinstance(item, dict):
+            raise ValueError(f"элемент #{position} не является объектом")
+        if not isinstance(item.get('answer'), str) or not item['answer'].strip():
+            raise ValueError(f"элемент #{position}: пустой или отсутствующий 'answer'")
+        keywords = item.get('keywords', [])
+        if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+            raise ValueError(f"элемент #{position}: 'keywords' должен быть списком строк")
+        if not isinstance(item.get('question', ''), str):
+            raise ValueError(f"элемент #{position}: 'question' должен быть строкой")
+
+
+class FAQStore:
+    """Хранилище FAQ с горячей перезагрузкой.
+
+    Фоновый поток следит за mtime и размером faq.json, перестраивает
+    индексы, проверяет их и атомарно подменяет текущий снимок. Обработчики
+    читают снимок одной ссылкой и не ждут перестроения. Если новый файл
+    поврежден, продолжает работать предыдущий индекс.
+    """
+
+    def __init__(self, faq_file: Path, initial_data: dict, poll_interval: float):
+        self.faq_file = Path(faq_file)
+        self.poll_interval = poll_interval
+        self._signature = self._file_signature()
+        self._snapshot = self._build(initial_data)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "reloads": 0,
+            "failed_reloads": 0,
+            "last_build_ms": 0.0,
+            "items": len(self._snapshot.matcher.items),
+        }
+
+    @property
+    def snapshot(self) -> FAQSnapshot:
+        return self._snapshot
+
+    def _file_signature(self) -> Optional[tuple]:
+        try:
+            stat = self.faq_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _build(data: dict) -> FAQSnapshot:
+        return FAQSnapshot(data, FAQMatcher(data), FAQIndex(data))
+
+    def reload(self, force: bool = False) -> bool:
+        """Перечитывает файл, если он изменился. Возвращает True при подмене индекса."""
+        signature = self._file_signature()
+        if signature is None or (signature == self._signature and not force):
+            return False
+        self._signature = signature
+
+        started = time.perf_counter()
+        try:
+            with open(self.faq_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            validate_faq(data)
+            snapshot = self._build(data)
+        except (OSError, ValueError) as e:
+            # json.JSONDecodeError - подкласс ValueError
+            self.stats["failed_reloads"] += 1
+            logger.error(f"FAQ не перезагружен, остается предыдущая версия: {e}")
+            return False
+
+        self._snapshot = snapshot
+        Config.FAQ_DATA = data
+
+        self.stats["reloads"] += 1
+        self.stats["last_build_ms"] = (time.perf_counter() - started) * 1000
+        self.stats["items"] = len(snapshot.matcher.items)
+        logger.info(f"FAQ перезагружен: {self.stats['items']} вопросов "
+                    f"за {self.stats['last_build_ms']:.1f} мс")
+        return True
+
+    def start(self):
+        """Запуск фонового отслеживания изменений файла."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name="faq-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Отслеживание FAQ запущено: {self.faq_file}")
+
+    def stop(self):
+        """Остановка фонового отслеживания."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Ошибка отслеживания FAQ: {e}")
+
+
+faq_store = FAQStore(config.FAQ_FILE, config.FAQ_DATA, config.FAQ_RELOAD_INTERVAL)
+
+
+def search_faq(user_message: str, top_k: int = config.FAQ_TOP_K) -> List[FAQHit]:
+    """Ранжированные кандидаты из FAQ для сообщения пользователя."""
+    return faq_store.snapshot.index.search(user_message, top_k=top_k)
 
 
 def find_answer(user_message: str) -> str | None:
-    user_message = user_message.lower().strip()
-
-    for item in config.FAQ_DATA.get('faq', []):
-        for keyword in item.get('keywords', []):
-            pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-            if re.search(pattern, user_message):
-                return item.get('answer')
-    return None
\ No newline at end of file
+    """Ответ из FAQ или None, если уверенность ниже FAQ_MIN_CONFIDENCE (вопрос уйдет оператору)."""
+    snapshot = faq_store.snapshot
+
+    if config.FAQ_SEARCH_MODE == "first":
+        matches = snapshot.matcher.match(user_message, first_only=True)
+        if matches:
+            return matches[0].get('answer')
+        return None
+
+    hits = snapshot.index.search(user_message, top_k=1)
+    if hits and hits[0].confidence >= config.FAQ_MIN_CONFIDENCE:
+        return hits[0].item.get('answer')
+    return None
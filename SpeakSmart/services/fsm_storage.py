@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from config import config
+from services.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+# Как часто удалять из базы давно не менявшиеся состояния (с)
+PURGE_INTERVAL = 3600
+
+
+class _Session:
+    """Состояние и данные FSM одного пользователя в памяти."""
+
+    __slots__ = ("state", "data", "touched")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data or {}
+        self.touched = time.monotonic()
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в SQLite с кэшем последних пользователей в памяти.
+
+    Чтение идет из LRU (до cache_size пользователей), промах - один запрос
+    к fsm_sessions. Изменения только помечают запись "грязной"; фоновая
+    задача раз в flush_interval_ms пишет все накопленные изменения одной
+    транзакцией, поэтому несколько update_data в одном обработчике дают
+    одну запись. Неактивные дольше cache_ttl вытесняются из памяти, а из
+    базы удаляются состояния, не менявшиеся дольше session_ttl.
+    """
+
+    def __init__(self, database: Database, cache_size: int, flush_interval_ms: int,
+                 cache_ttl: float, session_ttl: float, key_builder: KeyBuilder = None):
+        self.database = database
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.cache_ttl = cache_ttl
+        self.session_ttl = session_ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, _Session]" = OrderedDict()
+        self._dirty: Dict[str, _Session] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._last_purge = 0.0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "updates": 0,
+            "writes": 0,
+            "flushes": 0,
+            "evicted": 0,
+            "expired": 0,
+        }
+
+    def start(self):
+        """Запуск фоновой записи (выполняется и при первом изменении)."""
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _load(self, key: StorageKey) -> _Session:
+        storage_key = self.key_builder.build(key)
+        session = self._cache.get(storage_key)
+        if session is not None:
+            self._cache.move_to_end(storage_key)
+            session.touched = time.monotonic()
+            self.stats["hits"] += 1
+            return session
+
+        # Вытесненная, но еще не записанная запись берется из очереди записи
+        session = self._dirty.get(storage_key)
+        if session is None:
+            self.stats["misses"] += 1
+            row = await self.database.get_fsm_session_async(storage_key)
+            # Пока шел запрос, запись могла появиться в кэше
+            session = self._cache.get(storage_key)
+            if session is not None:
+                return session
+            session = _Session(row[0], json.loads(row[1] or "{}")) if row else _Session()
+
+        self._cache[storage_key] = session
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.stats["evicted"] += 1
+        return session
+
+    def _mark_dirty(self, key: StorageKey, session: _Session):
+        self._dirty[self.key_builder.build(key)] = session
+        self.stats["updates"] += 1
+        self.start()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        session = await self._load(key)
+        session.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        session = await self._load(key)
+        session.data = data.copy()
+        self._mark_dirty(key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._load(key)).data.copy()
+
+    async def flush(self):
+        """Запись всех накопленных изменений одной транзакцией.
+
+        Если запись не удалась (в том числе прервана отменой), сессии
+        возвращаются в очередь записи. Сессия, данные которой не
+        сериализуются в JSON, остается в очереди и не мешает записи остальных.
+        """
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        failed: Dict[str, _Session] = {}
+        try:
+            now = time.time()
+            rows, deleted = [], []
+            for storage_key, session in dirty.items():
+                if session.state is None and not session.data:
+                    deleted.append(storage_key)
+                    continue
+                try:
+                    data = json.dumps(session.data, ensure_ascii=False)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Данные FSM {storage_key} не сериализуются в JSON: {e}")
+                    failed[storage_key] = session
+                    continue
+                rows.append((storage_key, session.state, data, now))
+            await self.database.save_fsm_sessions_async(rows, deleted)
+            self.stats["writes"] += len(rows) + len(deleted)
+            self.stats["flushes"] += 1
+        except BaseException as e:
+            failed = dirty
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Ошибка записи состояний FSM: {e}")
+        finally:
+            # Возвращаем в очередь записи, не затирая более новые изменения
+            for storage_key, session in failed.items():
+                self._dirty.setdefault(storage_key, session)
+
+    def _expire(self):
+        """Вытеснение из памяти пользователей, неактивных дольше cache_ttl."""
+        threshold = time.monotonic() - self.cache_ttl
+        while self._cache:
+            storage_key, session = next(iter(self._cache.items()))
+            if session.touched >= threshold:
+                break
+            del self._cache[storage_key]
+            self.stats["expired"] += 1
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+                self._expire()
+                if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    removed = await self.database.purge_fsm_sessions_async(time.time() - self.session_ttl)
+                    if removed:
+                        logger.info(f"Удалено устаревших состояний FSM: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания хранилища FSM: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Попадания в кэш, записи в базу и размер кэша."""
+        stats = dict(self.stats)
+        stats["cached"] = len(self._cache)
+        stats["dirty"] = len(self._dirty)
+        return stats
+
+    async def close(self) -> None:
+        """Остановка фоновой записи и запись оставшихся изменений (можно вызывать повторно)."""
+        if self._task is not None:
+            # Не отменяем задачу: текущая запись дожидается завершения
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        logger.info(f"Хранилище FSM закрыто: {self.get_stats()}")
+
+
+# Глобальное хранилище состояний FSM
+fsm_storage = SQLiteStorage(
+    db,
+    cache_size=config.FSM_CACHE_SIZE,
+    flush_interval_ms=config.FSM_FLUSH_INTERVAL_MS,
+    cache_ttl=config.FSM_CACHE_TTL,
+    session_ttl=config.FSM_SESSION_TTL
+)
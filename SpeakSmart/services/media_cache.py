@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+
+from services.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+
+def file_content_hash(path: Path) -> str:
+    """SHA-1 содержимого файла."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PhraseMediaCache:
+    """Кэш Telegram file_id для аудиофайлов фраз.
+
+    После первой загрузки Telegram возвращает file_id, по которому файл
+    можно отправлять повторно без загрузки. file_id хранится в таблице
+    phrase_media с ключом (phrase_id, хэш содержимого), поэтому изменение
+    файла автоматически приводит к новой загрузке.
+    """
+
+    def __init__(self, database: Database):
+        self.database = database
+        self._file_ids: Dict[Tuple[str, str], str] = {}
+        self._hashes: Dict[Path, Tuple[int, int, str]] = {}
+        self.stats = {"hits": 0, "uploads": 0, "stale": 0}
+
+    async def _content_hash(self, path: Path) -> str:
+        """Хэш файла; пересчитывается только при изменении mtime или размера."""
+        stat = path.stat()
+        cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        content_hash = await asyncio.to_thread(file_content_hash, path)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    async def _get_file_id(self, phrase_id: str, content_hash: str) -> Optional[str]:
+        key = (phrase_id, content_hash)
+        if key not in self._file_ids:
+            file_id = await self.database.get_phrase_file_id_async(phrase_id, content_hash)
+            if not file_id:
+                return None
+            self._file_ids[key] = file_id
+        return self._file_ids[key]
+
+    async def send_phrase_voice(self, message: Message, phrase_id: str, audio_path: Path,
+                                caption: str = None, content_hash: str = None,
+                                data: bytes = None) -> Message:
+        """Отправка аудио фразы: по file_id, если он есть, иначе загрузкой файла.
+
+        content_hash можно передать из индекса аудио, чтобы не читать файл;
+        data - содержимое файла, уже находящееся в памяти (синтез по запросу).
+        """
+        content_hash = content_hash or await self._content_hash(audio_path)
+        file_id = await self._get_file_id(phrase_id, content_hash)
+
+        if file_id:
+            try:
+                sent = await message.answer_voice(voice=file_id, caption=caption)
+                self.stats["hits"] += 1
+                return sent
+            except TelegramBadRequest as e:
+                # file_id устарел или недействителен - загружаем файл заново
+                logger.warning(f"Устаревший file_id для фразы {phrase_id}: {e}")
+                self.stats["stale"] += 1
+                self._file_ids.pop((phrase_id, content_hash), None)
+                await self.database.delete_phrase_file_id_async(phrase_id, content_hash)
+
+        voice = BufferedInputFile(data, filename=audio_path.name) if data is not None else FSInputFile(audio_path)
+        sent = await message.answer_voice(voice=voice, caption=caption)
+        self.stats["uploads"] += 1
+
+        media = sent.voice or sent.audio or sent.document
+        if media:
+            self._file_ids[(phrase_id, content_hash)] = media.file_id
+            await self.database.save_phrase_file_id_async(phrase_id, content_hash, media.file_id)
+            logger.info(f"Сохранен file_id для фразы {phrase_id}")
+        return sent
+
+
+# Глобальный экземпляр кэша
+phrase_media_cache = PhraseMediaCache(db)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from aiogram import Bot
+
+from config import config
+from services.audio_pipeline import new_voice_buffer, read_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLargeError(Exception):
+    """Файл превышает допустимый размер для скачивания."""
+
+
+class MediaDownloader:
+    """Скачивание медиафайлов из Telegram через сессию основного бота.
+
+    Файл читается потоком по частям с ограничением размера. Одновременные
+    запросы одного и того же файла (по file_unique_id) объединяются в одно
+    скачивание.
+    """
+
+    def __init__(self, max_size: int, chunk_size: int, timeout: int):
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "downloads": 0,
+            "bytes": 0,
+            "deduplicated": 0,
+            "rejected": 0,
+            "failed": 0,
+            "last_ms": 0.0,
+            "total_ms": 0.0,
+        }
+
+    async def download(self, bot: Bot, file_id: str, file_unique_id: str = None,
+                       file_size: int = None) -> Optional[bytes]:
+        """Скачивание файла в память. FileTooLargeError - если файл больше max_size."""
+        key = file_unique_id or file_id
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["deduplicated"] += 1
+        else:
+            task = asyncio.create_task(self._download(bot, file_id, file_size))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        try:
+            # shield: отмена одного ожидающего не прерывает общее скачивание
+            return await asyncio.shield(task)
+        except FileTooLargeError:
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка скачивания файла {file_id}: {e}")
+            return None
+
+    async def _download(self, bot: Bot, file_id: str, file_size: Optional[int]) -> bytes:
+        if file_size and file_size > self.max_size:
+            self.stats["rejected"] += 1
+            raise FileTooLargeError(f"{file_size} > {self.max_size}")
+
+        started = time.perf_counter()
+        try:
+            file = await bot.get_file(file_id)
+            if file.file_size and file.file_size > self.max_size:
+                self.stats["rejected"] += 1
+                raise FileTooLargeError(f"{file.file_size} > {self.max_size}")
+
+            with new_voice_buffer() as buffer:
+                if bot.session.api.is_local:
+                    # Локальный Bot API сервер отдает путь к файлу на диске
+                    await bot.download_file(file.file_path, destination=buffer, timeout=self.timeout)
+                else:
+                    await self._stream(bot, file.file_path, buffer)
+                data = read_buffer(buffer)
+        except FileTooLargeError:
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["downloads"] += 1
+        self.stats["bytes"] += len(data)
+        self.stats["last_ms"] = elapsed_ms
+        self.stats["total_ms"] += elapsed_ms
+        logger.info(f"Файл {file_id} скачан: {len(data)} bytes за {elapsed_ms:.0f} мс")
+        return data
+
+    async def _stream(self, bot: Bot, file_path: str, buffer) -> None:
+        url = bot.session.api.file_url(bot.token, file_path)
+        size = 0
+        async for chunk in bot.session.stream_content(url=url, timeout=self.timeout,
+                                                      chunk_size=self.chunk_size):
+            size += len(chunk)
+            if size > self.max_size:
+                self.stats["rejected"] += 1
+                raise FileTooLargeError(f"> {self.max_size}")
+            buffer.write(chunk)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Счетчики скачиваний: количество, байты, задержка."""
+        stats = dict(self.stats)
+        stats["avg_ms"] = stats["total_ms"] / stats["downloads"] if stats["downloads"] else 0.0
+        stats["in_flight"] = len(self._in_flight)
+        return stats
+
+
+# Глобальный сервис скачивания
+media_downloader = MediaDownloader(
+    max_size=config.MAX_VOICE_FILE_SIZE,
+    chunk_size=config.DOWNLOAD_CHUNK_SIZE,
+    timeout=config.DOWNLOAD_TIMEOUT
+)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import config
+from services.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+
+class Phrase(NamedTuple):
+    """Фраза для практики."""
+    id: str
+    text: str
+    level: Optional[str]
+    topic: Optional[str]
+    correct_answers: Tuple[str, ...]
+
+
+def validate_phrases(data: dict) -> List[dict]:
+    """Проверка структуры phrases.json; ValueError при ошибке."""
+    items = data.get("phrases") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("ожидается объект с ключом 'phrases' (список)")
+
+    seen = set()
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("id") or not item.get("text"):
+            raise ValueError(f"фраза #{position}: нужны поля 'id' и 'text'")
+        if item["id"] in seen:
+            raise ValueError(f"фраза #{position}: повторяется id '{item['id']}'")
+        if not isinstance(item.get("correct_answers", []), list):
+            raise ValueError(f"фраза '{item['id']}': correct_answers должен быть списком")
+        seen.add(item["id"])
+    return items
+
+
+class PhraseCatalog:
+    """Каталог фраз, индексированный по id, уровню и теме.
+
+    Источник - data/phrases.json; при изменении файла каталог целиком
+    переносится в таблицу phrases и читается из нее одним запросом при
+    загрузке. Фразы короткие, поэтому весь каталог держится в памяти и
+    get() не обращается к базе (не блокирует event loop). Для каждого
+    фильтра (уровень, тема) строится массив позиций, поэтому случайный
+    выбор - O(1).
+    """
+
+    def __init__(self, database: Database, source_file: Path):
+        self.database = database
+        self.source_file = Path(source_file)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._ids: List[str] = []
+        self._phrases: Dict[str, Phrase] = {}
+        self._by_filter: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+
+    def load(self):
+        """Однократная загрузка каталога: при старте бота или при первом обращении."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    def _load(self):
+        self._sync_source()
+
+        phrases = [
+            Phrase(phrase_id, text, level, topic, tuple(json.loads(answers or "[]")))
+            for phrase_id, text, level, topic, answers in self.database.get_phrases()
+        ]
+
+        # Массивы позиций для всех фильтров: (уровень, тема), (уровень, *), (*, тема), (*, *)
+        by_filter: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for position, phrase in enumerate(phrases):
+            for key in {(phrase.level, phrase.topic), (phrase.level, None), (None, phrase.topic), (None, None)}:
+                by_filter.setdefault(key, []).append(position)
+        self._ids = [phrase.id for phrase in phrases]
+        self._phrases = {phrase.id: phrase for phrase in phrases}
+        self._by_filter = by_filter
+        logger.info(f"Каталог фраз загружен: {len(self._ids)} фраз, "
+                    f"уровни: {self.levels()}, темы: {self.topics()}")
+
+    def _sync_source(self):
+        """Перенос phrases.json в базу, если файл изменился с прошлой загрузки."""
+        try:
+            raw = self.source_file.read_bytes()
+        except OSError as e:
+            logger.warning(f"Файл фраз недоступен, используется каталог из базы: {e}")
+            return
+
+        source_hash = hashlib.sha1(raw).hexdigest()
+        if source_hash == self.database.get_catalog_meta("phrases_hash"):
+            return
+
+        try:
+            items = validate_phrases(json.loads(raw.decode("utf-8")))
+        except ValueError as e:
+            logger.error(f"Файл фраз поврежден, используется каталог из базы: {e}")
+            return
+
+        rows = [
+            (
+                item["id"],
+                position,
+                item["text"],
+                item.get("level"),
+                item.get("topic"),
+                json.dumps(item.get("correct_answers", []), ensure_ascii=False)
+            )
+            for position, item in enumerate(items)
+        ]
+        self.database.replace_phrases(rows, source_hash)
+        logger.info(f"Каталог фраз обновлен из {self.source_file}: {len(rows)} фраз")
+
+    def reload(self):
+        """Принудительная перезагрузка каталога (после изменения phrases.json)."""
+        with self._lock:
+            self._load()
+            self._loaded = True
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._ids)
+
+    def __contains__(self, phrase_id: str) -> bool:
+        self.load()
+        return phrase_id in self._phrases
+
+    def ids(self) -> List[str]:
+        self.load()
+        return list(self._ids)
+
+    def levels(self) -> List[str]:
+        return sorted(level for level, topic in self._by_filter if level is not None and topic is None)
+
+    def topics(self) -> List[str]:
+        return sorted(topic for level, topic in self._by_filter if level is None and topic is not None)
+
+    def get(self, phrase_id: str) -> Optional[Phrase]:
+        """Фраза по id (из памяти)."""
+        self.load()
+        return self._phrases.get(phrase_id)
+
+    def random_phrase(self, level: str = None, topic: str = None) -> Optional[Phrase]:
+        """Случайная фраза с учетом фильтра по уровню и/или теме."""
+        self.load()
+        positions = self._by_filter.get((level, topic))
+        if not positions:
+            return None
+        return self.get(self._ids[random.choice(positions)])
+
+    def iter_phrases(self) -> Iterator[Phrase]:
+        """Все фразы по порядку (для генерации аудио и отчетов)."""
+        self.load()
+        phrases = self._phrases
+        for phrase_id in self._ids:
+            yield phrases[phrase_id]
+
+
+# Глобальный каталог фраз
+phrase_catalog = PhraseCatalog(
+    db,
+    source_file=config.PHRASES_FILE
+)
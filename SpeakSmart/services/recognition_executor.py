@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionExecutor:
+    """Пул потоков для блокирующих операций распознавания речи.
+
+    Сетевые вызовы (recognize_google) и чтение аудио выполняются в пуле
+    потоков; декодирование голосовых - в отдельном пуле процессов
+    (decoder_pool). Семафор ограничивает число одновременных задач,
+    остальные ждут в очереди. Задача, не
+    уложившаяся в таймаут, снимается с ожидания: если она еще не начала
+    выполняться, она отменяется в пуле, иначе ее результат отбрасывается.
+    Место в семафоре занято, пока задача действительно выполняется в пуле,
+    поэтому зависшие вызовы не приводят к росту числа потоков сверх лимита.
+    """
+
+    def __init__(self, max_concurrency: int, thread_workers: int, timeout: float):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._threads = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="stt")
+        self.stats = {
+            "queued": 0,
+            "running": 0,
+            "completed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+        }
+
+    async def run_in_thread(self, func: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Выполнение сетевой или блокирующей функции в пуле потоков."""
+        return await self._submit(func, args, kwargs, timeout)
+
+    async def _submit(self, func: Callable, args: tuple, kwargs: dict, timeout: Optional[float]) -> Any:
+        loop = asyncio.get_running_loop()
+        self.stats["queued"] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats["queued"] -= 1
+        self.stats["running"] += 1
+
+        try:
+            future = self._threads.submit(partial(func, *args, **kwargs))
+        except Exception:
+            self._release()
+            self.stats["failed"] += 1
+            raise
+        # Место освобождается, когда задача действительно завершилась в пуле, а не по таймауту
+        future.add_done_callback(partial(self._on_done, loop))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+            self.stats["completed"] += 1
+            return result
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"Превышено время ожидания задачи распознавания: {getattr(func, '__name__', func)}")
+            raise
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, _future: Future):
+        # Вызывается в потоке пула (или сразу при отмене задачи, которая еще не началась)
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # цикл событий уже закрыт
+
+    def _release(self):
+        self.stats["running"] -= 1
+        self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Текущие счетчики: глубина очереди, выполняемые и завершенные задачи."""
+        return dict(self.stats)
+
+    def shutdown(self):
+        """Остановка пула с отменой задач, которые еще не начались."""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Пул распознавания остановлен: {self.get_stats()}")
+
+
+# Глобальный пул распознавания
+recognition_executor = RecognitionExecutor(
+    max_concurrency=config.STT_MAX_CONCURRENCY,
+    thread_workers=config.STT_THREAD_WORKERS,
+    timeout=config.STT_JOB_TIMEOUT
+)
@@ -1,10 +1,16 @@
 import speech_recognition as sr
+import asyncio
 import logging
+from functools import partial
 from pathlib import Path
 from typing import Optional
-import string
 
 from config import config
+from services.answer_matcher import AnswerScore, answer_matchers
+from services.audio_preprocessing import audio_preprocessor
+from services.audio_pipeline import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH
+from services.chunked_recognition import PartialCallback, chunked_recognizer
+from services.recognition_executor import recognition_executor
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +28,9 @@ class SpeechRecognitionService:
     async def recognize_speech(self, audio_file_path: Path) -> Optional[str]:
         """
         Распознавание речи из аудиофайла.
+
+        Чтение файла и запрос к Google выполняются в пуле распознавания,
+        чтобы не блокировать event loop. Длинная запись распознается по частям.
         """
         try:
             # Проверяем что файл существует
@@ -36,96 +45,86 @@ class SpeechRecognitionService:
 
             logger.info(f"Размер аудиофайла: {file_size} bytes")
 
-            with sr.AudioFile(str(audio_file_path)) as source:
-                # Настраиваем для фонового шума
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-
-                # Читаем аудио данные
-                audio_data = self.recognizer.record(source)
-
-                # Пытаемся распознать через Google
-                try:
-                    text = self.recognizer.recognize_google(audio_data, language=self.language)
-                    logger.info(f"Распознанный текст: '{text}'")
-                    return text
-                except sr.UnknownValueError:
-                    logger.warning("Речь не распознана (UnknownValueError)")
-                    return None
-                except sr.RequestError as e:
-                    logger.error(f"Ошибка сервиса распознавания речи: {e}")
-                    return None
+            pcm = await recognition_executor.run_in_thread(self._read_file_pcm, audio_file_path)
+            return await self.transcribe_pcm(pcm, PCM_SAMPLE_RATE)
 
+        except asyncio.TimeoutError:
+            logger.error("Превышено время распознавания речи")
+            return None
         except Exception as e:
             logger.error(f"Неожиданная ошибка при распознавании речи: {e}")
             return None
 
-    def check_answer(self, user_answer: str, correct_answer: str) -> bool:
+    async def transcribe_pcm(self, pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE, language: str = None,
+                             on_partial: PartialCallback = None) -> Optional[str]:
         """
-        Улучшенная проверка ответа пользователя с нормализацией.
+        Распознавание PCM через Google без кэша (по умолчанию на языке сервиса).
+
+        Длинное аудио делится по паузам и распознается по частям параллельно.
+        Нераспознанная речь дает None, а ошибки сервиса и таймауты
+        пробрасываются, чтобы маршрутизатор STT учел их как сбой бэкенда.
         """
+        recognize_chunk = partial(self._recognize_chunk, language=language or self.language)
+        return await chunked_recognizer.recognize(pcm, sample_rate, recognize_chunk, on_partial)
 
-        def normalize_text(text: str) -> str:
-            """Нормализует текст для сравнения"""
-            if not text:
-                return ""
+    async def _recognize_chunk(self, pcm: bytes, sample_rate: int, language: str) -> Optional[str]:
+        return await recognition_executor.run_in_thread(self._recognize_raw_pcm, pcm, sample_rate, language)
 
-            # Приводим к нижнему регистру
-            text = text.lower().strip()
+    @staticmethod
+    def _read_file_pcm(audio_file_path: Path) -> bytes:
+        """Чтение аудиофайла в PCM s16le моно; выполняется в рабочем потоке."""
+        recognizer = sr.Recognizer()
 
-            # Заменяем ё на е
-            text = text.replace('ё', 'е')
+        # Читаем аудио целиком: тишину в начале отрезает предобработка,
+        # а не adjust_for_ambient_noise, который съедал первые 0.5 с речи
+        with sr.AudioFile(str(audio_file_path)) as source:
+            audio_data = recognizer.record(source)
 
-            # Убираем знаки препинания
-            text = text.translate(str.maketrans('', '', string.punctuation))
+        return audio_data.get_raw_data(convert_rate=PCM_SAMPLE_RATE, convert_width=PCM_SAMPLE_WIDTH)
 
-            # Убираем лишние пробелы
-            text = ' '.join(text.split())
+    def _recognize_raw_pcm(self, pcm: bytes, sample_rate: int, language: str) -> Optional[str]:
+        """Предобработка PCM и запрос к Google; выполняется в рабочем потоке."""
+        pcm = audio_preprocessor.process(pcm, sample_rate)
+        return self._recognize_audio_data(sr.AudioData(pcm, sample_rate, PCM_SAMPLE_WIDTH), language)
 
+    def _recognize_audio_data(self, audio_data: sr.AudioData, language: str) -> Optional[str]:
+        """Синхронный запрос к Google; выполняется в рабочем потоке."""
+        recognizer = sr.Recognizer()
+
+        # Пытаемся распознать через Google
+        try:
+            text = recognizer.recognize_google(audio_data, language=language)
+            logger.info(f"Распознанный текст: '{text}'")
             return text
+        except sr.UnknownValueError:
+            logger.warning("Речь не распознана (UnknownValueError)")
+            return None
+        except sr.RequestError as e:
+            logger.error(f"Ошибка сервиса распознавания речи: {e}")
+            raise
+
+    def score_answer(self, user_answer: str, correct_answer: str, phrase_id: str = None,
+                     mode: str = config.ANSWER_CHECK_MODE) -> AnswerScore:
+        """
+        Оценка ответа пользователя подготовленной проверкой фразы.
 
+        mode: "repeat" - повторить фразу (нечеткое сравнение по словам),
+        "reply" - ответить на нее (допустимые ответы из каталога),
+        "any" - любое из двух.
+        """
         if not user_answer or not correct_answer:
             logger.warning("Пустой ответ или фраза для проверки")
-            return False
-
-        # Нормализуем оба текста
-        user_norm = normalize_text(user_answer)
-        correct_norm = normalize_text(correct_answer)
-
-        logger.info(f"Проверка (нормализовано): '{user_norm}' vs '{correct_norm}'")
-
-        # 1. Полное совпадение после нормализации
-        if user_norm == correct_norm:
-            logger.info("✅ Ответ совпадает полностью после нормализации")
-            return True
-
-        # 2. Разбиваем на слова для более гибкого сравнения
-        user_words = user_norm.split()
-        correct_words = correct_norm.split()
-
-        # 3. Проверяем что ответ не слишком короткий
-        if len(user_words) < len(correct_words) * 0.4:
-            logger.warning("Ответ слишком короткий")
-            return False
-
-        # 4. Ищем важные слова (длиннее 3 символов)
-        important_words = [word for word in correct_words if len(word) > 3]
-
-        # Если нет важных слов, используем все слова
-        if not important_words:
-            important_words = correct_words
-
-        # 5. Проверяем что все важные слова присутствуют
-        matches = 0
-        for important_word in important_words:
-            if any(important_word == user_word for user_word in user_words):
-                matches += 1
-
-        # Должны совпасть все важные слова
-        all_match = matches == len(important_words)
+            return AnswerScore(0.0, False, mode=mode)
 
-        logger.info(f"Совпадения важных слов: {matches}/{len(important_words)}, все совпали: {all_match}")
+        result = answer_matchers.get(phrase_id, correct_answer).evaluate(user_answer, mode)
+        logger.info(f"Проверка ответа ({result.mode}): '{user_answer}' vs '{correct_answer}' -> "
+                    f"{result.score:.2f}, зачтено: {result.passed}")
+        return result
 
-        return all_match
+    def check_answer(self, user_answer: str, correct_answer: str, phrase_id: str = None,
+                     mode: str = config.ANSWER_CHECK_MODE) -> bool:
+        """Проверка ответа пользователя: зачтен ли ответ."""
+        return self.score_answer(user_answer, correct_answer, phrase_id, mode).passed
 
 
 # Глобальный экземпляр сервиса
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Protocol, Set, Tuple
+
+import numpy as np
+
+from config import config
+from services.audio_pipeline import PCM_SAMPLE_RATE
+from services.chunked_recognition import PartialCallback
+from services.speech_recognition import SpeechRecognitionService, speech_service
+from services.yandex_speechkit import YandexSpeechKit, yandex_speech
+
+logger = logging.getLogger(__name__)
+
+# Минимум замеров, после которого задержка хеджирования берется из p95
+_MIN_LATENCY_SAMPLES = 20
+
+
+class STTBackend(Protocol):
+    """Общий интерфейс бэкенда распознавания: PCM s16le моно -> текст."""
+
+    name: str
+
+    def supports(self, language: str) -> bool:
+        ...
+
+    async def transcribe(self, pcm: bytes, sample_rate: int, language: str,
+                         on_partial: PartialCallback = None) -> Optional[str]:
+        ...
+
+
+class GoogleBackend:
+    """Google Speech Recognition (через SpeechRecognitionService), любой язык."""
+
+    name = "google"
+
+    def __init__(self, service: SpeechRecognitionService):
+        self.service = service
+
+    def supports(self, language: str) -> bool:
+        return True
+
+    async def transcribe(self, pcm: bytes, sample_rate: int, language: str,
+                         on_partial: PartialCallback = None) -> Optional[str]:
+        return await self.service.transcribe_pcm(pcm, sample_rate, language=language, on_partial=on_partial)
+
+
+class YandexBackend:
+    """Yandex SpeechKit: только язык, на который настроен клиент."""
+
+    name = "yandex"
+
+    def __init__(self, client: YandexSpeechKit):
+        self.client = client
+
+    def supports(self, language: str) -> bool:
+        return language == self.client.language and bool(self.client.api_key and self.client.folder_id)
+
+    async def transcribe(self, pcm: bytes, sample_rate: int, language: str,
+                         on_partial: PartialCallback = None) -> Optional[str]:
+        return await self.client.transcribe_pcm(pcm, sample_rate, on_partial)
+
+
+class StubBackend:
+    """Локальный детерминированный бэкенд для проверки без сети.
+
+    Ответ берется из transcripts по SHA-1 аудио, иначе возвращается
+    default. delay имитирует задержку сервиса, fail - его ошибку.
+    """
+
+    def __init__(self, name: str = "stub", transcripts: Dict[str, str] = None,
+                 default: Optional[str] = None, delay: float = 0.0, fail: bool = False,
+                 languages: Iterable[str] = None):
+        self.name = name
+        self.transcripts = transcripts or {}
+        self.default = default
+        self.delay = delay
+        self.fail = fail
+        self.languages = set(languages) if languages else None
+
+    def supports(self, language: str) -> bool:
+        return self.languages is None or language in self.languages
+
+    async def transcribe(self, pcm: bytes, sample_rate: int, language: str,
+                         on_partial: PartialCallback = None) -> Optional[str]:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name}: сбой (заглушка)")
+        return self.transcripts.get(hashlib.sha1(pcm).hexdigest(), self.default)
+
+
+class BackendStats:
+    """Скользящая статистика бэкенда: задержки успешных ответов и доля ошибок.
+
+    Пустой ответ (тишина, неразборчивая речь) ошибкой не считается и на
+    долю ошибок не влияет - для него отдельный счетчик empty.
+    """
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.empty = 0
+        self.wins = 0
+
+    def record(self, latency: float, ok: bool, error: bool = False):
+        self.requests += 1
+        self.outcomes.append(error)
+        if ok:
+            self.latencies.append(latency)
+        elif error:
+            self.errors += 1
+        else:
+            self.empty += 1
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < _MIN_LATENCY_SAMPLES:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=float), 95))
+
+    def as_dict(self) -> Dict[str, float]:
+        p95 = self.p95()
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "empty": self.empty,
+            "wins": self.wins,
+            "error_rate": round(self.error_rate, 3),
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+def parse_routes(spec: str) -> Dict[str, List[str]]:
+    """Разбор строки вида "ru-RU:yandex,google;en-US:google"."""
+    routes = {}
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        language, _, names = part.partition(":")
+        routes[language.strip()] = [n.strip() for n in names.split(",") if n.strip()]
+    return routes
+
+
+class STTRouter:
+    """Выбор бэкенда распознавания по языку с запасными вариантами.
+
+    Кандидаты берутся из маршрута для языка (или все бэкенды, поддерживающие
+    язык). Бэкенд с долей ошибок выше max_error_rate уходит в конец очереди.
+    Если ответ пустой или произошла ошибка, пробуется следующий кандидат.
+    При хеджировании второй кандидат запускается параллельно, если первый
+    не ответил за p95 своей задержки; используется первый непустой ответ.
+    Кэша здесь нет: ключ и кэш распознавания ведет очередь голосовых ответов.
+    """
+
+    def __init__(self, backends: Iterable[STTBackend], routes: Dict[str, List[str]],
+                 hedge: bool, hedge_default_delay: float, window: int, max_error_rate: float):
+        self.backends: Dict[str, STTBackend] = {b.name: b for b in backends}
+        self.routes = routes
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_default_delay
+        self.max_error_rate = max_error_rate
+        self.backend_stats = {name: BackendStats(window) for name in self.backends}
+        self.stats = {"requests": 0, "fallbacks": 0, "hedged": 0, "hedge_wins": 0, "failed": 0}
+
+    def register(self, backend: STTBackend, window: int = None):
+        """Добавление или замена бэкенда (например, заглушки)."""
+        self.backends[backend.name] = backend
+        self.backend_stats[backend.name] = BackendStats(window or config.STT_STATS_WINDOW)
+
+    def candidates(self, language: str) -> List[STTBackend]:
+        names = self.routes.get(language) or list(self.backends)
+        available = [self.backends[n] for n in names if n in self.backends and self.backends[n].supports(language)]
+        # Стабильная сортировка: нездоровые бэкенды в конец, порядок маршрута сохраняется
+        return sorted(available, key=lambda b: self.backend_stats[b.name].error_rate > self.max_error_rate)
+
+    async def recognize(self, pcm: bytes, language: str, sample_rate: int = PCM_SAMPLE_RATE,
+                                on_partial: PartialCallback = None) -> Optional[str]:
+        """Распознавание PCM s16le моно; кэширует вызывающий (voice_jobs)."""
+        if not pcm:
+            logger.error("Пустые аудиоданные!")
+            return None
+        self.stats["requests"] += 1
+        queue = self.candidates(language)
+        if not queue:
+            logger.error(f"Нет бэкенда распознавания для языка {language}")
+            self.stats["failed"] += 1
+            return None
+
+        first = True
+        while queue:
+            if not first:
+                self.stats["fallbacks"] += 1
+            first = False
+
+            primary = queue.pop(0)
+            hedge = queue[0] if self.hedge and queue else None
+            text, hedge_started = await self._race(primary, hedge, pcm, sample_rate, language, on_partial)
+            if hedge_started:
+                queue.pop(0)
+            if text:
+                return text
+            logger.warning(f"Бэкенд {primary.name} не дал результата, пробуем следующий")
+
+        self.stats["failed"] += 1
+        return None
+
+    async def _race(self, primary: STTBackend, hedge: Optional[STTBackend], pcm: bytes, sample_rate: int,
+                    language: str, on_partial: Optional[PartialCallback]) -> Tuple[Optional[str], bool]:
+        """Запрос к primary, при задержке - параллельно к hedge. Первый непустой ответ."""
+        tasks = {asyncio.create_task(self._call(primary, pcm, sample_rate, language, on_partial)): primary}
+        hedge_started = False
+        try:
+            if hedge is not None:
+                delay = self.backend_stats[primary.name].p95() or self.hedge_default_delay
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    logger.info(f"{primary.name} не ответил за {delay:.2f} с, запускаем {hedge.name}")
+                    tasks[asyncio.create_task(self._call(hedge, pcm, sample_rate, language, None))] = hedge
+                    hedge_started = True
+                    self.stats["hedged"] += 1
+
+            pending: Set[asyncio.Task] = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    text = task.result()
+                    if text:
+                        backend = tasks[task]
+                        self.backend_stats[backend.name].wins += 1
+                        if backend is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return text, hedge_started
+            return None, hedge_started
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, backend: STTBackend, pcm: bytes, sample_rate: int, language: str,
+                    on_partial: Optional[PartialCallback]) -> Optional[str]:
+        started = time.perf_counter()
+        stats = self.backend_stats[backend.name]
+        try:
+            text = await backend.transcribe(pcm, sample_rate, language, on_partial)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка бэкенда распознавания {backend.name}: {e}")
+            stats.record(time.perf_counter() - started, ok=False, error=True)
+            return None
+        stats.record(time.perf_counter() - started, ok=bool(text))
+        return text or None
+
+    def get_stats(self) -> Dict[str, object]:
+        """Счетчики маршрутизации и статистика по каждому бэкенду."""
+        stats = dict(self.stats)
+        stats["backends"] = {name: s.as_dict() for name, s in self.backend_stats.items()}
+        return stats
+
+
+# Глобальный маршрутизатор распознавания
+stt_router = STTRouter(
+    backends=[GoogleBackend(speech_service), YandexBackend(yandex_speech)],
+    routes=parse_routes(config.STT_ROUTES),
+    hedge=config.STT_HEDGE_ENABLED,
+    hedge_default_delay=config.STT_HEDGE_DEFAULT_DELAY,
+    window=config.STT_STATS_WINDOW,
+    max_error_rate=config.STT_MAX_ERROR_RATE
+)
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import config
+from services.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """Двухуровневый кэш распознанного текста.
+
+    Ключ - язык плюс file_unique_id голосового сообщения или хэш аудиоданных.
+    Первый уровень - LRU в памяти, второй - таблица transcriptions в SQLite.
+    Записи старше TTL не используются и удаляются при очистке.
+    Пустые результаты не кэшируются: это может быть временная ошибка сервиса.
+    """
+
+    def __init__(self, database: Database, memory_size: int, ttl: float):
+        self.database = database
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+        }
+
+    @staticmethod
+    def make_key(language: str, file_unique_id: str = None, audio: bytes = None) -> str:
+        """Ключ кэша по file_unique_id или по хэшу аудиоданных."""
+        if file_unique_id:
+            return f"{language}:file:{file_unique_id}"
+        digest = hashlib.sha1(audio or b"").hexdigest()
+        return f"{language}:audio:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            text, created_at = cached
+            if now - created_at < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return text
+            del self._memory[key]
+
+        row = await self.database.get_transcription_async(key, now - self.ttl)
+        if row is not None:
+            text, created_at = row
+            self.stats["disk_hits"] += 1
+            self._remember(key, text, created_at)
+            return text
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, text: str):
+        now = time.time()
+        self._remember(key, text, now)
+        await self.database.save_transcription_async(key, text, now)
+
+    def _remember(self, key: str, text: str, created_at: float):
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def get_or_recognize(self, key: str,
+                               recognize: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Текст из кэша или результат recognize(), который затем кэшируется."""
+        text = await self.get(key)
+        if text is not None:
+            return text
+
+        text = await recognize()
+        if text:
+            await self.put(key, text)
+        return text
+
+    async def purge_expired(self) -> int:
+        """Удаление устаревших записей из обоих уровней."""
+        threshold = time.time() - self.ttl
+        for key in [k for k, (_, created_at) in self._memory.items() if created_at < threshold]:
+            del self._memory[key]
+        removed = await self.database.purge_transcriptions_async(threshold)
+        if removed:
+            logger.info(f"Из кэша распознавания удалено записей: {removed}")
+        return removed
+
+    def get_stats(self) -> Dict[str, float]:
+        """Попадания, промахи и сэкономленные запросы к STT."""
+        stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats["stt_calls_saved"] = hits
+        stats["hit_ratio"] = hits / total if total else 0.0
+        stats["memory_entries"] = len(self._memory)
+        return stats
+
+
+# Глобальный кэш распознавания
+transcription_cache = TranscriptionCache(
+    db,
+    memory_size=config.TRANSCRIPTION_CACHE_SIZE,
+    ttl=config.TRANSCRIPTION_CACHE_TTL
+)
@@ -1,83 +1,267 @@
+import asyncio
+import hashlib
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-import random
+from typing import Dict, NamedTuple, Optional, Tuple
 
 from config import config
+from services.asset_builder import ENGINES, TTSEngine, synthesis_key, write_atomic
+from services.audio_assets import AudioAsset, AudioAssetIndex, audio_assets
+from services.audio_pipeline import encode_ogg_opus
+from services.phrase_catalog import PhraseCatalog, phrase_catalog
 
 logger = logging.getLogger(__name__)
 
 
-class TTSService:
-    """Сервис для работы с аудиофразами."""
+class SynthesizedAudio(NamedTuple):
+    """Аудио фразы, синтезированное по запросу (OGG/Opus)."""
+    key: str
+    path: Path
+    data: bytes
+    content_hash: str
+
+
+class SynthesisCache:
+    """Синтез аудио по запросу с двухуровневым кэшем.
 
-    def __init__(self):
-        self.audio_phrases = {
-            "greeting_hello": {
-                "text": "Hello!",
-                "correct_answers": ["hello", "hi", "hey", "hi there", "hello there"]
-            },
-            "question_name": {
-                "text": "What is your name?",
-                "correct_answers": ["my name is", "i am", "it is", "you can call me", "name is"]
-            },
-            "question_english": {
-                "text": "Do you speak English?",
-                "correct_answers": ["yes i do", "yes", "a little", "i am learning", "i speak english", "of course"]
-            },
-            "thanks": {
-                "text": "Thank you.",
-                "correct_answers": ["you are welcome", "welcome", "my pleasure", "no problem", "sure", "anytime"]
-            },
-            "goodbye": {
-                "text": "Goodbye!",
-                "correct_answers": ["goodbye", "bye", "see you", "see you later", "take care", "bye bye"]
-            },
-            "morning": {
-                "text": "Good morning.",
-                "correct_answers": ["good morning", "morning", "good morning to you", "have a good morning"]
-            },
-            "evening": {
-                "text": "Good evening.",
-                "correct_answers": ["good evening", "evening", "good evening to you", "have a good evening"]
-            },
-            "question_mood": {
-                "text": "How are you?",
-                "correct_answers": ["i am fine", "fine", "good", "great", "ok", "not bad", "i am good"]
-            }
+    Уровни: LRU в памяти (ограничен по байтам) и каталог на диске
+    (ограничен по суммарному размеру, вытесняются давно не использованные
+    файлы). Ключ - хэш параметров синтеза, как при сборке аудио. Синтез и
+    работа с диском выполняются в отдельном пуле потоков; одновременные
+    запросы одной и той же фразы ждут один общий синтез. Индекс диска и
+    счетчики меняются и в цикле событий, и в потоках пула, поэтому
+    защищены блокировками.
+    """
+
+    def __init__(self, engine: TTSEngine, directory: Path, language: str, voice: str,
+                 disk_max_bytes: int, memory_max_bytes: int, workers: int):
+        self.engine = engine
+        self.directory = Path(directory)
+        self.language = language
+        self.voice = voice
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-render")
+        self._memory: "OrderedDict[str, SynthesizedAudio]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "coalesced": 0,
+            "renders": 0,
+            "failures": 0,
+            "evicted": 0,
+            "render_ms": 0.0,
         }
 
+    async def get(self, text: str, slow: bool = False) -> Optional[SynthesizedAudio]:
+        """Аудио для текста: из памяти, с диска или новым синтезом. None при ошибке."""
+        key = synthesis_key(self.engine.name, text, self.language, self.voice, slow)
+
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self._count("memory_hits")
+            return audio
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count("coalesced")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            audio = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._load_or_render, key, text, slow
+            )
+            if audio is not None:
+                self._remember(audio)
+        except Exception as e:
+            self._count("failures")
+            logger.error(f"Ошибка синтеза аудио '{text}': {e}")
+            audio = None
+        finally:
+            del self._inflight[key]
+            future.set_result(audio)
+        return audio
+
+    def _count(self, name: str, value: float = 1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _remember(self, audio: SynthesizedAudio):
+        if len(audio.data) > self.memory_max_bytes:
+            return
+        self._memory[audio.key] = audio
+        self._memory_bytes += len(audio.data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.data)
+
+    def _load_or_render(self, key: str, text: str, slow: bool) -> SynthesizedAudio:
+        """Чтение с диска или синтез с записью на диск (выполняется в пуле потоков)."""
+        self._ensure_disk_index()
+        path = self.directory / f"{key}.ogg"
+
+        with self._disk_lock:
+            cached = key in self._disk
+            if cached:
+                self._disk.move_to_end(key)
+        if cached:
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+                self._count("disk_hits")
+                return SynthesizedAudio(key, path, data, hashlib.sha1(data).hexdigest())
+            except OSError as e:
+                logger.warning(f"Кэш синтеза: файл {path.name} недоступен, синтезируем заново: {e}")
+                self._forget(key)
+
+        started = time.perf_counter()
+        data = encode_ogg_opus(self.engine.render(text, self.language, self.voice, slow))
+        if not data:
+            raise RuntimeError("пустой результат кодирования")
+        self._count("renders")
+        self._count("render_ms", (time.perf_counter() - started) * 1000)
+
+        write_atomic(path, data)
+        with self._disk_lock:
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+        self._evict_disk(keep=key)
+        logger.info(f"Синтезировано аудио ({'медленно' if slow else 'обычно'}): {text}")
+        return SynthesizedAudio(key, path, data, hashlib.sha1(data).hexdigest())
+
+    def _ensure_disk_index(self):
+        """Однократное чтение каталога кэша: файлы в порядке последнего использования."""
+        with self._disk_lock:
+            if self._disk is not None:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".ogg"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime_ns, entry.name[:-len(".ogg")], stat.st_size))
+            files.sort()
+            self._disk = OrderedDict((key, size) for _, key, size in files)
+            self._disk_bytes = sum(self._disk.values())
+        self._evict_disk()
+
+    def _forget(self, key: str):
+        with self._disk_lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+    def _evict_disk(self, keep: str = None):
+        """Удаление давно не использованных файлов сверх лимита диска."""
+        while True:
+            with self._disk_lock:
+                if self._disk_bytes <= self.disk_max_bytes or not self._disk:
+                    return
+                key = next(iter(self._disk))
+                if key == keep:
+                    if len(self._disk) == 1:
+                        return
+                    self._disk.move_to_end(key)
+                    continue
+                self._disk_bytes -= self._disk.pop(key)
+            try:
+                (self.directory / f"{key}.ogg").unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Кэш синтеза: не удалось удалить {key}.ogg: {e}")
+            self._count("evicted")
+
+    def get_stats(self) -> Dict[str, object]:
+        """Попадания, синтезы, средняя задержка синтеза и занятый объем."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        render_ms = stats.pop("render_ms")
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"]
+        total = hits + stats["renders"] + stats["failures"]
+        stats["hit_rate"] = round(hits / total, 3) if total else 0.0
+        stats["avg_render_ms"] = round(render_ms / stats["renders"], 1) if stats["renders"] else 0.0
+        stats["memory_bytes"] = self._memory_bytes
+        with self._disk_lock:
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+    def shutdown(self):
+        """Остановка пула синтеза."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TTSService:
+    """Сервис для работы с аудиофразами."""
+
+    def __init__(self, catalog: PhraseCatalog, assets: AudioAssetIndex, synthesis: SynthesisCache):
+        # Фразы берутся из общего каталога (data/phrases.json), аудио - из индекса файлов,
+        # а при его отсутствии синтезируется по запросу
+        self.catalog = catalog
+        self.assets = assets
+        self.synthesis = synthesis
         logger.info("TTSService инициализирован")
 
-    def get_random_phrase(self) -> tuple[str, str]:
-        """Получение случайной фразы для практики."""
-        phrase_id = random.choice(list(self.audio_phrases.keys()))
-        phrase_data = self.audio_phrases[phrase_id]
-        logger.info(f"Выбрана фраза: {phrase_id} - {phrase_data['text']}")
-        return phrase_id, phrase_data["text"]
+    def get_random_phrase(self, level: str = None, topic: str = None) -> Tuple[Optional[str], Optional[str]]:
+        """Получение случайной фразы для практики (с фильтром по уровню и теме)."""
+        phrase = self.catalog.random_phrase(level=level, topic=topic)
+        if phrase is None:
+            logger.warning(f"Нет фраз для уровня {level} и темы {topic}")
+            return None, None
+        logger.info(f"Выбрана фраза: {phrase.id} - {phrase.text}")
+        return phrase.id, phrase.text
 
-    def get_phrase_audio_path(self, phrase_id: str) -> Optional[Path]:
-        """Получение пути к аудиофайлу фразы."""
-        if phrase_id in self.audio_phrases:
-            # ИЗМЕНИЛИ ПУТЬ: используем прямую структуру audio/phrases/
-            audio_path = Path(f"audio/phrases/{phrase_id}.mp3")
+    def get_phrase_asset(self, phrase_id: str) -> Optional[AudioAsset]:
+        """Аудиофайл фразы с метаданными (из индекса, без обращения к диску)."""
+        if phrase_id not in self.catalog:
+            return None
+        asset = self.assets.get(phrase_id)
+        if asset is None:
+            logger.warning(f"Нет аудиофайла для фразы: {phrase_id}")
+        return asset
 
-            logger.info(f"Поиск аудиофайла: {audio_path}")
+    async def synthesize_phrase(self, phrase_id: str, slow: bool = False) -> Optional[SynthesizedAudio]:
+        """Аудио фразы, синтезированное по запросу (для фраз без файла и замедленного варианта)."""
+        phrase = self.catalog.get(phrase_id)
+        if phrase is None:
+            return None
+        return await self.synthesis.get(phrase.text, slow=slow)
 
-            if audio_path.exists():
-                logger.info(f"Аудиофайл найден: {audio_path}")
-                return audio_path
-            else:
-                logger.warning(f"Аудиофайл не найден: {audio_path}")
-                return None
-        return None
+    def get_phrase_audio_path(self, phrase_id: str) -> Optional[Path]:
+        """Получение пути к аудиофайлу фразы."""
+        asset = self.get_phrase_asset(phrase_id)
+        return asset.path if asset else None
 
     def get_phrase_text(self, phrase_id: str) -> Optional[str]:
         """Получение текста фразы."""
-        if phrase_id in self.audio_phrases:
-            return self.audio_phrases[phrase_id]["text"]
-        return None
+        phrase = self.catalog.get(phrase_id)
+        return phrase.text if phrase else None
+
 
+# Глобальный кэш синтеза по запросу
+synthesis_cache = SynthesisCache(
+    ENGINES[config.TTS_ENGINE](),
+    config.TTS_CACHE_DIR,
+    language=config.TTS_LANGUAGE,
+    voice=config.TTS_VOICE,
+    disk_max_bytes=config.TTS_DISK_CACHE_MAX_BYTES,
+    memory_max_bytes=config.TTS_MEMORY_CACHE_MAX_BYTES,
+    workers=config.TTS_RENDER_WORKERS
+)
 
 # Глобальный экземпляр сервиса
-tts_service = TTSService()
\ No newline at end of file
+tts_service = TTSService(phrase_catalog, audio_assets, synthesis_cache)
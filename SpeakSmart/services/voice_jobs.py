@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot, types
+
+from config import config
+from services.answer_matcher import AnswerScore
+from services.audio_pipeline import AudioDecodeError
+from services.database import db
+from services.decoder_pool import decoder_pool
+from services.media_downloader import FileTooLargeError, media_downloader
+from services.speech_recognition import speech_service
+from services.stt_router import stt_router
+from services.transcription_cache import transcription_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VoiceJobResult:
+    """Итог обработки голосового ответа."""
+    text: str = ""
+    is_correct: bool = False
+    score: Optional[AnswerScore] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class VoiceJob:
+    """Голосовой ответ на фразу практики, ожидающий обработки.
+
+    status_message - сообщение "обрабатываю", которое редактируется по
+    ходу распознавания; on_done вызывается с результатом в любом случае.
+    """
+    bot: Bot
+    user_id: int
+    voice: types.Voice
+    phrase_text: str
+    phrase_id: Optional[str]
+    status_message: types.Message
+    on_done: Callable[["VoiceJob", VoiceJobResult], Awaitable[None]]
+    language: str = config.SPEECH_RECOGNITION_LANGUAGE
+    created_at: float = field(default_factory=time.perf_counter)
+
+
+class VoiceJobError(Exception):
+    """Ошибка этапа обработки; текст показывается пользователю."""
+
+
+class VoiceJobQueue:
+    """Очередь обработки голосовых ответов с фиксированным числом обработчиков.
+
+    Этапы: кэш распознавания -> скачивание -> декодирование ->
+    распознавание -> проверка -> запись в БД. Обработчик сообщения только
+    ставит задачу в очередь и сразу освобождается. Очередь ограничена: при переполнении submit
+    возвращает False, и пользователю предлагается повторить позже.
+    Задача, не уложившаяся в timeout, завершается с ошибкой.
+
+    При остановке новые задачи не принимаются, начатые дорабатываются
+    не дольше stop_timeout. Задачам из очереди и не успевшим завершиться
+    on_done приходит с ошибкой - пользователь видит просьбу отправить
+    ответ ещё раз вместо вечного "распознаю".
+    """
+
+    STAGES = ("queue", "download", "decode", "stt", "check", "db")
+    STOPPED_ERROR = "Бот перезапускается, ответ не обработан. Отправьте голосовое сообщение ещё раз."
+
+    def __init__(self, workers: int, max_queue: int, timeout: float, stop_timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.stop_timeout = stop_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks: List[asyncio.Task] = []
+        # Задачи, взятые в работу, по номеру обработчика
+        self._active: Dict[int, VoiceJob] = {}
+        self._accepting = False
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "dropped": 0,
+        }
+        self._stage_ms = {stage: 0.0 for stage in self.STAGES}
+        self._stage_count = {stage: 0 for stage in self.STAGES}
+
+    def start(self):
+        """Запуск обработчиков."""
+        if self._tasks:
+            return
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Очередь голосовых ответов запущена: {self.workers} обработчиков")
+
+    async def stop(self, timeout: float = None):
+        """Остановка без потери ответов.
+
+        Новые задачи не принимаются, задачи из очереди не запускаются,
+        начатые ждем до timeout (по умолчанию stop_timeout) секунд.
+        Всем необработанным задачам вызывается on_done с ошибкой.
+        """
+        self._accepting = False
+        timeout = self.stop_timeout if timeout is None else timeout
+
+        dropped = []
+        while not self._queue.empty():
+            dropped.append(self._queue.get_nowait())
+            self._queue.task_done()
+
+        if self._active:
+            logger.info(f"Ждем завершения голосовых ответов в работе: {len(self._active)}")
+            try:
+                # Очередь пуста, поэтому join ждет только начатые задачи
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Голосовые ответы не завершились за {timeout} с: {len(self._active)}")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        dropped.extend(self._active.values())
+        self._active.clear()
+
+        if dropped:
+            logger.warning(f"При остановке не обработано голосовых ответов: {len(dropped)}")
+            self.stats["dropped"] += len(dropped)
+            await asyncio.gather(*(self._notify_stopped(job) for job in dropped))
+        logger.info(f"Очередь голосовых ответов остановлена: {self.get_stats()}")
+
+    async def _notify_stopped(self, job: VoiceJob):
+        try:
+            await job.on_done(job, VoiceJobResult(error=self.STOPPED_ERROR))
+        except Exception as e:
+            logger.error(f"Ошибка уведомления пользователя {job.user_id} об остановке: {e}")
+
+    def submit(self, job: VoiceJob) -> bool:
+        """Постановка задачи в очередь. False - очередь заполнена или остановлена."""
+        if not self._accepting:
+            self.stats["rejected"] += 1
+            logger.warning(f"Очередь голосовых ответов остановлена, отказ пользователю {job.user_id}")
+            return False
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            logger.warning(f"Очередь голосовых ответов заполнена, отказ пользователю {job.user_id}")
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            self._active[index] = job
+            result = VoiceJobResult()
+            self._record(result, "queue", (time.perf_counter() - job.created_at) * 1000)
+            try:
+                await asyncio.wait_for(self._process(job, result), self.timeout)
+                self.stats["completed"] += 1
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                result.error = "Обработка заняла слишком много времени. Попробуйте ещё раз."
+                logger.warning(f"Голосовой ответ пользователя {job.user_id} не обработан за {self.timeout} с")
+            except VoiceJobError as e:
+                self.stats["failed"] += 1
+                result.error = str(e)
+            except Exception as e:
+                self.stats["failed"] += 1
+                result.error = "Произошла ошибка при обработке голосового сообщения."
+                logger.error(f"Ошибка обработки голосового ответа пользователя {job.user_id}: {e}")
+
+            logger.info(f"Голосовой ответ пользователя {job.user_id}: "
+                        f"{ {k: round(v) for k, v in result.timings.items()} } мс")
+            # Результат уже есть: при остановке эту задачу повторно не уведомляем
+            del self._active[index]
+            try:
+                await job.on_done(job, result)
+            except Exception as e:
+                logger.error(f"Ошибка отправки результата пользователю {job.user_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: VoiceJob, result: VoiceJobResult):
+        # Кэш распознавания проверяется один раз: при попадании не нужны ни скачивание, ни декодирование
+        key = transcription_cache.make_key(job.language, file_unique_id=job.voice.file_unique_id)
+        text = await transcription_cache.get_or_recognize(key, lambda: self._recognize(job, result))
+        if not text:
+            raise VoiceJobError("Не удалось распознать речь. Попробуйте сказать фразу чётче или ответьте текстом.")
+        result.text = text
+
+        started = time.perf_counter()
+        result.score = speech_service.score_answer(text, job.phrase_text, phrase_id=job.phrase_id)
+        result.is_correct = result.score.passed
+        self._record(result, "check", (time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await db.enqueue_practice_session(job.user_id, job.phrase_id, text, result.is_correct)
+        self._record(result, "db", (time.perf_counter() - started) * 1000)
+
+    async def _recognize(self, job: VoiceJob, result: VoiceJobResult) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            voice_data = await media_downloader.download(
+                job.bot,
+                job.voice.file_id,
+                file_unique_id=job.voice.file_unique_id,
+                file_size=job.voice.file_size
+            )
+        except FileTooLargeError:
+            raise VoiceJobError("Голосовое сообщение слишком большое.")
+        self._record(result, "download", (time.perf_counter() - started) * 1000)
+        if not voice_data:
+            raise VoiceJobError("Не удалось скачать голосовое сообщение.")
+
+        started = time.perf_counter()
+        try:
+            pcm = await decoder_pool.decode(voice_data)
+        except AudioDecodeError as e:
+            logger.error(f"Не удалось декодировать голосовое сообщение: {e}")
+            raise VoiceJobError("Не удалось прочитать голосовое сообщение.")
+        self._record(result, "decode", (time.perf_counter() - started) * 1000)
+
+        async def show_partial(text: str):
+            await job.status_message.edit_text(f"🎧 Распознаю: {text}…", parse_mode=None)
+
+        started = time.perf_counter()
+        text = await stt_router.recognize(pcm, job.language, on_partial=show_partial)
+        self._record(result, "stt", (time.perf_counter() - started) * 1000)
+        return text
+
+    def _record(self, result: VoiceJobResult, stage: str, elapsed_ms: float):
+        result.timings[stage] = result.timings.get(stage, 0.0) + elapsed_ms
+        self._stage_ms[stage] += elapsed_ms
+        self._stage_count[stage] += 1
+
+    def get_stats(self) -> Dict[str, object]:
+        """Счетчики задач, глубина очереди и среднее время этапов (мс)."""
+        stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize()
+        stats["stage_avg_ms"] = {
+            stage: round(self._stage_ms[stage] / self._stage_count[stage], 1)
+            for stage in self.STAGES if self._stage_count[stage]
+        }
+        return stats
+
+
+# Глобальная очередь голосовых ответов
+voice_jobs = VoiceJobQueue(
+    workers=config.VOICE_JOB_WORKERS,
+    max_queue=config.VOICE_JOB_QUEUE_SIZE,
+    timeout=config.VOICE_JOB_TIMEOUT,
+    stop_timeout=config.VOICE_JOB_STOP_TIMEOUT
+)
@@ -1,50 +1,46 @@
-
+import asyncio
 import logging
 import os
-import speech_recognition as sr
-from pydub import AudioSegment
-import tempfile
+
+from services.audio_pipeline import AudioDecodeError
+from services.decoder_pool import decoder_pool
+from services.speech_recognition import speech_service
 
 logger = logging.getLogger(__name__)
 
 
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
 class VoiceProcessor:
     def __init__(self):
-        self.recognizer = sr.Recognizer()
+        self.language = 'ru-RU'
 
     async def process_voice_message(self, voice_file_path: str) -> str:
         """
-        Пытается распознать голосовое сообщение разными способами
+        Пытается распознать голосовое сообщение из файла (файл затем удаляется)
+
+        Декодирование и распознавание - те же, что у голосовых ответов:
+        пул процессов декодирования и speech_service.transcribe_pcm.
         """
         try:
-            # Конвертируем OGG в WAV
-            if voice_file_path.endswith('.oga') or voice_file_path.endswith('.ogg'):
-                audio = AudioSegment.from_file(voice_file_path, format="ogg")  # ← ИСПРАВЛЕНО
-                wav_path = voice_file_path.rsplit('.', 1)[0] + '.wav'
-                audio.export(wav_path, format="wav")
-                voice_file_path = wav_path
-
-            # Распознаем речь
-            with sr.AudioFile(voice_file_path) as source:
-                audio_data = self.recognizer.record(source)
-
-            # Попытка 1: Google Speech Recognition
-            try:
-                text = self.recognizer.recognize_google(audio_data, language='ru-RU')
-                logger.info(f"Google распознал: {text}")
-                return text.lower()
-            except sr.UnknownValueError:
-                logger.warning("Google не распознал речь")
-                return ""
-            except sr.RequestError as e:
-                logger.error(f"Ошибка запроса к Google: {e}")
-                return ""
-
+            voice_data = await asyncio.to_thread(_read_file, voice_file_path)
+            pcm = await decoder_pool.decode(voice_data)
+            text = await speech_service.transcribe_pcm(pcm, language=self.language)
+            return text.lower() if text else ""
+        except asyncio.TimeoutError:
+            logger.error("Превышено время обработки голоса")
+            return ""
+        except AudioDecodeError as e:
+            logger.error(f"Не удалось декодировать голос: {e}")
+            return ""
         except Exception as e:
             logger.error(f"Ошибка обработки голоса: {e}")
             return ""
         finally:
-            # Удаляем временные файлы
+            # Удаляем временный файл
             try:
                 if os.path.exists(voice_file_path):
                     os.remove(voice_file_path)
@@ -53,4 +49,4 @@ class VoiceProcessor:
 
 
 # Создаем глобальный экземпляр
-voice_processor = VoiceProcessor()
\ No newline at end of file
+voice_processor = VoiceProcessor()
@@ -1,74 +1,175 @@
+import asyncio
 import logging
+import random
+import time
 import requests
 import os
 import aiohttp
 import aiofiles
+from typing import Optional
 from dotenv import load_dotenv
 
+from config import config
+from services.audio_pipeline import PCM_SAMPLE_RATE
+from services.audio_preprocessing import audio_preprocessor
+from services.chunked_recognition import PartialCallback, chunked_recognizer
+
 # Загружаем переменные окружения
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Статусы, при которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class YandexSpeechKitError(Exception):
+    """Сервис недоступен или отклонил запрос (в отличие от пустого распознавания)."""
+
+
+class CircuitOpenError(YandexSpeechKitError):
+    """Запрос не отправлен: предохранитель разомкнут."""
+
+
+class CircuitBreaker:
+    """Предохранитель: после серии ошибок подряд временно блокирует запросы.
+
+    После reset_timeout пропускается ровно один пробный запрос; пока он
+    выполняется, остальные запросы по-прежнему блокируются.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Разрешен ли запрос. После reset_timeout разрешается один пробный запрос."""
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.probing = True
+        return True
+
+    def release_probe(self):
+        """Завершение пробного запроса без вывода о доступности сервиса."""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        """Учет одного неудачного запроса (после всех его повторов)."""
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Yandex SpeechKit недоступен, запросы приостановлены "
+                               f"на {self.reset_timeout} с")
+            self.opened_at = time.monotonic()
+
 
 class YandexSpeechKit:
     def __init__(self):
         self.api_key = os.getenv("YANDEX_API_KEY") or os.getenv("API_KEY")
         self.folder_id = os.getenv("YANDEX_FOLDER_ID") or os.getenv("FOLDER_ID")
-        self.base_url = "https://stt.api.cloud.yandex.net/speech/v1/stt:recognize"
+        self.base_url = config.YANDEX_STT_URL
+        self.language = "ru-RU"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.YANDEX_BREAKER_THRESHOLD,
+            reset_timeout=config.YANDEX_BREAKER_RESET
+        )
 
         # Логируем для отладки
         logger.info(f"Yandex SpeechKit инициализирован. Folder ID: {self.folder_id}")
 
+    async def start(self):
+        """Создание общей HTTP-сессии (вызывается при запуске диспетчера)."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.YANDEX_CONNECTION_LIMIT,
+                keepalive_timeout=config.YANDEX_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=config.YANDEX_REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self):
+        """Закрытие HTTP-сессии (вызывается при остановке диспетчера)."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def process_voice_message(self, voice_file_path: str) -> str:
         """Основной метод для обработки голосовых сообщений"""
         return await self.recognize_speech(voice_file_path)
 
+    async def _post(self, audio_data: bytes, headers: dict, params: dict) -> dict:
+        """POST с повторами по экспоненциальной задержке и предохранителем.
+
+        Возвращает JSON ответа; при ошибке бросает YandexSpeechKitError.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("запрос пропущен: предохранитель разомкнут")
+        # Запрос, пропущенный при разомкнутом предохранителе, - пробный: без повторов
+        probe = self.breaker.is_open
+
+        session = await self.start()
+        attempts = config.YANDEX_MAX_RETRIES + 1
+
+        try:
+            for attempt in range(attempts):
+                try:
+                    async with session.post(self.base_url, headers=headers, params=params,
+                                            data=audio_data) as response:
+                        logger.info(f"Yandex SpeechKit response: {response.status}")
+
+                        if response.status == 200:
+                            self.breaker.record_success()
+                            return await response.json()
+
+                        error = f"HTTP {response.status}: {await response.text()}"
+                        logger.error(f"Ошибка Yandex SpeechKit: {error}")
+                        if response.status not in RETRYABLE_STATUSES:
+                            # Ошибка клиента (400, 401...) не говорит о недоступности сервиса
+                            raise YandexSpeechKitError(error)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"сетевая ошибка: {e!r}"
+                    logger.warning(f"Сетевая ошибка Yandex SpeechKit (попытка {attempt + 1}): {e}")
+
+                if attempt + 1 < attempts and not self.breaker.is_open:
+                    delay = config.YANDEX_BACKOFF_BASE * (2 ** attempt)
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+                else:
+                    break
+
+            # Одна ошибка на запрос, а не на каждую попытку
+            self.breaker.record_failure()
+            raise YandexSpeechKitError(f"попыток: {attempt + 1}, последняя ошибка: {error}")
+        finally:
+            if probe:
+                self.breaker.release_probe()
+
     async def recognize_speech(self, audio_file_path: str) -> str:
         """Распознает речь из аудио файла"""
         try:
-            # Проверяем наличие ключей
-            if not self.api_key:
-                logger.error("YANDEX_API_KEY не настроен!")
-                return ""
-            if not self.folder_id:
-                logger.error("YANDEX_FOLDER_ID не настроен!")
-                return ""
-
             # Читаем аудио файл
             async with aiofiles.open(audio_file_path, 'rb') as audio_file:
                 audio_data = await audio_file.read()
 
-            headers = {
-                "Authorization": f"Api-Key {self.api_key}",
-                "Content-Type": "audio/ogg"
-            }
-
-            params = {
-                "folderId": self.folder_id,
-                "lang": "ru-RU"
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                        self.base_url,
-                        headers=headers,
-                        params=params,
-                        data=audio_data,
-                        timeout=10
-                ) as response:
-
-                    logger.info(f"Yandex SpeechKit response: {response.status}")
-
-                    if response.status == 200:
-                        result = await response.json()
-                        recognized_text = result.get("result", "")
-                        logger.info(f"Yandex SpeechKit распознал: {recognized_text}")
-                        return recognized_text.lower()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка Yandex SpeechKit: {error_text}")
-                        return ""
+            return await self._recognize_bytes(audio_data, "oggopus")
 
         except Exception as e:
             logger.error(f"Ошибка в Yandex SpeechKit: {e}")
@@ -81,6 +182,50 @@ class YandexSpeechKit:
             except Exception as e:
                 logger.warning(f"Не удалось удалить временный файл: {e}")
 
+    async def transcribe_pcm(self, pcm: bytes, sample_rate: int = PCM_SAMPLE_RATE,
+                             on_partial: PartialCallback = None) -> str:
+        """Распознает PCM s16le моно по частям (ошибки сервиса пробрасываются)
+
+        Длинная запись делится по паузам на части (синхронное API SpeechKit
+        ограничивает длину запроса), части отправляются параллельно.
+        """
+        return await chunked_recognizer.recognize(pcm, sample_rate, self._recognize_pcm_chunk, on_partial)
+
+    async def _recognize_pcm_chunk(self, pcm: bytes, sample_rate: int) -> str:
+        # Тишина по краям обрезается перед отправкой
+        pcm = await asyncio.to_thread(audio_preprocessor.process, pcm, sample_rate)
+        return await self._recognize_bytes(pcm, "lpcm", sample_rate)
+
+    async def _recognize_bytes(self, audio_data: bytes, audio_format: str, sample_rate: int = None) -> str:
+        """Запрос к SpeechKit без кэша.
+
+        Пустая строка - речь не распознана; ошибки сервиса, сети и настройки
+        пробрасываются (YandexSpeechKitError), чтобы маршрутизатор STT учел сбой.
+        """
+        # Проверяем наличие ключей
+        if not self.api_key:
+            raise YandexSpeechKitError("YANDEX_API_KEY не настроен")
+        if not self.folder_id:
+            raise YandexSpeechKitError("YANDEX_FOLDER_ID не настроен")
+
+        headers = {
+            "Authorization": f"Api-Key {self.api_key}",
+            "Content-Type": "audio/ogg" if audio_format == "oggopus" else "application/octet-stream"
+        }
+
+        params = {
+            "folderId": self.folder_id,
+            "lang": self.language,
+            "format": audio_format
+        }
+        if sample_rate:
+            params["sampleRateHertz"] = sample_rate
+
+        result = await self._post(audio_data, headers, params)
+        recognized_text = result.get("result", "")
+        logger.info(f"Yandex SpeechKit распознал: {recognized_text}")
+        return recognized_text.lower()
+
 
 # Создаем глобальный экземпляр
-yandex_speech = YandexSpeechKit()
\ No newline at end of file
+yandex_speech = YandexSpeechKit()
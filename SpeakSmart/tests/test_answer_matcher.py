@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from services.answer_matcher import (MODE_ANY, MODE_REPEAT, MODE_REPLY, AnswerMatcher, AnswerMatcherCache, WordDiff,
+                                     bounded_levenshtein, phonetic_key, word_similarity)
+from services.database import Database
+from services.phrase_catalog import PhraseCatalog
+
+ANSWERS = ("I'm fine, thank you", "fine", "my name is ...")
+
+
+def test_reply_must_match_a_whole_accepted_answer():
+    matcher = AnswerMatcher("How are you?", ANSWERS)
+    assert matcher.check("Fine!", MODE_REPLY)
+    assert matcher.check("I'm fine, thank you.", MODE_REPLY)
+    # Слова-паразиты по краям допускаются
+    assert matcher.check("um, fine", MODE_REPLY)
+    # Префикс или продолжение допустимого ответа не засчитывается
+    assert not matcher.check("I'm fine", MODE_REPLY)
+    assert not matcher.check("fine but tired", MODE_REPLY)
+    assert not matcher.check("not fine", MODE_REPLY)
+
+
+def test_open_answer_accepts_a_few_more_words():
+    matcher = AnswerMatcher("What is your name?", ANSWERS)
+    assert matcher.check("My name is Anna", MODE_REPLY)
+    assert matcher.check("my name is Anna Maria Smith", MODE_REPLY)
+    # Нужно хотя бы одно слово после "...", но не больше OPEN_ANSWER_MAX_WORDS
+    assert not matcher.check("my name is", MODE_REPLY)
+    assert not matcher.check("my name is Anna and I live in London", MODE_REPLY)
+
+
+def test_modes_choose_between_repeat_and_reply():
+    matcher = AnswerMatcher("How are you?", ANSWERS)
+    assert matcher.evaluate("how are you").mode == MODE_REPEAT
+    # По умолчанию проверяется повтор, ответ на фразу не засчитывается
+    assert not matcher.check("fine")
+    assert not matcher.check("how are you", MODE_REPLY)
+
+    result = matcher.evaluate("fine", MODE_ANY)
+    assert result.passed and result.mode == MODE_REPLY
+    assert matcher.check("how are you", MODE_ANY)
+    assert not matcher.check("", MODE_ANY)
+
+
+def test_phrase_without_answers_only_accepts_repeat():
+    matcher = AnswerMatcher("Good morning")
+    assert not matcher.check("good morning", MODE_REPLY)
+    assert matcher.check("good morning", MODE_ANY)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    source = tmp_path / "phrases.json"
+    source.write_text(json.dumps({"phrases": [
+        {"id": "p1", "text": "How are you?", "correct_answers": list(ANSWERS)},
+        {"id": "p2", "text": "Good morning"},
+    ]}), encoding="utf-8")
+    database = Database(str(tmp_path / "test.db"))
+    yield PhraseCatalog(database, source)
+    database.close()
+
+
+def test_cache_compiles_once_per_phrase(catalog):
+    cache = AnswerMatcherCache(catalog, cache_size=10, pass_score=0.8)
+    assert cache.compile_all() == 2
+    matcher = cache.get("p1", "How are you?")
+    assert matcher is cache.get("p1", "How are you?")
+    assert matcher.check("fine", MODE_REPLY)
+    assert cache.get_stats() == {"hits": 2, "compiled": 2, "cached": 2}
+
+    # Текст не совпадает с каталогом: проверка только по эталону
+    other = cache.get("p1", "How old are you?")
+    assert other is not matcher
+    assert not other.check("fine", MODE_REPLY)
+
+
+def test_cache_evicts_least_recently_used(catalog):
+    cache = AnswerMatcherCache(catalog, cache_size=2, pass_score=0.8)
+    first = cache.get(None, "one")
+    cache.get(None, "two")
+    assert cache.get(None, "one") is first
+    cache.get(None, "three")  # вытесняется "two"
+    assert cache.get(None, "one") is first
+    cache.get(None, "two")
+    assert cache.get_stats() == {"hits": 2, "compiled": 4, "cached": 2}
+    # Каталог больше кэша: проверки готовятся по запросу
+    assert AnswerMatcherCache(catalog, cache_size=1, pass_score=0.8).compile_all() == 0
+
+
+def test_repeat_tolerates_typos_and_asr_homophones():
+    matcher = AnswerMatcher("Good morning, how are you?")
+    exact = matcher.evaluate("good morning how are you")
+    assert exact.score == 1.0 and all(word.status == "ok" for word in exact.diff)
+
+    # Ошибка распознавания (mourning) не проваливает попытку
+    heard = matcher.evaluate("good mourning how are you")
+    assert heard.passed and heard.score < 1.0
+    assert WordDiff("close", "morning", "mourning") in heard.diff
+    assert matcher.check("good morninng how are you")
+    assert not matcher.check("good evening how are you")
+
+
+def test_repeat_diff_shows_missing_extra_and_wrong_words():
+    matcher = AnswerMatcher("I would like a cup of coffee")
+    result = matcher.evaluate("I like a big cup of tea")
+    statuses = {(word.status, word.expected, word.heard) for word in result.diff}
+    assert ("missing", "would", None) in statuses
+    assert ("extra", None, "big") in statuses
+    assert ("wrong", "coffee", "tea") in statuses
+    assert not result.passed
+    # Пропуск короткого слова стоит меньше, чем пропуск важного
+    assert matcher.evaluate("I would like cup of coffee").score > matcher.evaluate("I like a cup of coffee").score
+
+
+def test_pass_score_is_the_threshold():
+    answer = "good mourning how are you"
+    score = AnswerMatcher("Good morning, how are you?").evaluate(answer).score
+    assert AnswerMatcher("Good morning, how are you?", pass_score=score).check(answer)
+    assert not AnswerMatcher("Good morning, how are you?", pass_score=score + 0.001).check(answer)
+
+
+def test_bounded_levenshtein_stops_at_cap():
+    assert bounded_levenshtein("morning", "morning", 2) == 0
+    assert bounded_levenshtein("morning", "mornin", 2) == 1
+    assert bounded_levenshtein("kitten", "sitting", 3) == 3
+    assert bounded_levenshtein("kitten", "sitting", 2) == 3
+    assert bounded_levenshtein("a", "abcdef", 2) == 3
+    assert phonetic_key("there") == phonetic_key("their")
+    assert word_similarity("there", phonetic_key("there"), "their", phonetic_key("their")) >= 0.8
@@ -0,0 +1,79 @@
+import numpy as np
+
+from services.audio_preprocessing import AudioPreprocessor, split_on_silence, trim_and_normalize
+
+RATE = 16000
+
+
+def clip(silence_s: float, speech_s: float, amplitude: float, noise: float = 30.0, seed: int = 0) -> bytes:
+    """Шум, тон 300 Гц, шум: PCM s16le моно."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(RATE * speech_s)) / RATE
+    parts = [
+        rng.normal(0, noise, int(RATE * silence_s)),
+        np.sin(2 * np.pi * 300 * t) * amplitude + rng.normal(0, noise, len(t)),
+        rng.normal(0, noise, int(RATE * silence_s)),
+    ]
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16).tobytes()
+
+
+def dbfs(pcm: bytes) -> float:
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float64)
+    return 20 * np.log10(np.sqrt(np.mean(samples ** 2)) / 32767)
+
+
+def test_silence_is_trimmed_with_padding():
+    pcm = clip(silence_s=1.0, speech_s=0.5, amplitude=3000)
+    trimmed = trim_and_normalize(pcm, RATE, padding_ms=200)
+    seconds = len(trimmed) / 2 / RATE
+    # 0.5 с речи и по 0.2 с запаса с каждой стороны (с точностью до кадра)
+    assert abs(seconds - 0.9) <= 0.04
+    assert len(trimmed) < len(pcm) / 2
+
+
+def test_loudness_is_normalized_to_target():
+    for amplitude in (800, 3000, 20000):
+        trimmed = trim_and_normalize(clip(0.5, 1.0, amplitude, noise=5), RATE, padding_ms=0, target_dbfs=-20)
+        assert abs(dbfs(trimmed) - -20) < 1.0
+
+
+def test_gain_never_clips():
+    # Короткий громкий щелчок: нормализация по RMS дала бы клиппинг, предел - пик
+    samples = np.zeros(RATE, dtype=np.int16)
+    samples[8000:8400] = 30000
+    samples[8400:8800] = -30000
+    trimmed = np.frombuffer(trim_and_normalize(samples.tobytes(), RATE, target_dbfs=-3), dtype=np.int16)
+    assert np.abs(trimmed.astype(np.int32)).max() <= 32767
+    assert np.abs(trimmed.astype(np.int32)).max() >= 29000
+
+
+def test_no_speech_or_too_short_is_returned_unchanged():
+    noise = (np.random.default_rng(1).normal(0, 30, RATE)).astype(np.int16).tobytes()
+    assert trim_and_normalize(noise, RATE) == noise
+    assert trim_and_normalize(b"\1\0" * 10, RATE) == b"\1\0" * 10
+
+
+def test_split_cuts_in_pauses_and_respects_max_length():
+    t = np.arange(RATE) / RATE
+    tone = (np.sin(2 * np.pi * 250 * t) * 6000).astype(np.int16)
+    pause = np.zeros(RATE // 2, dtype=np.int16)
+    pcm = np.concatenate([tone, pause] * 6).tobytes()  # 9 с
+
+    chunks = split_on_silence(pcm, RATE, max_chunk_ms=3000, min_silence_ms=300)
+    assert b"".join(chunks) == pcm
+    assert all(len(chunk) / 2 / RATE <= 3.0 for chunk in chunks)
+    for chunk in chunks[:-1]:
+        # Разрез в паузе: конец части - тишина
+        assert not np.frombuffer(chunk, dtype=np.int16)[-160:].any()
+
+
+def test_preprocessor_counts_bytes_and_falls_back_on_error():
+    preprocessor = AudioPreprocessor(frame_ms=20, padding_ms=200, target_dbfs=-20)
+    pcm = clip(1.0, 0.5, 3000)
+    out = preprocessor.process(pcm, RATE)
+    assert len(out) < len(pcm)
+    # Нечетная длина не является PCM s16le: возвращаются исходные данные
+    assert preprocessor.process(b"\0\0\0", RATE) == b"\0\0\0"
+    stats = preprocessor.get_stats()
+    assert stats["clips"] == 2
+    assert stats["bytes_saved"] == len(pcm) - len(out)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from services.answer_matcher import MODE_ANY, MODE_REPEAT, MODE_REPLY
+from services.batch_grader import BatchGrader
+from services.database import Database
+from services.phrase_catalog import PhraseCatalog
+
+SESSIONS = [
+    # (phrase_id, ответ, засчитан при записи)
+    ("p1", "good morning", False),
+    ("p1", "Good mourning!", True),
+    ("p2", "fine", False),
+    ("p2", "bad", True),
+    ("p3", "unknown phrase", True),
+    ("p1", "", True),
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    for n, (phrase_id, response, is_correct) in enumerate(SESSIONS * 5):
+        database.add_practice_session(n % 3, phrase_id, response, is_correct)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def catalog(tmp_path, database):
+    source = tmp_path / "phrases.json"
+    source.write_text(json.dumps({"phrases": [
+        {"id": "p1", "text": "Good morning"},
+        {"id": "p2", "text": "How are you?", "correct_answers": ["fine", "I'm fine"]},
+    ]}), encoding="utf-8")
+    return PhraseCatalog(database, source)
+
+
+def grades(database) -> dict:
+    return {
+        response: (passed, mode)
+        for response, passed, mode in database._run(lambda conn: conn.execute('''
+            SELECT s.user_response, g.passed, g.mode
+            FROM practice_grades g JOIN practice_sessions s ON s.session_id = g.session_id
+        ''').fetchall())
+    }
+
+
+def test_regrades_history_into_practice_grades(database, catalog):
+    grader = BatchGrader(database, catalog, workers=2, chunk_size=4, mode=MODE_ANY, pass_score=0.8)
+    stats = grader.run()
+
+    assert stats["rows"] == 30
+    # Неизвестная фраза и пустой ответ пропускаются
+    assert (stats["graded"], stats["skipped"]) == (20, 10)
+    # Изменилась оценка "good morning" (не засчитан -> засчитан), "fine" и "bad"
+    assert stats["changed"] == 15
+    assert grades(database) == {
+        "good morning": (1, MODE_REPEAT),
+        "Good mourning!": (1, MODE_REPEAT),
+        "fine": (1, MODE_REPLY),
+        "bad": (0, MODE_REPEAT),
+    }
+
+
+def test_regrade_overwrites_and_respects_limit(database, catalog):
+    BatchGrader(database, catalog, workers=1, chunk_size=100, mode=MODE_ANY, pass_score=0.8).run()
+    stats = BatchGrader(database, catalog, workers=2, chunk_size=5, mode=MODE_REPEAT, pass_score=0.8).run(limit=12)
+
+    assert (stats["rows"], stats["graded"]) == (12, 8)
+    count = database._run(lambda conn: conn.execute("SELECT COUNT(*) FROM practice_grades").fetchone()[0])
+    assert count == 20
+    # Первые сессии перепроверены в режиме repeat: "fine" больше не засчитан
+    first = database._run(lambda conn: conn.execute('''
+        SELECT g.passed, g.mode FROM practice_grades g JOIN practice_sessions s ON s.session_id = g.session_id
+        WHERE s.user_response = 'fine' ORDER BY s.session_id
+    ''').fetchall())
+    assert first[:2] == [(0, MODE_REPEAT), (0, MODE_REPEAT)]
+    assert first[2:] == [(1, MODE_REPLY)] * 3
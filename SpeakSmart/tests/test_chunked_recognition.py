@@ -0,0 +1,111 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.audio_preprocessing import split_on_silence
+from services.chunked_recognition import ChunkedRecognizer
+from services.database import Database
+from services.transcription_cache import TranscriptionCache
+
+RATE = 16000
+
+
+def long_clip(bursts: int = 6, burst_s: float = 2.0, pause_s: float = 0.5) -> bytes:
+    """Речеподобный сигнал: отрезки тона разной высоты, разделенные паузами."""
+    t = np.arange(int(RATE * burst_s)) / RATE
+    pause = np.zeros(int(RATE * pause_s), dtype=np.int16)
+    parts = []
+    for n in range(bursts):
+        parts.append((np.sin(2 * np.pi * (200 + 40 * n) * t) * 8000).astype(np.int16))
+        parts.append(pause)
+    return np.concatenate(parts).tobytes()
+
+
+def make_recognizer() -> ChunkedRecognizer:
+    return ChunkedRecognizer(max_chunk_ms=3000, min_silence_ms=300, max_parallel=3)
+
+
+def labelled(pcm: bytes, recognizer: ChunkedRecognizer, fail_index: int = None):
+    """Распознавание части: ее номер; поздние части отвечают раньше ранних."""
+    chunks = split_on_silence(pcm, RATE, recognizer.max_chunk_ms, recognizer.min_silence_ms)
+    index = {chunk: i for i, chunk in enumerate(chunks)}
+
+    async def recognize_chunk(chunk: bytes, sample_rate: int) -> str:
+        i = index[chunk]
+        await asyncio.sleep(0.01 * (len(chunks) - i))
+        if i == fail_index:
+            raise RuntimeError("сбой части")
+        return f"c{i}"
+
+    return chunks, recognize_chunk
+
+
+def test_chunks_are_stitched_in_order_with_prefix_partials():
+    async def scenario():
+        recognizer = make_recognizer()
+        pcm = long_clip()
+        chunks, recognize_chunk = labelled(pcm, recognizer)
+        partials = []
+
+        async def on_partial(text: str):
+            partials.append(text)
+
+        text = await recognizer.recognize(pcm, RATE, recognize_chunk, on_partial)
+        expected = " ".join(f"c{i}" for i in range(len(chunks)))
+        assert len(chunks) > 2
+        assert text == expected
+        assert partials and all(expected.startswith(p) and p != expected for p in partials)
+        assert recognizer.stats["chunked"] == 1
+        assert recognizer.stats["chunks"] == len(chunks)
+
+    asyncio.run(scenario())
+
+
+def test_short_clip_is_recognized_in_one_request():
+    async def scenario():
+        recognizer = make_recognizer()
+        calls = []
+
+        async def recognize_chunk(chunk: bytes, sample_rate: int) -> str:
+            calls.append(len(chunk))
+            return "short"
+
+        pcm = long_clip(bursts=1)
+        assert await recognizer.recognize(pcm, RATE, recognize_chunk) == "short"
+        assert calls == [len(pcm)]
+        assert recognizer.stats["single_shot"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_chunk_fails_the_whole_message():
+    async def scenario():
+        recognizer = make_recognizer()
+        pcm = long_clip()
+        _, recognize_chunk = labelled(pcm, recognizer, fail_index=2)
+        with pytest.raises(RuntimeError):
+            await recognizer.recognize(pcm, RATE, recognize_chunk)
+        assert recognizer.stats["failed_chunks"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_partial_transcript_is_not_cached(tmp_path):
+    async def scenario():
+        cache = TranscriptionCache(Database(str(tmp_path / "test.db")), memory_size=10, ttl=3600)
+        recognizer = make_recognizer()
+        pcm = long_clip()
+        key = cache.make_key("ru-RU", audio=pcm)
+
+        _, failing = labelled(pcm, recognizer, fail_index=1)
+        with pytest.raises(RuntimeError):
+            await cache.get_or_recognize(key, lambda: recognizer.recognize(pcm, RATE, failing))
+        assert await cache.get(key) is None
+
+        chunks, working = labelled(pcm, recognizer)
+        text = await cache.get_or_recognize(key, lambda: recognizer.recognize(pcm, RATE, working))
+        assert text == " ".join(f"c{i}" for i in range(len(chunks)))
+        assert await cache.get(key) == text
+
+    asyncio.run(scenario())
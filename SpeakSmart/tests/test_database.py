@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from services.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def test_connection_uses_wal_and_tuned_pragmas(database):
+    pragmas = database._run(lambda conn: (
+        conn.execute("PRAGMA journal_mode").fetchone()[0],
+        conn.execute("PRAGMA synchronous").fetchone()[0],
+        conn.execute("PRAGMA busy_timeout").fetchone()[0],
+    ))
+    assert pragmas[0] == "wal"
+    assert pragmas[1] == 1  # NORMAL
+    assert pragmas[2] > 0
+
+
+def test_async_methods_run_off_the_event_loop(database):
+    threads = []
+
+    def record_thread(conn):
+        threads.append(threading.current_thread().name)
+
+    async def scenario():
+        loop_thread = threading.current_thread().name
+        await database._run_async(database._run, record_thread)
+        await database.add_user_async(1, "alice", "Alice")
+        await database.update_user_activity_async(1)
+        assert threads and threads[0] != loop_thread
+        assert threads[0].startswith("sqlite")
+
+    asyncio.run(scenario())
+    assert database._run(lambda conn: conn.execute("SELECT username FROM users").fetchall()) == [("alice",)]
+
+
+def test_concurrent_writes_share_one_connection(database):
+    async def scenario():
+        await asyncio.gather(*(
+            database.add_practice_session_async(n % 5, f"p{n % 3}", "answer", n % 2 == 0)
+            for n in range(200)
+        ))
+
+    asyncio.run(scenario())
+    assert database._run(lambda conn: conn.execute("SELECT COUNT(*) FROM practice_sessions").fetchone()[0]) == 200
+    assert sum(database.get_user_stats(user_id)[0] for user_id in range(5)) == 200
+
+
+def test_failed_statement_rolls_back_its_transaction(database):
+    def insert_then_fail(conn):
+        conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'bob')")
+        conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+    with pytest.raises(sqlite3.OperationalError):
+        database._run(insert_then_fail)
+    assert database._run(lambda conn: conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]) == 0
+    # Соединение после отката остается рабочим
+    assert database.add_support_request(1, "question") is not None
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from services import decoder_pool as decoder_module
+from services.audio_pipeline import PCM_SAMPLE_RATE, AudioDecodeError, encode_ogg_opus
+from services.decoder_pool import DecoderBusyError, DecoderPool
+
+pytest.importorskip("av")
+
+
+def slow_decode(data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """Подмена decode_voice: b"slow" декодируется дольше таймаута пула."""
+    if data == b"slow":
+        time.sleep(0.5)
+    return data
+
+
+def wav_tone(seconds: float = 1.0) -> bytes:
+    import io
+    import wave
+
+    t = np.arange(int(PCM_SAMPLE_RATE * seconds)) / PCM_SAMPLE_RATE
+    pcm = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16).tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(PCM_SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pool():
+    pool = DecoderPool(workers=1, max_queue=1, timeout=0.2)
+    yield pool
+    pool.shutdown()
+
+
+def test_decodes_ogg_opus_to_pcm(pool):
+    async def scenario():
+        ogg = encode_ogg_opus(wav_tone(1.0))
+        pcm = await pool.decode(ogg)
+        # s16le моно 16 кГц: около секунды звука
+        assert abs(len(pcm) / 2 / PCM_SAMPLE_RATE - 1.0) < 0.1
+        assert pool.get_stats()["decoded"] == 1
+
+        with pytest.raises(AudioDecodeError):
+            await pool.decode(b"not an ogg file")
+        assert pool.get_stats()["failed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_message_keeps_its_slot(pool, monkeypatch):
+    monkeypatch.setattr(decoder_module, "decode_voice", slow_decode)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.decode(b"slow")
+        assert pool.get_stats()["timeouts"] == 1
+
+        # Процесс еще занят: место не освобождено, пока он не закончит
+        assert pool._slots.locked()
+        await asyncio.sleep(0.5)
+        assert not pool._slots.locked()
+        assert await pool.decode(b"fast") == b"fast"
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected(pool, monkeypatch):
+    monkeypatch.setattr(decoder_module, "decode_voice", slow_decode)
+    pool.timeout = 5
+
+    async def scenario():
+        running = asyncio.create_task(pool.decode(b"slow"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(pool.decode(b"fast"))
+        await asyncio.sleep(0)
+        with pytest.raises(DecoderBusyError):
+            await pool.decode(b"fast")
+        assert await running == b"slow"
+        assert await queued == b"fast"
+        assert pool.get_stats()["rejected"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from config import Config, config
+from services import faq_service
+from services.faq_service import FAQIndex, FAQMatcher, FAQStore, find_answer, index_terms, stem
+
+FAQ = {
+    "faq": [
+        {
+            "question": "Как начать практику?",
+            "keywords": ["практика", "начать", "тренировка"],
+            "answer": "Нажмите «Начать практику».",
+        },
+        {
+            "question": "Что умеет бот?",
+            "keywords": ["что ты умеешь", "возможности"],
+            "answer": "Бот помогает тренировать произношение.",
+        },
+        {
+            "question": "Сколько стоит подписка?",
+            "keywords": ["цена", "стоимость", "оплата"],
+            "answer": "Бот бесплатный.",
+        },
+    ]
+}
+
+
+def test_stemmer_joins_word_forms():
+    assert stem("практику") == stem("практика") == stem("практикой")
+    assert stem("поддержка") != stem("поддерживаются")
+    assert stem("hello") == "hello"
+    assert index_terms("Как мне начать практику?") == [stem("начать"), stem("практику")]
+
+
+def test_matcher_finds_whole_words_and_phrases():
+    matcher = FAQMatcher(FAQ)
+    assert matcher.match_indexes("А что ты умеешь?") == [1]
+    # Отдельные слова фразы не срабатывают, подстроки тоже
+    assert matcher.match_indexes("что ты") == []
+    assert matcher.match_indexes("какая оценка у меня") == []
+    assert matcher.match_indexes("ЦЕНА и возможности") == [1, 2]
+
+
+def test_matcher_first_only_keeps_file_order():
+    matcher = FAQMatcher(FAQ)
+    assert [item["answer"] for item in matcher.match("цена? начать", first_only=True)] == [FAQ["faq"][0]["answer"]]
+    assert len(matcher.match("цена? начать")) == 2
+
+
+def test_bm25_ranks_by_relevance_and_reports_confidence():
+    index = FAQIndex(FAQ)
+    hits = index.search("подскажите, какая стоимость подписки и оплата картой?")
+    assert hits[0].item is FAQ["faq"][2]
+    assert 0 < hits[0].confidence <= 1
+    assert all(a.score >= b.score for a, b in zip(hits, hits[1:]))
+
+    # Словоформы находятся через основы слов
+    assert index.search("хочу начать тренировку")[0].item is FAQ["faq"][0]
+    assert index.search("погода завтра") == []
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    faq_file = tmp_path / "faq.json"
+    faq_file.write_text(json.dumps(FAQ, ensure_ascii=False), encoding="utf-8")
+    store = FAQStore(faq_file, FAQ, poll_interval=60)
+    monkeypatch.setattr(faq_service, "faq_store", store)
+    monkeypatch.setattr(Config, "FAQ_DATA", FAQ)
+    monkeypatch.setattr(config, "FAQ_SEARCH_MODE", "ranked")
+    return store
+
+
+def test_find_answer_respects_confidence_threshold(store, monkeypatch):
+    question = "стоимость и оплата"
+    confidence = store.snapshot.index.search(question, top_k=1)[0].confidence
+
+    monkeypatch.setattr(config, "FAQ_MIN_CONFIDENCE", confidence)
+    assert find_answer(question) == "Бот бесплатный."
+    monkeypatch.setattr(config, "FAQ_MIN_CONFIDENCE", confidence + 0.01)
+    assert find_answer(question) is None
+
+    monkeypatch.setattr(config, "FAQ_SEARCH_MODE", "first")
+    assert find_answer(question) == "Бот бесплатный."
+    assert find_answer("погода завтра") is None
+
+
+def test_reload_swaps_index_and_keeps_previous_on_error(store):
+    updated = {"faq": FAQ["faq"] + [{"question": "Где поддержка?", "keywords": ["оператор"], "answer": "Пишите нам."}]}
+    store.faq_file.write_text(json.dumps(updated, ensure_ascii=False), encoding="utf-8")
+    assert store.reload(force=True)
+    assert find_answer("позовите оператора") == "Пишите нам."
+
+    store.faq_file.write_text("{not json", encoding="utf-8")
+    assert not store.reload(force=True)
+    assert store.stats["failed_reloads"] == 1
+    assert find_answer("позовите оператора") == "Пишите нам."
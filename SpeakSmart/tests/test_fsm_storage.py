@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from services.database import Database
+from services.fsm_storage import SQLiteStorage
+
+
+class Practice(StatesGroup):
+    waiting_answer = State()
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def make_storage(database, cache_size: int = 100, flush_interval_ms: int = 60000) -> SQLiteStorage:
+    return SQLiteStorage(database, cache_size=cache_size, flush_interval_ms=flush_interval_ms,
+                         cache_ttl=3600, session_ttl=86400)
+
+
+def stored_rows(database) -> dict:
+    return {
+        storage_key: (state, json.loads(data))
+        for storage_key, state, data in database._run(
+            lambda conn: conn.execute("SELECT storage_key, state, data FROM fsm_sessions").fetchall())
+    }
+
+
+def test_state_survives_restart(database):
+    async def scenario():
+        storage = make_storage(database)
+        await storage.set_state(key(1), Practice.waiting_answer)
+        await storage.update_data(key(1), {"phrase_id": "p1", "attempts": 2})
+        await storage.close()
+
+        # Новый процесс: кэш пуст, состояние читается из базы
+        restarted = make_storage(database)
+        assert await restarted.get_state(key(1)) == Practice.waiting_answer.state
+        assert await restarted.get_data(key(1)) == {"phrase_id": "p1", "attempts": 2}
+        assert await restarted.get_state(key(2)) is None
+        stats = restarted.get_stats()
+        assert (stats["misses"], stats["hits"]) == (2, 1)
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+
+def test_updates_are_coalesced_into_one_transaction(database):
+    async def scenario():
+        storage = make_storage(database)
+        for user_id in range(3):
+            await storage.set_state(key(user_id), Practice.waiting_answer)
+            for attempt in range(10):
+                await storage.update_data(key(user_id), {"attempts": attempt})
+        assert stored_rows(database) == {}
+        assert storage.get_stats()["dirty"] == 3
+
+        await storage.flush()
+        stats = storage.get_stats()
+        assert (stats["updates"], stats["writes"], stats["flushes"], stats["dirty"]) == (33, 3, 1, 0)
+        assert all(data == {"attempts": 9} for _, data in stored_rows(database).values())
+
+        # Пустое состояние удаляет строку
+        await storage.set_state(key(0), None)
+        await storage.set_data(key(0), {})
+        await storage.close()
+        assert len(stored_rows(database)) == 2
+
+    asyncio.run(scenario())
+
+
+def test_background_task_writes_changes(database):
+    async def scenario():
+        storage = make_storage(database, flush_interval_ms=20)
+        await storage.set_data(key(1), {"level": "A1"})
+        await asyncio.sleep(0.2)
+        assert storage.get_stats()["flushes"] >= 1
+        assert list(stored_rows(database).values()) == [(None, {"level": "A1"})]
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_lru_evicts_without_losing_unsaved_changes(database):
+    async def scenario():
+        storage = make_storage(database, cache_size=2)
+        for user_id in range(3):
+            await storage.set_data(key(user_id), {"user": user_id})
+        assert storage.get_stats()["cached"] == 2
+        assert storage.stats["evicted"] == 1
+
+        # Вытесненная, но не записанная сессия берется из очереди записи, а не из базы
+        misses = storage.stats["misses"]
+        assert await storage.get_data(key(0)) == {"user": 0}
+        assert storage.stats["misses"] == misses
+
+        # После записи вытесненная сессия (1) читается из базы
+        await storage.flush()
+        assert await storage.get_data(key(1)) == {"user": 1}
+        assert storage.stats["misses"] == misses + 1
+        assert storage.stats["evicted"] == 3
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_unserializable_data_does_not_block_other_sessions(database):
+    async def scenario():
+        storage = make_storage(database)
+        await storage.set_data(key(1), {"bad": object()})
+        await storage.set_data(key(2), {"ok": True})
+        await storage.flush()
+        assert list(stored_rows(database).values()) == [(None, {"ok": True})]
+        assert storage.get_stats()["dirty"] == 1
+
+        await storage.set_data(key(1), {"fixed": True})
+        await storage.close()
+        assert len(stored_rows(database)) == 2
+
+    asyncio.run(scenario())
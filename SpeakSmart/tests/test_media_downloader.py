@@ -0,0 +1,174 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.media_downloader import FileTooLargeError, MediaDownloader
+
+TOKEN = "123456:TEST-token"
+VOICE = bytes(range(256)) * 8  # 2 КБ
+
+
+class FakeBotAPI:
+    """Локальный Bot API: getFile и выдача файла, которую можно задержать."""
+
+    def __init__(self, data: bytes = VOICE, reported_size: int = None):
+        self.data = data
+        self.reported_size = len(data) if reported_size is None else reported_size
+        self.get_file_calls = 0
+        self.file_calls = 0
+        self.file_requested = asyncio.Event()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def get_file(self, request: web.Request) -> web.Response:
+        self.get_file_calls += 1
+        result = {"file_id": "voice-id", "file_unique_id": "voice-uid", "file_path": "voice/file_0.oga"}
+        if self.reported_size:
+            result["file_size"] = self.reported_size
+        return web.json_response({"ok": True, "result": result})
+
+    async def file(self, request: web.Request) -> web.StreamResponse:
+        self.file_calls += 1
+        self.file_requested.set()
+        await self.release.wait()
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for offset in range(0, len(self.data), 256):
+            await response.write(self.data[offset:offset + 256])
+        await response.write_eof()
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(f"/bot{TOKEN}/getFile", self.get_file)
+        app.router.add_get(f"/file/bot{TOKEN}/{{path:.+}}", self.file)
+        return app
+
+
+@asynccontextmanager
+async def fake_bot(api: FakeBotAPI):
+    server = TestServer(api.app())
+    await server.start_server()
+    base = str(server.make_url("")).rstrip("/")
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    try:
+        yield bot
+    finally:
+        await bot.session.close()
+        await server.close()
+
+
+def make_downloader(max_size: int = 4096) -> MediaDownloader:
+    return MediaDownloader(max_size=max_size, chunk_size=256, timeout=5)
+
+
+def test_download_streams_file():
+    async def scenario():
+        api = FakeBotAPI()
+        downloader = make_downloader()
+        async with fake_bot(api) as bot:
+            data = await downloader.download(bot, "voice-id", file_unique_id="voice-uid")
+        assert data == VOICE
+        assert downloader.get_stats()["downloads"] == 1
+        assert downloader.get_stats()["bytes"] == len(VOICE)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_download():
+    async def scenario():
+        api = FakeBotAPI()
+        api.release.clear()
+        downloader = make_downloader()
+        async with fake_bot(api) as bot:
+            waiters = [
+                asyncio.create_task(downloader.download(bot, "voice-id", file_unique_id="voice-uid"))
+                for _ in range(3)
+            ]
+            await asyncio.wait_for(api.file_requested.wait(), 5)
+            api.release.set()
+            results = await asyncio.gather(*waiters)
+
+        assert results == [VOICE] * 3
+        assert api.get_file_calls == 1
+        assert api.file_calls == 1
+        stats = downloader.get_stats()
+        assert stats["downloads"] == 1
+        assert stats["deduplicated"] == 2
+        assert stats["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_download():
+    async def scenario():
+        api = FakeBotAPI()
+        api.release.clear()
+        downloader = make_downloader()
+        async with fake_bot(api) as bot:
+            cancelled = asyncio.create_task(downloader.download(bot, "voice-id", file_unique_id="voice-uid"))
+            remaining = asyncio.create_task(downloader.download(bot, "voice-id", file_unique_id="voice-uid"))
+            await asyncio.wait_for(api.file_requested.wait(), 5)
+
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            api.release.set()
+            assert await remaining == VOICE
+
+        assert api.file_calls == 1
+        assert downloader.get_stats()["downloads"] == 1
+        assert downloader.get_stats()["failed"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_declared_size_over_limit_is_rejected_without_request():
+    async def scenario():
+        api = FakeBotAPI()
+        downloader = make_downloader(max_size=1024)
+        async with fake_bot(api) as bot:
+            with pytest.raises(FileTooLargeError):
+                await downloader.download(bot, "voice-id", file_unique_id="voice-uid", file_size=len(VOICE))
+        assert api.get_file_calls == 0
+        assert downloader.get_stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_size_reported_by_get_file_over_limit_is_rejected():
+    async def scenario():
+        api = FakeBotAPI()
+        downloader = make_downloader(max_size=1024)
+        async with fake_bot(api) as bot:
+            with pytest.raises(FileTooLargeError):
+                await downloader.download(bot, "voice-id", file_unique_id="voice-uid")
+        assert api.get_file_calls == 1
+        assert api.file_calls == 0
+        assert downloader.get_stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_over_limit_is_cut_off():
+    async def scenario():
+        # getFile не сообщает размер: лимит срабатывает во время чтения
+        api = FakeBotAPI(reported_size=0)
+        downloader = make_downloader(max_size=1024)
+        async with fake_bot(api) as bot:
+            with pytest.raises(FileTooLargeError):
+                await downloader.download(bot, "voice-id", file_unique_id="voice-uid")
+        assert api.file_calls == 1
+        stats = downloader.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["downloads"] == 0
+        assert stats["in_flight"] == 0
+
+    asyncio.run(scenario())
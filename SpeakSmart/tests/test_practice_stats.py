@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from services.database import Database
+
+# Ответы пользователей: 1 - правильно, 0 - нет
+HISTORY = {
+    1: [1, 1, 0, 1, 1, 1],
+    2: [0, 0, 1],
+    3: [1, 1, 1, 1],
+    4: [1, 0],
+    5: [0, 1, 1, 0, 1],
+}
+
+
+def expected(answers):
+    streak = best = 0
+    for answer in answers:
+        streak = streak + 1 if answer else 0
+        best = max(best, streak)
+    return len(answers), sum(answers), streak, best
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    # История, записанная до появления сводных таблиц (только practice_sessions), ответы вперемешку
+    rows = []
+    for n in range(max(map(len, HISTORY.values()))):
+        for user_id, answers in HISTORY.items():
+            if n < len(answers):
+                rows.append((user_id, f"p{n % 2}", "answer", bool(answers[n])))
+    database._run(lambda conn: conn.executemany(
+        "INSERT INTO practice_sessions (user_id, phrase_id, user_response, is_correct) VALUES (?, ?, ?, ?)", rows
+    ))
+    yield database
+    database.close()
+
+
+def user_stats(database, user_id):
+    return database.get_user_stats(user_id)[:4]
+
+
+def test_stats_are_read_from_history_until_backfilled(database):
+    for user_id, answers in HISTORY.items():
+        assert user_stats(database, user_id) == expected(answers)
+    assert database.get_user_stats(99) is None
+
+
+def test_backfill_runs_in_batches_and_keeps_new_rows(database):
+    assert database.backfill_practice_stats(2) == 2
+    # Пройденные пользователи читаются из user_stats, остальные - из истории
+    assert database._practice_stats_ready(database._conn, 2)
+    assert not database._practice_stats_ready(database._conn, 3)
+
+    # Новые ответы во время заполнения: и уже пройденным, и еще не пройденным пользователям
+    database.write_batch({"practice_sessions": [(1, "p0", "answer", False), (5, "p1", "answer", True)]})
+    history = {user_id: list(answers) for user_id, answers in HISTORY.items()}
+    history[1].append(0)
+    history[5].append(1)
+    for user_id, answers in history.items():
+        assert user_stats(database, user_id) == expected(answers)
+
+    assert database.backfill_practice_stats(2) == 2
+    assert database.backfill_practice_stats(2) == 1
+    assert database.backfill_practice_stats(2) == 0
+    assert database.get_catalog_meta("practice_stats_built")
+    assert database.get_catalog_meta("practice_stats_backfill_user") is None
+
+    for user_id, answers in history.items():
+        assert database._run(lambda conn: conn.execute(
+            "SELECT total, correct, current_streak, best_streak FROM user_stats WHERE user_id = ?", (user_id,)
+        ).fetchone()) == expected(answers)
+
+
+def test_weakest_phrases_match_before_and_after_backfill(database):
+    before = {user_id: database.get_weakest_phrases(user_id, min_attempts=1) for user_id in HISTORY}
+    assert database.backfill_practice_stats(100) == len(HISTORY)
+    assert database.backfill_practice_stats(100) == 0
+    assert {user_id: database.get_weakest_phrases(user_id, min_attempts=1) for user_id in HISTORY} == before
+
+
+def test_background_backfill_builds_stats(database):
+    async def scenario():
+        database.start_stats_backfill(batch_users=2, pause=0)
+        await database._backfill_task
+        assert database.get_catalog_meta("practice_stats_built")
+        await database.stop_stats_backfill()
+
+    asyncio.run(scenario())
+    for user_id, answers in HISTORY.items():
+        assert user_stats(database, user_id) == expected(answers)
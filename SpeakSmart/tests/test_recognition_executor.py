@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.recognition_executor import RecognitionExecutor
+
+
+class BlockingRecognizer:
+    """Блокирующий "recognize_google": спит и считает одновременные вызовы."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, n: int) -> str:
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return f"text {n}"
+
+
+async def text_handler_lag(stop: asyncio.Event) -> float:
+    """Худшая задержка ответа "текстового обработчика", пока идут распознавания."""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(0.005)
+        worst = max(worst, loop.time() - started - 0.005)
+    return worst
+
+
+def test_text_handlers_stay_responsive_with_50_recognitions_in_flight():
+    async def scenario():
+        executor = RecognitionExecutor(max_concurrency=8, thread_workers=8, timeout=10)
+        recognizer = BlockingRecognizer(0.1)
+        stop = asyncio.Event()
+        lag = asyncio.create_task(text_handler_lag(stop))
+        try:
+            jobs = [asyncio.create_task(executor.run_in_thread(recognizer, n)) for n in range(50)]
+            await asyncio.sleep(0.05)
+            stats = executor.get_stats()
+            assert stats["running"] == 8
+            assert stats["queued"] == 42
+
+            results = await asyncio.gather(*jobs)
+        finally:
+            stop.set()
+            executor.shutdown()
+        assert results == [f"text {n}" for n in range(50)]
+        assert recognizer.peak == 8
+        assert await lag < 0.05
+        assert executor.get_stats()["completed"] == 50
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes():
+    async def scenario():
+        executor = RecognitionExecutor(max_concurrency=1, thread_workers=2, timeout=0.05)
+        recognizer = BlockingRecognizer(0.3)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await executor.run_in_thread(recognizer, 1)
+            assert executor.get_stats()["timeouts"] == 1
+            # Поток еще занят: второй вызов ждет его, и потоков не становится больше лимита
+            assert await executor.run_in_thread(recognizer, 2, timeout=1) == "text 2"
+            assert recognizer.peak == 1
+        finally:
+            executor.shutdown()
+
+    asyncio.run(scenario())
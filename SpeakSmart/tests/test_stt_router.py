@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+
+from services.stt_router import BackendStats, STTRouter, StubBackend
+
+PCM = b"\1\0" * 16000
+SHA = hashlib.sha1(PCM).hexdigest()
+
+
+def make_router(*backends, hedge: bool = False, delay: float = 0.05, max_error_rate: float = 0.5) -> STTRouter:
+    return STTRouter(
+        backends=backends,
+        routes={"ru-RU": [b.name for b in backends]},
+        hedge=hedge, hedge_default_delay=delay, window=10, max_error_rate=max_error_rate
+    )
+
+
+def test_route_order_is_followed():
+    async def scenario():
+        router = make_router(StubBackend("a", default="from a"), StubBackend("b", default="from b"))
+        assert [b.name for b in router.candidates("ru-RU")] == ["a", "b"]
+        assert await router.recognize(PCM, "ru-RU") == "from a"
+        assert router.backend_stats["a"].wins == 1
+        assert router.backend_stats["b"].requests == 0
+
+        # Языки без маршрута: все бэкенды, которые его поддерживают
+        router.backends["b"].languages = {"en-US"}
+        assert [b.name for b in router.candidates("en-US")] == ["a", "b"]
+        assert [b.name for b in router.candidates("de-DE")] == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_transcript_is_looked_up_by_audio_hash():
+    async def scenario():
+        router = make_router(StubBackend("a", transcripts={SHA: "known"}, default="other"))
+        assert await router.recognize(PCM, "ru-RU") == "known"
+        assert await router.recognize(b"\2\0" * 100, "ru-RU") == "other"
+
+    asyncio.run(scenario())
+
+
+def test_fallback_after_exception():
+    async def scenario():
+        router = make_router(StubBackend("a", fail=True), StubBackend("b", default="from b"))
+        assert await router.recognize(PCM, "ru-RU") == "from b"
+        assert router.stats["fallbacks"] == 1
+        assert router.backend_stats["a"].errors == 1
+        assert router.backend_stats["b"].wins == 1
+
+    asyncio.run(scenario())
+
+
+def test_fallback_after_empty_answer_is_not_an_error():
+    async def scenario():
+        router = make_router(StubBackend("a", default=None), StubBackend("b", default="from b"))
+        assert await router.recognize(PCM, "ru-RU") == "from b"
+        a = router.backend_stats["a"]
+        assert (a.errors, a.empty, a.error_rate) == (0, 1, 0.0)
+
+    asyncio.run(scenario())
+
+
+def test_all_backends_failing_returns_none():
+    async def scenario():
+        router = make_router(StubBackend("a", fail=True), StubBackend("b", fail=True))
+        assert await router.recognize(PCM, "ru-RU") is None
+        assert router.stats["failed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_wins_when_primary_is_slow():
+    async def scenario():
+        router = make_router(StubBackend("slow", default="slow", delay=1.0),
+                             StubBackend("fast", default="fast"), hedge=True, delay=0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await router.recognize(PCM, "ru-RU") == "fast"
+        assert loop.time() - started < 0.5
+        assert router.stats["hedged"] == 1
+        assert router.stats["hedge_wins"] == 1
+        assert router.backend_stats["fast"].wins == 1
+
+    asyncio.run(scenario())
+
+
+def test_no_hedge_when_primary_answers_in_time():
+    async def scenario():
+        router = make_router(StubBackend("a", default="from a", delay=0.01),
+                             StubBackend("b", default="from b"), hedge=True, delay=0.5)
+        assert await router.recognize(PCM, "ru-RU") == "from a"
+        assert router.stats["hedged"] == 0
+        assert router.backend_stats["b"].requests == 0
+
+    asyncio.run(scenario())
+
+
+def test_backend_above_max_error_rate_is_demoted():
+    async def scenario():
+        a, b = StubBackend("a", default="from a", fail=True), StubBackend("b", default="from b")
+        router = make_router(a, b, max_error_rate=0.5)
+        for _ in range(3):
+            assert await router.recognize(PCM, "ru-RU") == "from b"
+        assert router.backend_stats["a"].error_rate == 1.0
+        assert [c.name for c in router.candidates("ru-RU")] == ["b", "a"]
+
+        # Пониженный бэкенд остается запасным и возвращается после восстановления
+        a.fail = False
+        b.fail = True
+        assert await router.recognize(PCM, "ru-RU") == "from a"
+
+    asyncio.run(scenario())
+
+
+def test_empty_answers_do_not_demote_backend():
+    stats = BackendStats(window=10)
+    for _ in range(5):
+        stats.record(0.1, ok=False)
+    stats.record(0.1, ok=False, error=True)
+    stats.record(0.1, ok=True)
+    assert stats.empty == 5
+    assert stats.errors == 1
+    assert abs(stats.error_rate - 1 / 7) < 1e-9
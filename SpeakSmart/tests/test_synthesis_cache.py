@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.asset_builder import ToneEngine
+from services.tts_service import SynthesisCache
+
+pytest.importorskip("av")
+
+
+class CountingEngine(ToneEngine):
+    """ToneEngine, считающий синтезы; медленный, чтобы запросы успели совпасть."""
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.renders = []
+        self._lock = threading.Lock()
+
+    def render(self, text: str, language: str, voice: str, slow: bool) -> bytes:
+        with self._lock:
+            self.renders.append((text, slow))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("engine down")
+        return super().render(text, language, voice, slow)
+
+
+def make_cache(tmp_path, engine, disk_max_bytes: int = 10 ** 7, memory_max_bytes: int = 10 ** 7) -> SynthesisCache:
+    return SynthesisCache(engine, tmp_path / "tts", language="en", voice="com",
+                          disk_max_bytes=disk_max_bytes, memory_max_bytes=memory_max_bytes, workers=4)
+
+
+def test_memory_then_disk_hits(tmp_path):
+    engine = CountingEngine()
+
+    async def scenario():
+        cache = make_cache(tmp_path, engine)
+        first = await cache.get("good morning")
+        assert first.path.exists() and first.data
+        assert (await cache.get("good morning")).data == first.data
+        slow = await cache.get("good morning", slow=True)
+        assert slow.key != first.key
+        assert cache.get_stats()["renders"] == 2
+        assert cache.get_stats()["memory_hits"] == 1
+        cache.shutdown()
+
+        # Новый процесс: памяти нет, файл берется с диска
+        restarted = make_cache(tmp_path, engine)
+        assert (await restarted.get("good morning")).data == first.data
+        stats = restarted.get_stats()
+        assert (stats["disk_hits"], stats["renders"]) == (1, 0)
+        assert stats["disk_bytes"] == len(first.data) + len(slow.data)
+        restarted.shutdown()
+
+    asyncio.run(scenario())
+    assert engine.renders == [("good morning", False), ("good morning", True)]
+
+
+def test_concurrent_requests_share_one_render(tmp_path):
+    engine = CountingEngine(delay=0.2)
+
+    async def scenario():
+        cache = make_cache(tmp_path, engine)
+        results = await asyncio.gather(*(cache.get("see you later") for _ in range(10)))
+        assert len({r.data for r in results}) == 1
+        stats = cache.get_stats()
+        assert (stats["renders"], stats["coalesced"]) == (1, 9)
+        assert stats["hit_rate"] == 0.9
+        cache.shutdown()
+
+    asyncio.run(scenario())
+    assert len(engine.renders) == 1
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    engine = CountingEngine(delay=0)
+
+    async def scenario():
+        probe = make_cache(tmp_path / "probe", engine)
+        size = len((await probe.get("one")).data)
+        probe.shutdown()
+
+        cache = make_cache(tmp_path, engine, disk_max_bytes=int(size * 2.5), memory_max_bytes=0)
+        one = await cache.get("one")
+        two = await cache.get("two")
+        await cache.get("one")  # "one" использован недавно, вытесняется "two"
+        three = await cache.get("three")
+        assert one.path.exists() and three.path.exists()
+        assert not two.path.exists()
+        stats = cache.get_stats()
+        assert (stats["disk_hits"], stats["evicted"]) == (1, 1)
+        assert stats["disk_bytes"] <= cache.disk_max_bytes
+        assert len(list((tmp_path / "tts").glob("*.ogg"))) == 2
+        cache.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failed_render_is_not_cached(tmp_path):
+    engine = CountingEngine(delay=0, fail=True)
+
+    async def scenario():
+        cache = make_cache(tmp_path, engine)
+        assert await cache.get("hello") is None
+        assert cache.get_stats()["failures"] == 1
+        engine.fail = False
+        assert await cache.get("hello") is not None
+        assert cache.get_stats()["renders"] == 1
+        cache.shutdown()
+
+    asyncio.run(scenario())
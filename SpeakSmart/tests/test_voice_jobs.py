@@ -0,0 +1,61 @@
+import asyncio
+
+from services.voice_jobs import VoiceJob, VoiceJobQueue, VoiceJobResult
+
+
+def make_queue(job_seconds: float, workers: int = 1) -> VoiceJobQueue:
+    queue = VoiceJobQueue(workers=workers, max_queue=10, timeout=30, stop_timeout=0.2)
+
+    async def process(job: VoiceJob, result: VoiceJobResult):
+        await asyncio.sleep(job_seconds)
+        result.text = f"answer {job.user_id}"
+
+    queue._process = process
+    return queue
+
+
+def make_job(user_id: int, results: dict) -> VoiceJob:
+    async def on_done(job: VoiceJob, result: VoiceJobResult):
+        results[job.user_id] = result
+
+    return VoiceJob(bot=None, user_id=user_id, voice=None, phrase_text="hello", phrase_id=None,
+                    status_message=None, on_done=on_done)
+
+
+def test_stop_finishes_started_jobs_and_notifies_queued():
+    async def scenario():
+        queue = make_queue(job_seconds=0.05)
+        results = {}
+        queue.start()
+        for user_id in range(3):
+            assert queue.submit(make_job(user_id, results))
+        await asyncio.sleep(0.01)  # первая задача взята в работу
+
+        await queue.stop()
+        assert results[0].text == "answer 0" and results[0].error is None
+        assert results[1].error == results[2].error == VoiceJobQueue.STOPPED_ERROR
+        assert queue.stats["completed"] == 1
+        assert queue.stats["dropped"] == 2
+        assert not queue.submit(make_job(3, results))
+
+    asyncio.run(scenario())
+
+
+def test_stop_timeout_cancels_and_notifies_started_jobs():
+    async def scenario():
+        queue = make_queue(job_seconds=5, workers=2)
+        results = {}
+        queue.start()
+        queue.submit(make_job(1, results))
+        queue.submit(make_job(2, results))
+        await asyncio.sleep(0.01)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await queue.stop()
+        assert loop.time() - started < 1
+        assert {r.error for r in results.values()} == {VoiceJobQueue.STOPPED_ERROR}
+        assert len(results) == 2
+        assert queue.stats["dropped"] == 2
+
+    asyncio.run(scenario())
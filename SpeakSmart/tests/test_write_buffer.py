@@ -0,0 +1,81 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from services import database as database_module
+from services.database import Database, WriteBehindBuffer
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def count(database: Database, table: str) -> int:
+    return database._run(lambda conn: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+
+
+def test_rows_are_group_committed_and_drained_on_stop(database):
+    async def scenario():
+        buffer = WriteBehindBuffer(database, flush_size=50, flush_interval_ms=1000, max_rows=1000)
+        buffer.start()
+        for n in range(120):
+            await buffer.put("practice_sessions", (n % 7, "p1", "answer", n % 2 == 0))
+        await buffer.put("error_logs", (1, "boom", None))
+        await asyncio.sleep(0.05)
+        # Две полные пачки сброшены сразу, остаток ждет интервала или остановки
+        assert buffer.stats["flushes"] == 2
+        assert buffer.stats["max_flush_size"] == 50
+
+        await buffer.stop()
+        assert buffer.stats["rows_written"] == 121
+        assert count(database, "practice_sessions") == 120
+        assert count(database, "error_logs") == 1
+        assert database.get_user_stats(0)[0] == len(range(0, 120, 7))
+
+    asyncio.run(scenario())
+
+
+def test_interval_flushes_partial_batch(database):
+    async def scenario():
+        buffer = WriteBehindBuffer(database, flush_size=100, flush_interval_ms=20, max_rows=1000)
+        buffer.start()
+        await buffer.put("practice_sessions", (1, "p1", "answer", True))
+        await asyncio.sleep(0.1)
+        assert count(database, "practice_sessions") == 1
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_busy_database_falls_back_to_rows_without_final_sleep(database, monkeypatch):
+    monkeypatch.setattr(database_module, "FLUSH_RETRY_DELAY", 0.1)
+    write_batch = database.write_batch
+    attempts = []
+
+    def flaky_write_batch(rows_by_table):
+        # Групповая запись всегда упирается в занятую базу, одиночные строки проходят
+        if sum(map(len, rows_by_table.values())) > 1:
+            attempts.append(time.perf_counter())
+            raise sqlite3.OperationalError("database is locked")
+        write_batch(rows_by_table)
+
+    monkeypatch.setattr(database, "write_batch", flaky_write_batch)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(database, flush_size=10, flush_interval_ms=1000, max_rows=100)
+        started = time.perf_counter()
+        await buffer._flush([("practice_sessions", (1, "p1", "answer", True))] * 10)
+        elapsed = time.perf_counter() - started
+
+        assert len(attempts) == database_module.FLUSH_RETRIES
+        assert count(database, "practice_sessions") == 10
+        assert buffer.stats["rows_written"] == 10
+        # Паузы только между попытками: 0.1 + 0.2 с, без 0.4 с после последней
+        assert 0.3 <= elapsed < 0.6
+
+    asyncio.run(scenario())
@@ -0,0 +1,156 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+
+from config import config
+from services.stt_router import STTRouter, StubBackend, YandexBackend
+from services.yandex_speechkit import CircuitBreaker, CircuitOpenError, YandexSpeechKit, YandexSpeechKitError
+from utils.stt_stub_server import StubSTTServer
+
+# Секунда тона 440 Гц, PCM s16le моно 16 кГц
+PCM = (np.sin(np.arange(16000) * 2 * np.pi * 440 / 16000) * 8000).astype(np.int16).tobytes()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(config, "YANDEX_MAX_RETRIES", 2)
+    monkeypatch.setattr(config, "YANDEX_BACKOFF_BASE", 0.01)
+
+
+@asynccontextmanager
+async def stub_client(server: StubSTTServer, threshold: int = 5, reset_timeout: float = 30):
+    url = await server.start()
+    client = YandexSpeechKit()
+    client.base_url = url
+    client.api_key = "test-key"
+    client.folder_id = "test-folder"
+    client.breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=reset_timeout)
+    try:
+        yield client
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_requests_reuse_one_connection():
+    async def scenario():
+        server = StubSTTServer(text="Hello")
+        async with stub_client(server) as client:
+            results = [await client._recognize_bytes(b"audio", "oggopus") for _ in range(5)]
+        assert results == ["hello"] * 5
+        assert server.requests == 5
+        assert len(server.connections) == 1
+
+    asyncio.run(scenario())
+
+
+def test_retries_on_5xx():
+    async def scenario():
+        server = StubSTTServer(statuses=[503, 500])
+        async with stub_client(server) as client:
+            assert await client._recognize_bytes(b"audio", "oggopus") == "hello"
+            assert server.requests == 3
+            assert client.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_client_error_is_raised_without_retry():
+    async def scenario():
+        server = StubSTTServer(statuses=[401])
+        async with stub_client(server) as client:
+            with pytest.raises(YandexSpeechKitError):
+                await client._recognize_bytes(b"audio", "oggopus")
+            assert server.requests == 1
+            assert client.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_exhausted_retries_count_as_one_failure():
+    async def scenario():
+        server = StubSTTServer(statuses=[503] * 3)
+        async with stub_client(server) as client:
+            with pytest.raises(YandexSpeechKitError):
+                await client._recognize_bytes(b"audio", "oggopus")
+            assert server.requests == 3
+            assert client.breaker.failures == 1
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_and_admits_one_half_open_probe():
+    async def scenario():
+        server = StubSTTServer(statuses=[500] * 6)
+        async with stub_client(server, threshold=2, reset_timeout=0.2) as client:
+            for _ in range(2):
+                with pytest.raises(YandexSpeechKitError):
+                    await client._recognize_bytes(b"audio", "oggopus")
+            assert client.breaker.is_open
+            requests = server.requests
+
+            with pytest.raises(CircuitOpenError):
+                await client._recognize_bytes(b"audio", "oggopus")
+            assert server.requests == requests
+
+            await asyncio.sleep(0.25)
+            server.statuses.clear()
+            server.delay = 0.1
+            results = await asyncio.gather(
+                *(client._recognize_bytes(b"audio", "oggopus") for _ in range(3)),
+                return_exceptions=True
+            )
+            assert server.requests == requests + 1
+            assert results.count("hello") == 1
+            assert sum(isinstance(r, CircuitOpenError) for r in results) == 2
+            assert not client.breaker.is_open
+
+    asyncio.run(scenario())
+
+
+def test_missing_key_is_an_error():
+    async def scenario():
+        server = StubSTTServer()
+        async with stub_client(server) as client:
+            client.api_key = None
+            with pytest.raises(YandexSpeechKitError):
+                await client._recognize_bytes(b"audio", "oggopus")
+            assert server.requests == 0
+
+    asyncio.run(scenario())
+
+
+def test_router_counts_outage_as_error_and_falls_back():
+    async def scenario():
+        server = StubSTTServer(statuses=[503] * 3)
+        async with stub_client(server) as client:
+            router = STTRouter(
+                backends=[YandexBackend(client), StubBackend("stub", default="from stub")],
+                routes={"ru-RU": ["yandex", "stub"]},
+                hedge=False, hedge_default_delay=1, window=10, max_error_rate=0.5
+            )
+            assert await router.recognize(PCM, "ru-RU") == "from stub"
+            yandex = router.backend_stats["yandex"].as_dict()
+            assert yandex["errors"] == 1
+            assert yandex["empty"] == 0
+            assert router.stats["fallbacks"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_empty_transcript_is_not_an_error():
+    async def scenario():
+        server = StubSTTServer(text="")
+        async with stub_client(server) as client:
+            router = STTRouter(
+                backends=[YandexBackend(client)], routes={"ru-RU": ["yandex"]},
+                hedge=False, hedge_default_delay=1, window=10, max_error_rate=0.5
+            )
+            assert await router.recognize(PCM, "ru-RU") is None
+            yandex = router.backend_stats["yandex"].as_dict()
+            assert yandex["errors"] == 0
+            assert yandex["empty"] == 1
+
+    asyncio.run(scenario())
@@ -1,16 +1,14 @@
 from pathlib import Path
-from gtts import gTTS
-import os
 
-# Указываем путь напрямую
-AUDIO_PHRASES_DIR = Path("audio/phrases")
+from services.asset_builder import AssetBuilder, GTTSEngine
+from services.phrase_catalog import Phrase
 
+# Тестовые файлы пишутся отдельно от фраз бота, со своим манифестом
+TEST_AUDIO_DIR = Path("audio/test_phrases")
 
-def create_test_audio_files():
-    """Создание тестовых аудиофайлов."""
-    # Создаем директорию если не существует
-    AUDIO_PHRASES_DIR.mkdir(parents=True, exist_ok=True)
 
+def create_test_audio_files():
+    """Создание тестовых аудиофайлов (OGG/Opus, только отсутствующие или измененные)."""
     phrases = {
         "phrase_1": "Привет, как дела?",
         "phrase_2": "Сегодня хорошая погода",
@@ -18,24 +16,20 @@ def create_test_audio_files():
     }
 
     print("Создание тестовых аудиофайлов...")
-    print(f"Директория для сохранения: {AUDIO_PHRASES_DIR}")
-
-    for phrase_id, text in phrases.items():
-        audio_path = AUDIO_PHRASES_DIR / f"{phrase_id}.mp3"
-
-        if not audio_path.exists():
-            try:
-                print(f"Создаю аудиофайл: {phrase_id} - '{text}'")
-                tts = gTTS(text=text, lang='ru', slow=False)
-                tts.save(str(audio_path))
-                print(f"✅ Успешно создан: {audio_path.name}")
-            except Exception as e:
-                print(f"❌ Ошибка создания файла {phrase_id}: {e}")
-        else:
-            print(f"📁 Файл уже существует: {audio_path.name}")
+    print(f"Директория для сохранения: {TEST_AUDIO_DIR}")
+
+    builder = AssetBuilder(
+        GTTSEngine(),
+        output_dir=TEST_AUDIO_DIR,
+        manifest_file=TEST_AUDIO_DIR / "manifest.json",
+        language="ru",
+        voice="com"
+    )
+    stats = builder.build(Phrase(phrase_id, text, None, None, ()) for phrase_id, text in phrases.items())
+    print(f"✅ Создано: {stats['rendered']}, 📁 без изменений: {stats['skipped']}, ❌ ошибок: {stats['failed']}")
 
     print("\nГотово! Проверьте созданные файлы.")
 
 
 if __name__ == "__main__":
-    create_test_audio_files()
\ No newline at end of file
+    create_test_audio_files()
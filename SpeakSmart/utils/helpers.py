@@ -1,4 +1,4 @@
-import re
+from services.answer_matcher import normalize_text
 
 
 def check_answer(user_answer: str, expected_keywords: list) -> bool:
@@ -8,10 +8,8 @@ def check_answer(user_answer: str, expected_keywords: list) -> bool:
     if not expected_keywords or not user_answer:
         return False
 
-    # Очищаем текст
-    cleaned_text = re.sub(r'[^\w\s]', ' ', user_answer.lower())
-    cleaned_text = ' '.join(cleaned_text.split())
-    user_words = cleaned_text.split()
+    # Очищаем текст общей нормализацией (как при проверке ответов в практике)
+    user_words = set(normalize_text(user_answer).split())
 
     # Проверяем, есть ли совпадение с ХОТЯ БЫ ОДНОЙ группой
     for keyword_group in expected_keywords:
@@ -29,9 +27,7 @@ def strict_check_answer(user_answer: str, expected_keywords: list) -> bool:
     if not expected_keywords or not user_answer:
         return False
 
-    cleaned_text = re.sub(r'[^\w\s]', ' ', user_answer.lower())
-    cleaned_text = ' '.join(cleaned_text.split())
-    user_words = cleaned_text.split()
+    user_words = set(normalize_text(user_answer).split())
 
     # Должны быть слова из КАЖДОЙ группы
     for keyword_group in expected_keywords:
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+from collections import deque
+from typing import Deque, Iterable, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from config import config
+
+# Путь как у настоящего SpeechKit, чтобы достаточно было поменять хост в YANDEX_STT_URL
+STT_PATH = urlsplit(config.YANDEX_STT_URL).path
+
+
+class StubSTTServer:
+    """Локальная замена Yandex SpeechKit для тестов и замеров.
+
+    Отвечает {"result": text} через delay секунд. statuses - коды, которые
+    вернутся первым запросам по порядку (например, 503 для проверки
+    повторов), после них - 200. Считает запросы и разные TCP-соединения.
+    """
+
+    def __init__(self, text: str = "hello", delay: float = 0.0, statuses: Iterable[int] = ()):
+        self.text = text
+        self.delay = delay
+        self.statuses: Deque[int] = deque(statuses)
+        self.requests = 0
+        self.connections: Set[Tuple[str, int]] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    def fail_next(self, *statuses: int):
+        """Следующие запросы получат эти коды ответа."""
+        self.statuses.extend(statuses)
+
+    async def _recognize(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await request.read()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        status = self.statuses.popleft() if self.statuses else 200
+        if status != 200:
+            return web.json_response({"error_code": "STUB", "error_message": "stub failure"}, status=status)
+        return web.json_response({"result": self.text})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запуск сервера; возвращает URL для YANDEX_STT_URL."""
+        app = web.Application()
+        app.router.add_post(STT_PATH, self._recognize)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}{STT_PATH}"
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(port: int, text: str, delay: float):
+    server = StubSTTServer(text=text, delay=delay)
+    url = await server.start(port=port)
+    print(f"Заглушка STT запущена: YANDEX_STT_URL={url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка Yandex SpeechKit")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--text", default="hello")
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.port, args.text, args.delay))